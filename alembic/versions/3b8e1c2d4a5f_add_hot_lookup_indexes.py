@@ -0,0 +1,44 @@
+"""add indexes for hot session/attendance/report lookups
+
+Revision ID: 3b8e1c2d4a5f
+Revises: f76ffccffc7b
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e1c2d4a5f'
+down_revision: Union[str, Sequence[str], None] = 'f76ffccffc7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) - mirrors the Index() declarations in database/models.py
+INDEXES = [
+    ('ix_sessions_tutor_id_scheduled_at', 'sessions', ['tutor_id', 'scheduled_at']),
+    ('ix_sessions_student_profile_id_scheduled_at', 'sessions', ['student_profile_id', 'scheduled_at']),
+    ('ix_attendance_session_id_student_profile_id', 'attendance', ['session_id', 'student_profile_id']),
+    ('ix_reports_session_id', 'reports', ['session_id']),
+    ('ix_enrollments_tutor_user_id_active', 'enrollments', ['tutor_user_id', 'active']),
+    ('ix_enrollments_student_profile_id_active', 'enrollments', ['student_profile_id', 'active']),
+    ('ix_student_profiles_parent_id', 'student_profiles', ['parent_id']),
+    ('ix_student_profiles_user_id', 'student_profiles', ['user_id']),
+    ('ix_user_roles_user_id_role', 'user_roles', ['user_id', 'role']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built them on a fresh database
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,36 @@
+"""add scheduler_leases for scheduler leader election
+
+Revision ID: 5e1b9f3a7c82
+Revises: c4a7e2b9d310
+Create Date: 2026-10-18 14:21:48.603115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1b9f3a7c82'
+down_revision: Union[str, Sequence[str], None] = 'c4a7e2b9d310'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built it on a fresh database
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('holder', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('scheduler_leases', if_exists=True)
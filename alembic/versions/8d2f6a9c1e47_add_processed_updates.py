@@ -0,0 +1,37 @@
+"""add processed_updates table for update_id deduplication
+
+Revision ID: 8d2f6a9c1e47
+Revises: 3b8e1c2d4a5f
+Create Date: 2026-10-18 11:40:03.552917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6a9c1e47'
+down_revision: Union[str, Sequence[str], None] = '3b8e1c2d4a5f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built it on a fresh database
+    op.create_table(
+        'processed_updates',
+        sa.Column('update_id', sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('update_id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_processed_updates_received_at', 'processed_updates', ['received_at'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_processed_updates_received_at', table_name='processed_updates', if_exists=True)
+    op.drop_table('processed_updates', if_exists=True)
@@ -0,0 +1,40 @@
+"""add parent_notifications for exactly-once parent summaries
+
+Revision ID: 9f3c5d1a2b64
+Revises: 5e1b9f3a7c82
+Create Date: 2026-10-18 15:02:11.874520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f3c5d1a2b64'
+down_revision: Union[str, Sequence[str], None] = '5e1b9f3a7c82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built it on a fresh database
+    op.create_table(
+        'parent_notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('parent_id', sa.Integer(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['sessions.id']),
+        sa.ForeignKeyConstraint(['parent_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('session_id', 'parent_id', name='uq_parent_notifications_session_id_parent_id'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('parent_notifications', if_exists=True)
@@ -0,0 +1,40 @@
+"""add identity_invalidations for cross-process identity cache invalidation
+
+Revision ID: a3d7f2c6e914
+Revises: f4a9c3e1b286
+Create Date: 2026-10-18 21:05:13.402871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d7f2c6e914'
+down_revision: Union[str, Sequence[str], None] = 'f4a9c3e1b286'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built it on a fresh database
+    op.create_table(
+        'identity_invalidations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('telegram_id', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True
+    )
+    op.create_index(
+        'ix_identity_invalidations_created_at', 'identity_invalidations', ['created_at'], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('identity_invalidations', if_exists=True)
@@ -0,0 +1,91 @@
+"""add session_groups and fold existing sessions into them
+
+Revision ID: b8e3f1a6d027
+Revises: a6d2e8f4c915
+Create Date: 2026-10-18 17:02:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e3f1a6d027'
+down_revision: Union[str, Sequence[str], None] = 'a6d2e8f4c915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built it on a fresh database
+    op.create_table(
+        'session_groups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tutor_id', sa.Integer(), nullable=True),
+        sa.Column('scheduled_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_minutes', sa.Integer(), nullable=True),
+        sa.Column('topic', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['tutor_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index(
+        'ix_session_groups_tutor_id_scheduled_at', 'session_groups', ['tutor_id', 'scheduled_at'], if_not_exists=True
+    )
+
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('sessions')}
+    if 'group_id' not in columns:
+        with op.batch_alter_table('sessions') as batch_op:
+            batch_op.add_column(sa.Column('group_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_sessions_group_id', 'session_groups', ['group_id'], ['id'])
+    op.create_index('ix_sessions_group_id', 'sessions', ['group_id'], if_not_exists=True)
+
+    # One group per class the old code recognised by (tutor, time, duration, topic)
+    sessions = sa.table(
+        'sessions',
+        sa.column('group_id', sa.Integer()),
+        sa.column('tutor_id', sa.Integer()),
+        sa.column('scheduled_at', sa.DateTime()),
+        sa.column('duration_minutes', sa.Integer()),
+        sa.column('topic', sa.String()),
+    )
+    groups = sa.table(
+        'session_groups',
+        sa.column('id', sa.Integer()),
+        sa.column('tutor_id', sa.Integer()),
+        sa.column('scheduled_at', sa.DateTime()),
+        sa.column('duration_minutes', sa.Integer()),
+        sa.column('topic', sa.String()),
+        sa.column('created_at', sa.DateTime()),
+    )
+    keys = ('tutor_id', 'scheduled_at', 'duration_minutes', 'topic')
+    op.execute(
+        groups.insert().from_select(
+            [*keys, 'created_at'],
+            sa.select(*(sessions.c[key] for key in keys), sa.func.current_timestamp())
+            .where(sessions.c.group_id.is_(None))
+            .group_by(*(sessions.c[key] for key in keys))
+        )
+    )
+    op.execute(
+        sessions.update()
+        .where(sessions.c.group_id.is_(None))
+        .values(group_id=(
+            sa.select(sa.func.min(groups.c.id))
+            .where(*(groups.c[key].is_not_distinct_from(sessions.c[key]) for key in keys))
+            .scalar_subquery()
+        ))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sessions_group_id', table_name='sessions', if_exists=True)
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.drop_column('group_id')
+    op.drop_index('ix_session_groups_tutor_id_scheduled_at', table_name='session_groups', if_exists=True)
+    op.drop_table('session_groups', if_exists=True)
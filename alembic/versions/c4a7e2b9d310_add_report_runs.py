@@ -0,0 +1,59 @@
+"""add report_runs and report_run_items for checkpointed daily reports
+
+Revision ID: c4a7e2b9d310
+Revises: 8d2f6a9c1e47
+Create Date: 2026-10-18 13:05:27.190442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7e2b9d310'
+down_revision: Union[str, Sequence[str], None] = '8d2f6a9c1e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built them on a fresh database
+    op.create_table(
+        'report_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('run_date', sa.Date(), nullable=False),
+        sa.Column('window_start', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('cursor_parent_id', sa.Integer(), nullable=True),
+        sa.Column('total_parents', sa.Integer(), nullable=True),
+        sa.Column('sent', sa.Integer(), nullable=True),
+        sa.Column('failed', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('run_date'),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'report_run_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('run_date', sa.Date(), nullable=False),
+        sa.Column('parent_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['parent_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('run_date', 'parent_id', name='uq_report_run_items_run_date_parent_id'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('report_run_items', if_exists=True)
+    op.drop_table('report_runs', if_exists=True)
@@ -0,0 +1,41 @@
+"""require created_at on users and reports
+
+Revision ID: c7e4a1f9d358
+Revises: a3d7f2c6e914
+Create Date: 2026-10-18 23:12:41.530219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4a1f9d358'
+down_revision: Union[str, Sequence[str], None] = 'a3d7f2c6e914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ('users', 'reports')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        # Rows of unknown age sort as the oldest ones
+        op.execute(
+            f"UPDATE {table} SET created_at = COALESCE("
+            f"(SELECT min(created_at) FROM {table}), CURRENT_TIMESTAMP"
+            f") WHERE created_at IS NULL"
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
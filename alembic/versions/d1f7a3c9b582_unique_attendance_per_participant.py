@@ -0,0 +1,49 @@
+"""make attendance unique per (session, student) after dropping duplicates
+
+Revision ID: d1f7a3c9b582
+Revises: b8e3f1a6d027
+Create Date: 2026-10-18 17:48:12.930417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f7a3c9b582'
+down_revision: Union[str, Sequence[str], None] = 'b8e3f1a6d027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Re-marking used to insert a new row; the latest one is the status in effect
+    attendance = sa.table(
+        'attendance',
+        sa.column('id', sa.Integer()),
+        sa.column('session_id', sa.Integer()),
+        sa.column('student_profile_id', sa.Integer()),
+    )
+    latest = (
+        sa.select(sa.func.max(attendance.c.id))
+        .group_by(attendance.c.session_id, attendance.c.student_profile_id)
+    )
+    op.execute(attendance.delete().where(attendance.c.id.not_in(latest)))
+
+    op.drop_index('ix_attendance_session_id_student_profile_id', table_name='attendance', if_exists=True)
+    op.create_index(
+        'ux_attendance_session_id_student_profile_id', 'attendance', ['session_id', 'student_profile_id'],
+        unique=True, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_attendance_session_id_student_profile_id', table_name='attendance', if_exists=True)
+    op.create_index(
+        'ix_attendance_session_id_student_profile_id', 'attendance', ['session_id', 'student_profile_id'],
+        if_not_exists=True
+    )
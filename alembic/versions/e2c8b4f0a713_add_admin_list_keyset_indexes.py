@@ -0,0 +1,41 @@
+"""add indexes for keyset pagination and filters of the admin lists
+
+Revision ID: e2c8b4f0a713
+Revises: d1f7a3c9b582
+Create Date: 2026-10-18 18:31:07.664120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2c8b4f0a713'
+down_revision: Union[str, Sequence[str], None] = 'd1f7a3c9b582'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) - mirrors the Index() declarations in database/models.py
+INDEXES = [
+    ('ix_users_full_name_id', 'users', ['full_name', 'id']),
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_student_profiles_full_name_id', 'student_profiles', ['full_name', 'id']),
+    ('ix_student_profiles_grade_id', 'student_profiles', ['grade', 'id']),
+    ('ix_student_profiles_school_id', 'student_profiles', ['school', 'id']),
+    ('ix_reports_created_at_id', 'reports', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built them on a fresh database
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,75 @@
+"""add session_daily_rollups and backfill it from sessions, reports and attendance
+
+Revision ID: f4a9c3e1b286
+Revises: e2c8b4f0a713
+Create Date: 2026-10-18 19:52:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a9c3e1b286'
+down_revision: Union[str, Sequence[str], None] = 'e2c8b4f0a713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COUNTS = ['sessions', 'minutes', 'reports', 'score_sum', 'scored', 'present', 'absent', 'late']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # if_not_exists: Base.metadata.create_all() may already have built it on a fresh database
+    op.create_table(
+        'session_daily_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('tutor_id', sa.Integer(), nullable=False),
+        sa.Column('student_profile_id', sa.Integer(), nullable=False),
+        *(sa.Column(name, sa.Integer(), nullable=False) for name in COUNTS),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'tutor_id', 'student_profile_id', name='uq_session_daily_rollups_day_tutor_student'),
+        if_not_exists=True
+    )
+    op.create_index(
+        'ix_session_daily_rollups_tutor_id_day', 'session_daily_rollups', ['tutor_id', 'day'], if_not_exists=True
+    )
+    op.create_index(
+        'ix_session_daily_rollups_student_profile_id_day', 'session_daily_rollups', ['student_profile_id', 'day'],
+        if_not_exists=True
+    )
+
+    # Backfill: same aggregation as services/stats_rollup_service.py (latest report per session), over every session
+    day = 'CAST(s.scheduled_at AS DATE)' if op.get_bind().dialect.name == 'postgresql' else 'date(s.scheduled_at)'
+    op.execute('DELETE FROM session_daily_rollups')
+    op.execute(f"""
+        INSERT INTO session_daily_rollups
+            (day, tutor_id, student_profile_id, {', '.join(COUNTS)}, updated_at)
+        SELECT {day}, s.tutor_id, s.student_profile_id,
+               count(s.id),
+               coalesce(sum(s.duration_minutes), 0),
+               count(r.id),
+               coalesce(sum(r.performance_score), 0),
+               count(r.performance_score),
+               count(CASE WHEN a.status = 'present' THEN 1 END),
+               count(CASE WHEN a.status = 'absent' THEN 1 END),
+               count(CASE WHEN a.status = 'late' THEN 1 END),
+               CURRENT_TIMESTAMP
+        FROM sessions s
+        LEFT JOIN (SELECT session_id, max(id) AS report_id FROM reports GROUP BY session_id) lr
+            ON lr.session_id = s.id
+        LEFT JOIN reports r ON r.id = lr.report_id
+        LEFT JOIN attendance a ON a.session_id = s.id AND a.student_profile_id = s.student_profile_id
+        WHERE s.scheduled_at IS NOT NULL AND s.tutor_id IS NOT NULL AND s.student_profile_id IS NOT NULL
+        GROUP BY {day}, s.tutor_id, s.student_profile_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('session_daily_rollups', if_exists=True)
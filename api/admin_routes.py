@@ -1,8 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from datetime import date, datetime
+from typing import Dict, Any, Optional
 from database.db import SessionLocal
 from services.admin_crud_service import AdminCRUDService
+from services.identity_cache import identity_cache
+from bot.loader import update_queue, delivery
+from bot.utils.notifications import outbox_dispatcher
+from services.outbox_service import OutboxService
+from services.export_service import ExportService, EXPORTS
+from services.stats_rollup_service import StatsRollupService
 from api.auth import verify_admin
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -23,6 +31,36 @@ def get_dashboard_stats(
     """Get comprehensive dashboard statistics"""
     return AdminCRUDService.get_dashboard_stats(db)
 
+@router.get("/stats/sessions")
+def get_session_rollup_stats(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    tutor_id: Optional[int] = Query(None),
+    student_profile_id: Optional[int] = Query(None),
+    group_by: Optional[str] = Query(None, enum=["day", "tutor", "student"]),
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    """Session, report and attendance totals over days from..to (exclusive), from the daily rollups"""
+    return StatsRollupService.get_totals(
+        db, start=start, end=end, tutor_id=tutor_id, student_profile_id=student_profile_id, group_by=group_by
+    )
+
+@router.get("/metrics")
+def get_runtime_metrics(
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    """In-process cache and queue counters for this worker, plus outbox backlog"""
+    return {
+        "identity_cache": identity_cache.stats(),
+        "update_queue": update_queue.stats(),
+        "update_dedup": update_queue.dedup.stats() if update_queue.dedup else None,
+        "outbound": delivery.stats(),
+        "outbox_dispatcher": outbox_dispatcher.stats(),
+        "outbox": OutboxService.get_stats(db)
+    }
+
 # ==================== STUDENT CRUD ====================
 @router.get("/students/{student_id}/detail")
 def get_student_detail(
@@ -130,6 +168,52 @@ def update_session_attendance(
         raise HTTPException(status_code=404, detail="Session not found")
     return {"message": f"Attendance marked as {status}"}
 
+# ==================== EXPORT ====================
+@router.get("/export/{entity}")
+def export_entity(
+    entity: str,
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    admin: str = Depends(verify_admin)
+):
+    """
+    Stream sessions, reports or attendance as NDJSON or CSV, oldest first.
+    The date range applies to the session time (report creation time for reports).
+    """
+    if entity not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{entity}'")
+
+    rows = ExportService.iter_rows(entity, date_from, date_to)
+    if format == "csv":
+        return StreamingResponse(
+            ExportService.stream_csv(ExportService.columns(entity), rows),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{entity}.csv"'}
+        )
+    return StreamingResponse(ExportService.stream_ndjson(rows), media_type="application/x-ndjson")
+
+# ==================== OUTBOX ====================
+@router.get("/outbox/dead")
+def get_outbox_dead_letters(
+    limit: int = Query(100, le=500),
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    """Notifications that exhausted their retries"""
+    return OutboxService.get_dead_letters(db, limit)
+
+@router.post("/outbox/{message_id}/retry")
+def retry_outbox_message(
+    message_id: int,
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    """Put a dead-lettered notification back in the queue"""
+    if not OutboxService.retry_dead_letter(db, message_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered message not found")
+    return {"message": "Message queued for retry"}
+
 # ==================== AUDIT LOGS ====================
 @router.get("/audit-logs")
 def get_audit_logs(
@@ -2,8 +2,9 @@ from fastapi import FastAPI, Depends, HTTPException, Query, Header
 from fastapi.responses import HTMLResponse, FileResponse
 from sqlalchemy.orm import Session
 import os
+from datetime import datetime
 
-from database.db import engine, Base, SessionLocal
+from database.db import engine, Base, SessionLocal, AsyncSessionLocal
 from database import models
 from api import schemas
 from services.user_service import UserService
@@ -13,8 +14,13 @@ from api import admin_routes
 from api.auth import verify_admin
 from config import settings
 from typing import List, Optional
-from bot.loader import bot, dp, setup_routers
+from bot.loader import bot, setup_routers, update_queue
+from bot.update_queue import UpdateQueueNotRunning
+from services.scheduler_service import shutdown_scheduler
+from services.identity_cache import identity_cache
+from services.stats_rollup_service import AsyncStatsRollupService
 from aiogram.types import Update
+from pydantic import ValidationError
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -37,18 +43,46 @@ async def on_startup():
     # We need to make sure we are in the root directory where alembic.ini is
     alembic.command.upgrade(alembic.config.Config("alembic.ini"), "head")
 
+    # create_all above leaves the dashboard's rollup table empty on a new database
+    async with AsyncSessionLocal() as db:
+        await AsyncStatsRollupService.reconcile_if_empty(db)
+
+    # Admin edits made here must reach the bot processes' identity caches
+    identity_cache.start_sync()
+
     webhook_url = os.getenv("RENDER_EXTERNAL_URL")
     if webhook_url:
         # We are on Render (or an env with external URL set), assume we want webhooks
         webhook_url = webhook_url + WEBHOOK_PATH
         setup_routers()
+        await update_queue.start()
         await bot.set_webhook(webhook_url)
         print(f"Webhook set to {webhook_url}")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Finish updates Telegram already got a 200 for
+    await update_queue.stop()
+    await shutdown_scheduler()
+    await identity_cache.stop_sync()
+
 @app.post(WEBHOOK_PATH)
 async def bot_webhook(update: dict):
-    telegram_update = Update.model_validate(update, context={"bot": bot})
-    await dp.feed_update(bot, telegram_update)
+    try:
+        telegram_update = Update.model_validate(update, context={"bot": bot})
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Invalid update payload")
+
+    # Handlers run on the update queue workers; answer Telegram right away
+    try:
+        accepted = await update_queue.put(telegram_update, timeout=settings.WEBHOOK_ENQUEUE_TIMEOUT)
+    except UpdateQueueNotRunning:
+        # Not set up for webhooks (or shutting down); Telegram re-delivers after a non-2xx response
+        raise HTTPException(status_code=503, detail="Update queue is not running", headers={"Retry-After": "5"})
+    if not accepted:
+        # Saturated: Telegram re-delivers after a non-2xx response
+        raise HTTPException(status_code=429, detail="Update queue is full", headers={"Retry-After": "1"})
+    return {"ok": True}
 
 # Include modular admin routes
 app.include_router(admin_routes.router)
@@ -121,6 +155,22 @@ def create_session(session: schemas.SessionCreate, db: Session = Depends(get_db)
         session.topic
     )
 
+@app.post("/sessions/bulk", response_model=schemas.SessionBulkResponse)
+def create_sessions_bulk(sessions: schemas.SessionBulkCreate, db: Session = Depends(get_db)):
+    """Create a group session (one row per student) in a single transaction"""
+    try:
+        session_ids = SessionService.create_sessions_bulk(
+            db,
+            sessions.tutor_id,
+            sessions.student_profile_ids,
+            sessions.scheduled_at,
+            sessions.duration_minutes,
+            sessions.topic
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return schemas.SessionBulkResponse(session_ids=session_ids)
+
 @app.get("/sessions/user/{user_id}", response_model=List[schemas.SessionResponse])
 def get_user_sessions(user_id: int, role: str = Query("student"), db: Session = Depends(get_db)):
     results = SessionService.get_user_sessions(db, user_id, role)
@@ -142,25 +192,80 @@ def get_user_sessions(user_id: int, role: str = Query("student"), db: Session =
 
 # --- Admin Routes ---
 
-@app.get("/admin/students", response_model=List[schemas.AdminStudentDetail])
-def get_admin_students(db: Session = Depends(get_db), admin: str = Depends(verify_admin)):
-    return AdminService.get_all_students(db)
+def _admin_page(fetch, *args, **kwargs):
+    try:
+        return fetch(*args, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admin/students", response_model=schemas.AdminStudentPage)
+def get_admin_students(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    sort: str = Query("id", enum=["id", "full_name"]),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    grade: Optional[str] = Query(None),
+    school: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    return _admin_page(
+        AdminService.get_all_students, db, cursor=cursor, limit=limit, sort=sort,
+        descending=order == "desc", grade=grade, school=school
+    )
 
-@app.get("/admin/tutors", response_model=List[schemas.AdminTutorDetail])
-def get_admin_tutors(db: Session = Depends(get_db), admin: str = Depends(verify_admin)):
-    return AdminService.get_all_tutors(db)
+@app.get("/admin/tutors", response_model=schemas.AdminTutorPage)
+def get_admin_tutors(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    sort: str = Query("id", enum=["id", "full_name", "created_at"]),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    verified: Optional[bool] = Query(None),
+    subject: Optional[str] = Query(None),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    return _admin_page(
+        AdminService.get_all_tutors, db, cursor=cursor, limit=limit, sort=sort, descending=order == "desc",
+        verified=verified, subject=subject, created_from=created_from, created_to=created_to
+    )
 
-@app.get("/admin/parents", response_model=List[schemas.AdminParentDetail])
-def get_admin_parents(db: Session = Depends(get_db), admin: str = Depends(verify_admin)):
-    return AdminService.get_all_parents(db)
+@app.get("/admin/parents", response_model=schemas.AdminParentPage)
+def get_admin_parents(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    sort: str = Query("id", enum=["id", "full_name", "created_at"]),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    return _admin_page(
+        AdminService.get_all_parents, db, cursor=cursor, limit=limit, sort=sort, descending=order == "desc",
+        created_from=created_from, created_to=created_to
+    )
 
 @app.get("/admin/reports/sessions", response_model=schemas.SessionReportSummary)
 def get_admin_session_report(
     period: str = Query("daily", enum=["daily", "weekly", "monthly"]),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Optional[str] = Query(None, enum=["hour", "day", "week"]),
+    limit: int = Query(200, ge=0, le=1000),
     db: Session = Depends(get_db),
     admin: str = Depends(verify_admin)
 ):
-    return AdminService.get_session_stats(db, period)
+    """
+    Session totals over from..to (or the last day/week/30 days given by `period`),
+    optionally as an hour/day/week series, plus the newest `limit` sessions
+    """
+    try:
+        return AdminService.get_session_stats(db, period, start=start, end=end, bucket=bucket, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/admin/tutors/{tutor_id}/verify")
 def verify_tutor(
@@ -178,29 +283,61 @@ def verify_tutor(
 def get_user_sessions_admin(
     user_id: int,
     role: str = Query("student", enum=["student", "tutor"]),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    before_scheduled_at: Optional[datetime] = Query(None),
+    before_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
     admin: str = Depends(verify_admin)
 ):
-    """Get detailed sessions for a user including attendance and reports"""
+    """
+    Get detailed sessions for a user including attendance and reports, newest first.
+    Pass the scheduled_at and id of the last session received to get the next page
+    (just the id if that session has no scheduled_at).
+    """
     from services.admin_session_service import AdminSessionService
-    return AdminSessionService.get_user_sessions_detailed(db, user_id, role)
+    before = (before_scheduled_at, before_id) if before_id is not None else None
+    return AdminSessionService.get_user_sessions_detailed(db, user_id, role, limit=limit, before=before)
 
 @app.get("/admin/profiles/{profile_id}/sessions")
 def get_profile_sessions_admin(
     profile_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    before_scheduled_at: Optional[datetime] = Query(None),
+    before_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
     admin: str = Depends(verify_admin)
 ):
-    """Get detailed sessions for a student profile (for managed children)"""
+    """Get detailed sessions for a student profile (for managed children), paged like the user view"""
     from services.admin_session_service import AdminSessionService
-    return AdminSessionService.get_profile_sessions_detailed(db, profile_id)
+    before = (before_scheduled_at, before_id) if before_id is not None else None
+    return AdminSessionService.get_profile_sessions_detailed(db, profile_id, limit=limit, before=before)
 
-@app.get("/admin/reports")
+@app.get("/admin/reports", response_model=schemas.AdminReportPage)
 def get_all_reports_admin(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    sort: str = Query("created_at", enum=["created_at", "id"]),
+    order: str = Query("desc", enum=["asc", "desc"]),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    admin: str = Depends(verify_admin)
+):
+    return _admin_page(
+        AdminService.get_all_reports, db, cursor=cursor, limit=limit, sort=sort, descending=order == "desc",
+        created_from=created_from, created_to=created_to
+    )
+
+@app.get("/admin/reports/runs/current")
+def get_report_run_progress_admin(
     db: Session = Depends(get_db),
     admin: str = Depends(verify_admin)
 ):
-    return AdminService.get_all_reports(db)
+    """Progress and throughput of the latest daily report run"""
+    progress = AdminService.get_report_run_progress(db)
+    if not progress:
+        raise HTTPException(status_code=404, detail="No report runs yet")
+    return progress
 
 @app.get("/admin/settings")
 def get_settings_admin(
@@ -216,5 +353,6 @@ def update_setting_admin(
     db: Session = Depends(get_db),
     admin: str = Depends(verify_admin)
 ):
-    AdminService.update_setting(db, key, value)
+    if not AdminService.update_setting(db, key, value):
+        raise HTTPException(status_code=400, detail=f"Invalid value for {key}")
     return {"message": f"Setting {key} updated"}
@@ -57,6 +57,16 @@ class SessionCreate(BaseModel):
     duration_minutes: int
     topic: str
 
+class SessionBulkCreate(BaseModel):
+    tutor_id: int
+    student_profile_ids: List[int]
+    scheduled_at: datetime
+    duration_minutes: int
+    topic: str
+
+class SessionBulkResponse(BaseModel):
+    session_ids: List[int]
+
 class SessionResponse(BaseModel):
     id: int
     tutor_id: int
@@ -102,13 +112,69 @@ class AdminParentDetail(BaseModel):
     children: List[str]
     created_at: datetime
 
+class AdminReportItem(BaseModel):
+    id: int
+    content: Optional[str]
+    performance_score: Optional[int]
+    created_at: Optional[datetime]
+    topic: Optional[str]
+    student_name: str
+    tutor_name: str
+
+class AdminPage(BaseModel):
+    """Keyset page: pass next_cursor back as `cursor`; total is a hint sent with the first page"""
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_exact: bool = False
+
+class AdminStudentPage(AdminPage):
+    items: List[AdminStudentDetail]
+
+class AdminTutorPage(AdminPage):
+    items: List[AdminTutorDetail]
+
+class AdminParentPage(AdminPage):
+    items: List[AdminParentDetail]
+
+class AdminReportPage(AdminPage):
+    items: List[AdminReportItem]
+
+class AttendanceBreakdown(BaseModel):
+    present: int
+    absent: int
+    late: int
+
+class SessionStatsPoint(BaseModel):
+    bucket_start: datetime
+    total_sessions: int
+    total_duration_minutes: int
+    total_reports: int
+    average_performance_score: float
+    attendance: AttendanceBreakdown
+
+class SessionSummaryItem(BaseModel):
+    id: int
+    topic: Optional[str]
+    scheduled_at: datetime
+    duration_minutes: Optional[int]
+    student_id: Optional[int]
+    tutor_id: Optional[int]
+    student_name: Optional[str]
+    tutor_name: Optional[str]
+    report_score: Optional[int]
+
 class SessionReportSummary(BaseModel):
-    period: str
+    period: Optional[str]
+    start: datetime
+    end: datetime
+    bucket: Optional[str] = None
     total_sessions: int
     total_duration_minutes: int
     total_reports: int
     average_performance_score: float
-    sessions: List[SessionResponse]
+    attendance: AttendanceBreakdown
+    series: Optional[List[SessionStatsPoint]] = None
+    sessions: List[SessionSummaryItem]
 
 class AdminDashboardStats(BaseModel):
     total_students: int
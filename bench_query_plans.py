@@ -0,0 +1,175 @@
+"""
+Query-plan benchmark for the hot bot/admin lookups.
+
+Seeds a scratch database (one million sessions by default), then prints the
+query plan and timing of each hot lookup twice: without the lookup indexes
+declared in database/models.py, and again after creating them.
+
+Usage:
+    python bench_query_plans.py [--url sqlite:///./bench_query_plans.db] [--sessions 1000000]
+
+Never point --url at a real database: all tables are dropped and recreated.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+
+from database.db import Base
+from database.models import (
+    User, UserRole, StudentProfile, Enrollment, Session as TSession, Attendance, Report
+)
+
+# Names of the indexes added for the hot lookups (see alembic revision 3b8e1c2d4a5f)
+LOOKUP_INDEXES = {
+    "ix_sessions_tutor_id_scheduled_at",
+    "ix_sessions_student_profile_id_scheduled_at",
+    # Created by 3b8e1c2d4a5f; d1f7a3c9b582 replaced it with the unique ux_ index
+    "ix_attendance_session_id_student_profile_id",
+    "ux_attendance_session_id_student_profile_id",
+    "ix_reports_session_id",
+    "ix_enrollments_tutor_user_id_active",
+    "ix_enrollments_student_profile_id_active",
+    "ix_student_profiles_parent_id",
+    "ix_student_profiles_user_id",
+    "ix_user_roles_user_id_role",
+}
+
+# The lookups the handlers and admin services run on every request
+HOT_QUERIES = {
+    "tutor sessions": "SELECT * FROM sessions WHERE tutor_id = :tutor_id ORDER BY scheduled_at DESC",
+    "student last 10 sessions": "SELECT * FROM sessions WHERE student_profile_id = :profile_id ORDER BY scheduled_at DESC LIMIT 10",
+    "attendance for session": "SELECT * FROM attendance WHERE session_id = :session_id AND student_profile_id = :profile_id",
+    "report for session": "SELECT * FROM reports WHERE session_id = :session_id",
+    "tutor active enrollments": "SELECT * FROM enrollments WHERE tutor_user_id = :tutor_id AND active = :active",
+    "student active enrollments": "SELECT * FROM enrollments WHERE student_profile_id = :profile_id AND active = :active",
+    "managed children": "SELECT * FROM student_profiles WHERE parent_id = :parent_id",
+    "student profile by user": "SELECT * FROM student_profiles WHERE user_id = :student_user_id",
+    "role check": "SELECT * FROM user_roles WHERE user_id = :tutor_id AND role = 'tutor'",
+}
+
+BATCH_SIZE = 50000
+
+
+def seed(engine, total_sessions: int, tutors: int, students: int):
+    """Bulk-insert a synthetic dataset sized like a busy deployment"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    parents = students // 2
+
+    with engine.begin() as conn:
+        users = [{"id": i, "telegram_id": 10_000_000 + i, "full_name": f"User {i}"}
+                 for i in range(1, tutors + parents + students + 1)]
+        conn.execute(insert(User), users)
+
+        tutor_ids = list(range(1, tutors + 1))
+        parent_ids = list(range(tutors + 1, tutors + parents + 1))
+        student_user_ids = list(range(tutors + parents + 1, tutors + parents + students + 1))
+
+        roles = [{"user_id": uid, "role": "tutor"} for uid in tutor_ids]
+        roles += [{"user_id": uid, "role": "parent"} for uid in parent_ids]
+        roles += [{"user_id": uid, "role": "student"} for uid in student_user_ids]
+        conn.execute(insert(UserRole), roles)
+
+        conn.execute(insert(StudentProfile), [
+            {"id": i + 1, "user_id": uid, "parent_id": parent_ids[i % parents],
+             "full_name": f"Student {i + 1}", "grade": "Grade 8", "school": "School", "age": 14}
+            for i, uid in enumerate(student_user_ids)
+        ])
+
+        conn.execute(insert(Enrollment), [
+            {"student_profile_id": pid, "tutor_user_id": rng.choice(tutor_ids), "active": True}
+            for pid in range(1, students + 1)
+        ])
+
+    session_id = 0
+    while session_id < total_sessions:
+        batch = min(BATCH_SIZE, total_sessions - session_id)
+        sessions, attendance, reports = [], [], []
+        for _ in range(batch):
+            session_id += 1
+            profile_id = rng.randint(1, students)
+            tutor_id = rng.choice(tutor_ids)
+            scheduled_at = now - timedelta(minutes=rng.randint(0, 525600))
+            sessions.append({"id": session_id, "tutor_id": tutor_id, "student_profile_id": profile_id,
+                             "scheduled_at": scheduled_at, "duration_minutes": 60, "topic": "Algebra"})
+            attendance.append({"session_id": session_id, "student_profile_id": profile_id, "status": "present"})
+            if rng.random() < 0.7:
+                reports.append({"session_id": session_id, "tutor_id": tutor_id, "content": "Good progress",
+                                "performance_score": rng.randint(1, 10), "created_at": scheduled_at})
+        with engine.begin() as conn:
+            conn.execute(insert(TSession), sessions)
+            conn.execute(insert(Attendance), attendance)
+            if reports:
+                conn.execute(insert(Report), reports)
+        print(f"  seeded {session_id}/{total_sessions} sessions", end="\r")
+    print()
+
+
+def explain(conn, sql: str, params: dict) -> str:
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text("EXPLAIN ANALYZE " + sql), params).fetchall()
+        return "\n".join(f"      {r[0]}" for r in rows)
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+    return "\n".join(f"      {r[-1]}" for r in rows)
+
+
+def run_queries(engine, params: dict, repeat: int):
+    with engine.connect() as conn:
+        for label, sql in HOT_QUERIES.items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).fetchall()
+            elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+            print(f"  {label}: {elapsed_ms:.2f} ms/query")
+            print(explain(conn, sql, params))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///./bench_query_plans.db")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--tutors", type=int, default=500)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    lookup_indexes = [
+        index for table in Base.metadata.sorted_tables for index in table.indexes
+        if index.name in LOOKUP_INDEXES
+    ]
+    for index in lookup_indexes:
+        index.drop(bind=engine)
+
+    print(f"Seeding {args.sessions} sessions...")
+    seed(engine, args.sessions, args.tutors, args.students)
+
+    params = {
+        "tutor_id": 1,
+        "profile_id": 1,
+        "active": True,
+        "session_id": args.sessions // 2,
+        "parent_id": args.tutors + 1,
+        "student_user_id": args.tutors + args.students // 2 + 1,
+    }
+
+    print("\n=== Before: no lookup indexes ===")
+    run_queries(engine, params, args.repeat)
+
+    for index in lookup_indexes:
+        index.create(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    print("\n=== After: lookup indexes created ===")
+    run_queries(engine, params, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from sqlalchemy import delete
+
+from config import settings
+from database.db import AsyncSessionLocal, dialect_insert
+from database.models import ProcessedUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryDedupStore:
+    """
+    Bounded in-process window of recently seen update_ids.
+    Entries expire after `window` seconds; the oldest are evicted past `maxsize`.
+    """
+
+    def __init__(self, window: float = 3600, maxsize: int = 100000):
+        self.window = window
+        self.maxsize = maxsize
+        self._seen: "OrderedDict[int, float]" = OrderedDict()
+        self.checked = 0
+        self.duplicates = 0
+
+    def _expire(self, now: float):
+        while self._seen:
+            update_id, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.window and len(self._seen) <= self.maxsize:
+                break
+            del self._seen[update_id]
+
+    def _check_local(self, update_id: int) -> bool:
+        now = time.monotonic()
+        self._expire(now)
+        if update_id in self._seen:
+            return False
+        self._seen[update_id] = now
+        return True
+
+    async def check(self, update_id: int) -> bool:
+        """Record update_id; False if it was already seen within the window"""
+        self.checked += 1
+        if self._check_local(update_id):
+            return True
+        self.duplicates += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "window_seconds": self.window,
+            "size": len(self._seen),
+            "checked": self.checked,
+            "duplicates_dropped": self.duplicates,
+        }
+
+
+class DatabaseDedupStore(MemoryDedupStore):
+    """
+    update_id window backed by the processed_updates table so every worker
+    process sees the same ids. The in-memory window in front of it answers
+    re-deliveries that land on the same process without a round-trip.
+    """
+
+    def __init__(self, window: float = 3600, maxsize: int = 100000, session_pool=AsyncSessionLocal,
+                 prune_interval: float = 300):
+        super().__init__(window, maxsize)
+        self.session_pool = session_pool
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self.errors = 0
+
+    async def check(self, update_id: int) -> bool:
+        self.checked += 1
+        if not self._check_local(update_id):
+            self.duplicates += 1
+            return False
+
+        try:
+            async with self.session_pool() as db:
+                stmt = dialect_insert(db.bind.dialect.name, ProcessedUpdate).values(
+                    update_id=update_id, received_at=datetime.utcnow()
+                ).on_conflict_do_nothing(index_elements=["update_id"])
+                result = await db.execute(stmt)
+                await self._maybe_prune(db)
+                await db.commit()
+        except Exception as e:
+            # Fail open: processing an update twice beats dropping it
+            self.errors += 1
+            logger.error(f"Dedup store unavailable, accepting update {update_id}: {e}")
+            return True
+
+        if result.rowcount == 0:
+            self.duplicates += 1
+            return False
+        return True
+
+    async def _maybe_prune(self, db):
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = now
+        cutoff = datetime.utcnow() - timedelta(seconds=self.window)
+        await db.execute(delete(ProcessedUpdate).where(ProcessedUpdate.received_at < cutoff))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({"backend": "database", "errors": self.errors})
+        return stats
+
+
+def create_dedup_store():
+    """Dedup store selected by DEDUP_BACKEND (memory | database)"""
+    if settings.DEDUP_BACKEND == "database":
+        return DatabaseDedupStore(settings.DEDUP_WINDOW_SECONDS, settings.DEDUP_MAX_ENTRIES)
+    if settings.DEDUP_BACKEND != "memory":
+        raise ValueError(f"Unknown DEDUP_BACKEND '{settings.DEDUP_BACKEND}'")
+    return MemoryDedupStore(settings.DEDUP_WINDOW_SECONDS, settings.DEDUP_MAX_ENTRIES)
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Dict
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Outbound lanes; lower values are delivered first"""
+    INTERACTIVE = 0  # replies to the user who is talking to the bot
+    NOTIFICATION = 1  # parent notifications triggered by a tutor's action
+    BULK = 2  # scheduled report runs
+
+
+_priority: ContextVar[Priority] = ContextVar("delivery_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def delivery_priority(priority: Priority):
+    """Send every Telegram call made inside the block on the given lane"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+async def send_message(bot: Bot, chat_id: int, text: str, priority: Priority = Priority.INTERACTIVE, **kwargs):
+    """bot.send_message on an explicit priority lane"""
+    with delivery_priority(priority):
+        return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # Set from a RetryAfter: nothing goes out before this moment
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self):
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class DeliveryMiddleware(BaseRequestMiddleware):
+    """
+    Request middleware on the bot's session, so every outgoing call
+    (message.answer, callback.message.edit_text, bot.send_message, ...) is
+    rate limited without changing the call sites.
+
+    Calls addressed to a chat wait for a token from the global bucket
+    (Telegram allows ~30 messages/s per bot) and from that chat's bucket.
+    While a higher-priority call is waiting, lower lanes yield, so
+    interactive replies overtake a bulk report run. Flood-control errors
+    are retried after `retry_after`; network and 5xx errors with
+    exponential backoff.
+    """
+
+    def __init__(self, global_rate: float = 25, chat_rate: float = 1, chat_burst: float = 3,
+                 max_retries: int = 3, backoff_base: float = 1.0, max_chat_buckets: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_chat_buckets = max_chat_buckets
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._waiting = {priority: 0 for priority in Priority}
+        self.sent = {priority.name.lower(): 0 for priority in Priority}
+        self.failed = 0
+        self.retries = 0
+        self.retry_after_hits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # getUpdates, setWebhook, answerCallbackQuery, ... aren't message sends
+            return await make_request(bot, method)
+
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_hits += 1
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    raise
+                # Hold back the whole chat, not just this call
+                self._chat_bucket(chat_id).blocked_until = time.monotonic() + e.retry_after
+                logger.warning(f"Flood control for chat {chat_id}, retrying in {e.retry_after}s")
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    raise
+                backoff = self.backoff_base * 2 ** attempt * (1 + random.random() / 2)
+                logger.warning(f"{type(method).__name__} to chat {chat_id} failed ({e}), retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+            except Exception:
+                self.failed += 1
+                raise
+            else:
+                self.sent[priority.name.lower()] += 1
+                return response
+            attempt += 1
+            self.retries += 1
+
+    async def _acquire(self, chat_id, priority: Priority):
+        started = time.monotonic()
+        chat_bucket = self._chat_bucket(chat_id)
+        while True:
+            now = time.monotonic()
+            chat_wait = chat_bucket.delay(now)
+            if chat_wait > 0:
+                # Throttled by its own chat: doesn't hold back other lanes meanwhile
+                await asyncio.sleep(chat_wait)
+                continue
+
+            wait = self.global_bucket.delay(now)
+            if wait <= 0 and any(self._waiting[p] for p in Priority if p < priority):
+                # Leave this token to the higher lane
+                wait = 1 / self.global_bucket.rate
+            if wait <= 0:
+                self.global_bucket.take()
+                chat_bucket.take()
+                break
+
+            self._waiting[priority] += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting[priority] -= 1
+
+        waited = time.monotonic() - started
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_chat_buckets:
+                now = time.monotonic()
+                self._chat_buckets = {
+                    key: b for key, b in self._chat_buckets.items() if not b.idle(now)
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def stats(self) -> Dict[str, Any]:
+        delivered = sum(self.sent.values())
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "retry_after_hits": self.retry_after_hits,
+            "waiting": {priority.name.lower(): count for priority, count in self._waiting.items()},
+            "avg_wait_ms": round(self.total_wait * 1000 / delivered, 2) if delivered else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "tracked_chats": len(self._chat_buckets),
+        }
@@ -3,12 +3,13 @@ import logging
 from aiogram import Bot, Dispatcher
 from config import settings
 from bot.handlers import common, registration, session, report, parent, attendance
-from services.scheduler_service import setup_scheduler
+from services.scheduler_service import shutdown_scheduler
+from services.identity_cache import identity_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-from bot.loader import bot, dp, setup_routers
+from bot.loader import bot, setup_routers, update_queue
 
 async def main():
     # Setup routers and scheduler
@@ -18,7 +19,17 @@ async def main():
     # Fix for TelegramConflictError: If a webhook was set (e.g. by the deployed app),
     # we must delete it before we can use polling locally.
     await bot.delete_webhook(drop_pending_updates=True) 
-    await dp.start_polling(bot)
+
+    # Same per-chat ordered worker pool as the webhook path
+    await update_queue.start()
+    identity_cache.start_sync()
+    try:
+        await update_queue.run_polling()
+    finally:
+        await update_queue.stop()
+        await shutdown_scheduler()
+        await identity_cache.stop_sync()
+        await bot.session.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
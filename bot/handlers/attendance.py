@@ -1,23 +1,34 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
-from database.db import SessionLocal
-from services.user_service import UserService
-from services.session_service import SessionService
-from database.models import Attendance, Session as TSession, StudentProfile, User
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.user_service import AsyncUserService
+from services.identity_cache import CachedUser
+from services.session_service import AsyncSessionService
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from database.models import Session as TSession
+from typing import List, Optional
 from bot.keyboards.common import get_main_menu
 from bot.states.attendance import AttendanceStates
 
 router = Router()
 
 async def show_attendance_for_profile(message: types.Message, profile_id: int, db):
-    profile = db.query(StudentProfile).filter(StudentProfile.id == profile_id).first()
+    profile = await AsyncUserService.get_student_profile_by_id(db, profile_id)
     if not profile:
         await message.answer("Profile not found.")
         return
 
     # Get all sessions for this student profile
-    sessions = db.query(TSession).filter(TSession.student_profile_id == profile.id).order_by(TSession.scheduled_at.desc()).limit(10).all()
+    result = await db.execute(
+        select(TSession)
+        .options(selectinload(TSession.tutor), selectinload(TSession.attendance))
+        .filter(TSession.student_profile_id == profile.id)
+        .order_by(TSession.scheduled_at.desc())
+        .limit(10)
+    )
+    sessions = result.scalars().all()
     
     if not sessions:
         await message.answer(f"📅 {profile.full_name} has no recorded sessions yet.")
@@ -27,13 +38,10 @@ async def show_attendance_for_profile(message: types.Message, profile_id: int, d
     
     for sess in sessions:
         # Check if attendance was marked for this session
-        attendance = db.query(Attendance).filter(
-            Attendance.session_id == sess.id,
-            Attendance.student_profile_id == profile.id
-        ).first()
+        attendance = next((a for a in sess.attendance if a.student_profile_id == profile.id), None)
         
         # Get tutor name
-        tutor = db.query(User).filter(User.id == sess.tutor_id).first()
+        tutor = sess.tutor
         tutor_name = tutor.full_name if tutor else "Unknown"
         
         status_emoji = {
@@ -57,24 +65,18 @@ async def show_attendance_for_profile(message: types.Message, profile_id: int, d
     await message.answer(response, parse_mode="Markdown")
 
 @router.message(F.text == "My Attendance")
-async def my_attendance_handler(message: types.Message, state: FSMContext):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
+async def my_attendance_handler(message: types.Message, state: FSMContext, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
     if not user:
         await message.answer("Please register first.")
-        db.close()
         return
     
-    roles = [r.role for r in user.roles]
     is_parent = "parent" in roles
     is_student = "student" in roles
 
     if is_parent:
-        children = UserService.get_managed_children(db, user.id)
+        children = await AsyncUserService.get_managed_children(db, user.id)
         if not children:
             await message.answer("You have no linked children.")
-            db.close()
             return
         
         builder = ReplyKeyboardBuilder()
@@ -86,70 +88,43 @@ async def my_attendance_handler(message: types.Message, state: FSMContext):
         
         await message.answer("Select a child to view attendance:", reply_markup=builder.as_markup(resize_keyboard=True))
         await state.set_state(AttendanceStates.waiting_for_child_pick)
-        db.close()
         return
 
     if is_student:
         # Get student profile
-        profile = UserService.get_student_profile(db, user.id)
+        profile = await AsyncUserService.get_student_profile(db, user.id)
         if not profile:
             await message.answer("You must be registered as a student to view attendance.")
-            db.close()
             return
         
         await show_attendance_for_profile(message, profile.id, db)
-        db.close()
         return
     
     await message.answer("Attendance viewing is only available for students and parents.")
-    db.close()
 
 @router.message(F.text == "Mark Attendance")
-async def mark_attendance_start(message: types.Message, state: FSMContext):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
-    if not user or not any(r.role == "tutor" for r in user.roles):
+async def mark_attendance_start(message: types.Message, state: FSMContext, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
+    if not user or "tutor" not in roles:
         await message.answer("Only tutors can mark attendance.")
-        db.close()
         return
 
-    # Get recent sessions for this tutor (e.g. last 10)
-    sessions = SessionService.get_user_sessions(db, user.id, "tutor")
+    # Latest 10 classes with their participant counts
+    groups = await AsyncSessionService.get_tutor_groups(db, user.id, limit=10)
     
-    if not sessions:
+    if not groups:
         await message.answer("You have no sessions to mark attendance for.")
-        db.close()
         return
         
-    # Group sessions by (topic, scheduled_at)
-    grouped = {}
-    for sess in sessions:
-        key = (sess.topic, sess.scheduled_at)
-        if key not in grouped:
-            grouped[key] = []
-        grouped[key].append(sess)
-        
     builder = ReplyKeyboardBuilder()
-    count = 0
-    
-    # Store grouping in state so we can retrieve lists later
-    # We can serialize by index since we only show few? 
-    # Or just use key string. Using index for simplicity in this turn.
     
+    # Store labels in state so we can map the pick back to its class
     group_list = []
     
-    for (topic, time), sess_list in grouped.items():
-        time_str = time.strftime("%Y-%m-%d %H:%M")
-        size = len(sess_list)
-        label = f"{topic} ({size} students) @ {time_str}"
+    for group, size in groups:
+        time_str = group.scheduled_at.strftime("%Y-%m-%d %H:%M")
+        label = f"{group.topic} ({size} students) @ {time_str}"
         builder.button(text=label)
-        
-        # Store IDs for this group
-        group_list.append({"ids": [s.id for s in sess_list], "label": label})
-        
-        count += 1
-        if count >= 10: break
+        group_list.append({"group_id": group.id, "label": label})
     
     await state.update_data(session_groups=group_list)
     
@@ -158,10 +133,9 @@ async def mark_attendance_start(message: types.Message, state: FSMContext):
     
     await message.answer("Select a session (or group) to mark attendance for:", reply_markup=builder.as_markup(resize_keyboard=True))
     await state.set_state(AttendanceStates.waiting_for_session_pick)
-    db.close()
 
 @router.message(AttendanceStates.waiting_for_session_pick)
-async def process_session_pick_mark(message: types.Message, state: FSMContext):
+async def process_session_pick_mark(message: types.Message, state: FSMContext, db: AsyncSession):
     if message.text == "Back":
         await state.clear()
         await message.answer("Operation cancelled.") # Or return to menu
@@ -176,22 +150,15 @@ async def process_session_pick_mark(message: types.Message, state: FSMContext):
         await message.answer("Please select a session from the keyboard.")
         return
 
-    session_ids = selected_group['ids']
+    # Participants of the class with their student names
+    participants = await AsyncSessionService.get_group_participants(db, selected_group['group_id'])
+    session_ids = [sess.id for sess in participants]
+    students = [(sess.id, sess.student_profile.full_name) for sess in participants if sess.student_profile]
     
-    db = SessionLocal()
-    
-    # Fetch student names used in this group
-    students = []
-    for sid in session_ids:
-        sess = db.query(TSession).filter(TSession.id == sid).first()
-        if sess and sess.student_profile:
-             students.append((sid, sess.student_profile.full_name))
-             
     # Prepare selection state
     await state.update_data(attendance_session_ids=session_ids, student_list=students, selected_students=[])
     
     await show_attendance_student_selection(message, state)
-    db.close()
 
 async def show_attendance_student_selection(message: types.Message, state: FSMContext):
     data = await state.get_data()
@@ -253,7 +220,7 @@ async def process_attendance_student_selection(message: types.Message, state: FS
         await message.answer("Use the keyboard.")
 
 @router.message(AttendanceStates.waiting_for_status_pick)
-async def process_status_pick(message: types.Message, state: FSMContext):
+async def process_status_pick(message: types.Message, state: FSMContext, db: AsyncSession, roles: List[str]):
     if message.text == "Back":
         await show_attendance_student_selection(message, state)
         return
@@ -272,43 +239,24 @@ async def process_status_pick(message: types.Message, state: FSMContext):
     data = await state.get_data()
     target_sessions = data.get('selected_students', []) # List of session IDs
     
-    db = SessionLocal()
-    count = 0
-    for sid in target_sessions:
-        session = db.query(TSession).filter(TSession.id == sid).first()
-        if session:
-            SessionService.mark_attendance(db, sid, session.student_profile_id, status)
-            count += 1
-    
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    roles = [r.role for r in user.roles] if user else ["tutor"]
-    
-    # Notify parents if applicable
-    from bot.utils.notifications import check_and_notify_parent
-    # We iterate over unique sessions marked
-    for sid in target_sessions:
-        await check_and_notify_parent(message.bot, sid, db)
-    
-    await message.answer(f"✅ Marked {count} students as {status.capitalize()}!", reply_markup=get_main_menu(roles))
+    # The whole selection is marked (or re-marked) in one statement
+    marked = await AsyncSessionService.mark_attendance_bulk(db, target_sessions, status)
+    count = len(marked)
+
+    # Parent summaries are queued in the outbox with the attendance rows
+    await message.answer(f"✅ Marked {count} students as {status.capitalize()}!", reply_markup=get_main_menu(roles or ["tutor"]))
     await state.clear()
-    db.close()
 
 
 @router.message(AttendanceStates.waiting_for_child_pick)
-async def process_child_pick_attendance(message: types.Message, state: FSMContext):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    roles = [r.role for r in user.roles] if user else []
-
+async def process_child_pick_attendance(message: types.Message, state: FSMContext, db: AsyncSession, roles: List[str]):
     if message.text == "Back":
         await state.clear()
         await message.answer("Main Menu", reply_markup=get_main_menu(roles))
-        db.close()
         return
 
     if not message.text.startswith("Child:"):
         await message.answer("Please select a child from the keyboard.")
-        db.close()
         return
 
     try:
@@ -324,5 +272,3 @@ async def process_child_pick_attendance(message: types.Message, state: FSMContex
         
     except (IndexError, ValueError):
         await message.answer("Invalid selection. Please use the keyboard.")
-    
-    db.close()
@@ -1,37 +1,29 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
-from database.db import SessionLocal
-from services.user_service import UserService
-from services.session_service import SessionService
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.user_service import AsyncUserService
+from services.identity_cache import CachedUser
+from services.session_service import AsyncSessionService
 from bot.states.registration import RegistrationStates
 from bot.keyboards.common import get_role_keyboard, get_main_menu
-from database.models import User, StudentProfile, Enrollment
+from typing import List, Optional
 
 router = Router()
 
 @router.message(F.text == "Back", StateFilter("*"))
-async def back_to_menu(message: types.Message, state: FSMContext):
+async def back_to_menu(message: types.Message, state: FSMContext, user: Optional[CachedUser], roles: List[str]):
     await state.clear()
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    db.close()
-    
     if user:
-        roles = [r.role for r in user.roles]
         await message.answer("Main Menu:", reply_markup=get_main_menu(roles))
     else:
         await message.answer("Please register:", reply_markup=get_role_keyboard())
 
 @router.message(F.text.startswith("Register as "))
-async def register_role_handler(message: types.Message, state: FSMContext):
+async def register_role_handler(message: types.Message, state: FSMContext, user: Optional[CachedUser]):
     new_role = message.text.replace("Register as ", "").lower()
     await state.update_data(role=new_role)
     
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    db.close()
-    
     if user:
         # User exists, skip name/phone and go to role-specific questions
         await state.update_data(full_name=user.full_name, phone=user.phone)
@@ -50,11 +42,7 @@ async def register_role_handler(message: types.Message, state: FSMContext):
         await state.set_state(RegistrationStates.waiting_for_full_name)
 
 @router.message(Command("start"))
-async def cmd_start(message: types.Message, state: FSMContext):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    db.close()
-
+async def cmd_start(message: types.Message, state: FSMContext, user: Optional[CachedUser], roles: List[str]):
     if not user:
         await message.answer(
             f"Welcome to Tutormula! 🎓\n\nPlease select your role to begin registration:",
@@ -62,100 +50,88 @@ async def cmd_start(message: types.Message, state: FSMContext):
         )
         await state.set_state(RegistrationStates.waiting_for_role)
     else:
-        roles = [r.role for r in user.roles]
         await message.answer(
             f"Welcome back, {user.full_name}!",
             reply_markup=get_main_menu(roles)
         )
 
 @router.message(F.text == "Profile")
-async def profile_handler(message: types.Message):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
+async def profile_handler(message: types.Message, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
+    if not user:
+        return
+
+    response_parts = [
+        f"👤 *Profile Details*",
+        f"",
+        f"Name: {user.full_name}"
+    ]
     
-    if user:
-        response_parts = [
-            f"👤 *Profile Details*",
-            f"",
-            f"Name: {user.full_name}"
-        ]
-        
-        if user.phone:
-            response_parts.append(f"Phone: {user.phone}")
-            
-        roles_list = [r.role for r in user.roles] if user.roles else []
-        roles_str = ", ".join(roles_list) if roles_list else "None"
-        response_parts.append(f"Roles: {roles_str}")
-        
-        if "student" in roles_list:
-             student_profile = UserService.get_student_profile(db, user.id)
-             if student_profile:
-                 response_parts.append(f"\n📚 *Student Info*")
-                 response_parts.append(f"Grade: {student_profile.grade}")
-                 response_parts.append(f"School: {student_profile.school}")
-                 response_parts.append(f"Age: {student_profile.age}")
-                 
-                 enrollments = SessionService.get_enrollments_for_student_profile(db, student_profile.id)
-                 response_parts.append(f"Enrolled Tutors: {len(enrollments)}")
-                 
-                 sessions = SessionService.get_user_sessions(db, user.id, "student")
-                 response_parts.append(f"Total Sessions: {len(sessions)}")
+    if user.phone:
+        response_parts.append(f"Phone: {user.phone}")
         
-        if "tutor" in roles_list:
-             tutor_profile = UserService.get_tutor_profile(db, user.id)
-             if tutor_profile:
-                 response_parts.append(f"\n👨‍🏫 *Tutor Info*")
-                 response_parts.append(f"Subjects: {tutor_profile.subjects}")
-                 response_parts.append(f"Education: {tutor_profile.education}")
-                 response_parts.append(f"Experience: {tutor_profile.experience_years} years")
-                 status = "✅ Verified" if tutor_profile.verified else "⏳ Pending Verification"
-                 response_parts.append(f"Status: {status}")
-                 
-                 enrollments = SessionService.get_enrollments_for_tutor(db, user.id)
-                 response_parts.append(f"Total Students: {len(enrollments)}")
-                 
-                 sessions = SessionService.get_user_sessions(db, user.id, "tutor")
-                 response_parts.append(f"Total Sessions: {len(sessions)}")
+    roles_str = ", ".join(roles) if roles else "None"
+    response_parts.append(f"Roles: {roles_str}")
+    
+    if "student" in roles:
+         student_profile = await AsyncUserService.get_student_profile(db, user.id)
+         if student_profile:
+             response_parts.append(f"\n📚 *Student Info*")
+             response_parts.append(f"Grade: {student_profile.grade}")
+             response_parts.append(f"School: {student_profile.school}")
+             response_parts.append(f"Age: {student_profile.age}")
+             
+             enrollments = await AsyncSessionService.get_enrollments_for_student_profile(db, student_profile.id)
+             response_parts.append(f"Enrolled Tutors: {len(enrollments)}")
+             
+             sessions = await AsyncSessionService.get_user_sessions(db, user.id, "student")
+             response_parts.append(f"Total Sessions: {len(sessions)}")
+    
+    if "tutor" in roles:
+         tutor_profile = await AsyncUserService.get_tutor_profile(db, user.id)
+         if tutor_profile:
+             response_parts.append(f"\n👨‍🏫 *Tutor Info*")
+             response_parts.append(f"Subjects: {tutor_profile.subjects}")
+             response_parts.append(f"Education: {tutor_profile.education}")
+             response_parts.append(f"Experience: {tutor_profile.experience_years} years")
+             status = "✅ Verified" if tutor_profile.verified else "⏳ Pending Verification"
+             response_parts.append(f"Status: {status}")
+             
+             enrollments = await AsyncSessionService.get_enrollments_for_tutor(db, user.id)
+             response_parts.append(f"Total Students: {len(enrollments)}")
+             
+             sessions = await AsyncSessionService.get_user_sessions(db, user.id, "tutor")
+             response_parts.append(f"Total Sessions: {len(sessions)}")
 
-        if "parent" in roles_list:
-             parent_profile = UserService.get_parent_profile(db, user.id)
-             if parent_profile:
-                 response_parts.append(f"\n👪 *Parent Info*")
-                 response_parts.append(f"Occupation: {parent_profile.occupation}")
-                 
-                 children = UserService.get_managed_children(db, user.id)
-                 response_parts.append(f"Managed Children: {len(children)}")
+    if "parent" in roles:
+         parent_profile = await AsyncUserService.get_parent_profile(db, user.id)
+         if parent_profile:
+             response_parts.append(f"\n👪 *Parent Info*")
+             response_parts.append(f"Occupation: {parent_profile.occupation}")
+             
+             children = await AsyncUserService.get_managed_children(db, user.id)
+             response_parts.append(f"Managed Children: {len(children)}")
 
-        await message.answer("\n".join(response_parts), parse_mode="Markdown")
-    
-    db.close()
+    await message.answer("\n".join(response_parts), parse_mode="Markdown")
 
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 @router.message(F.text == "Search Tutors")
-async def search_tutors_handler(message: types.Message):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
+async def search_tutors_handler(message: types.Message, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
     if not user:
         await message.answer("Please register first.")
-        db.close()
         return
 
-    roles = [r.role for r in user.roles]
     if "student" not in roles and "parent" not in roles:
         await message.answer("Search functionality is only available for active students and parents.")
-        db.close()
         return
 
-    tutors = UserService.search_tutors(db)
+    tutors = await AsyncUserService.search_tutors(db)
     
     if not tutors:
         await message.answer("No tutors available at the moment.")
     else:
         await message.answer("🔍 *Available Tutors:*", parse_mode="Markdown")
-        for tutor in tutors:
-            profile = UserService.get_tutor_profile(db, tutor.id)
+        for tutor, profile in tutors:
             if profile:
                 subjects = profile.subjects
                 education = profile.education
@@ -180,26 +156,19 @@ async def search_tutors_handler(message: types.Message):
                 reply_markup=builder.as_markup(),
                 parse_mode="Markdown"
             )
-    db.close()
 
 @router.callback_query(F.data.startswith("enroll_"))
-async def enroll_callback(callback: types.CallbackQuery):
+async def enroll_callback(callback: types.CallbackQuery, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
     tutor_id = int(callback.data.split("_")[1])
-    db = SessionLocal()
     
-    user = UserService.get_user_by_telegram_id(db, callback.from_user.id)
     if not user:
         await callback.answer("Please register first!", show_alert=True)
-        db.close()
         return
 
-    roles = [r.role for r in user.roles]
-    
     if "parent" in roles:
-        children = UserService.get_managed_children(db, user.id)
+        children = await AsyncUserService.get_managed_children(db, user.id)
         if not children:
             await callback.answer("Register your child first using 'Add New Student'.", show_alert=True)
-            db.close()
             return
 
         builder = InlineKeyboardBuilder()
@@ -209,51 +178,41 @@ async def enroll_callback(callback: types.CallbackQuery):
         
         await callback.message.answer("Which child are you enrolling?", reply_markup=builder.as_markup())
         await callback.answer()
-        db.close()
         return
 
     # User is a student
-    profile = UserService.get_student_profile(db, user.id)
+    profile = await AsyncUserService.get_student_profile(db, user.id)
     if not profile:
         await callback.answer("You must be registered as a student to enroll.", show_alert=True)
-        db.close()
         return
 
     try:
-        SessionService.enroll_student(db, profile.id, tutor_id)
+        await AsyncSessionService.enroll_student(db, profile.id, tutor_id)
         await callback.message.answer("🎉 Successfully enrolled! The tutor will contact you soon.")
         await callback.answer()
     except Exception as e:
         await callback.answer(f"Error: {str(e)}", show_alert=True)
-    finally:
-        db.close()
 
 @router.callback_query(F.data.startswith("childenroll_"))
-async def handle_child_enrollment(callback: types.CallbackQuery):
+async def handle_child_enrollment(callback: types.CallbackQuery, db: AsyncSession):
     parts = callback.data.split("_")
     tutor_id = int(parts[1])
     child_profile_id = int(parts[2])
     
-    db = SessionLocal()
     try:
-        SessionService.enroll_student(db, child_profile_id, tutor_id)
-        child = db.query(StudentProfile).filter(StudentProfile.id == child_profile_id).first()
+        await AsyncSessionService.enroll_student(db, child_profile_id, tutor_id)
+        child = await AsyncUserService.get_student_profile_by_id(db, child_profile_id)
         child_name = child.full_name if child else "your child"
         
         await callback.message.edit_text(f"🎉 Successfully enrolled **{child_name}** with the tutor!", parse_mode="Markdown")
         await callback.answer()
     except Exception as e:
         await callback.answer(f"Error: {str(e)}", show_alert=True)
-    finally:
-        db.close()
 
 
 
 @router.message(F.text == "Help")
-async def help_handler(message: types.Message):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
+async def help_handler(message: types.Message, user: Optional[CachedUser], roles: List[str]):
     if not user:
         # Generic help for unregistered users
         help_text = (
@@ -262,11 +221,8 @@ async def help_handler(message: types.Message):
             "📞 *Support*: Contact @support_handle for assistance."
         )
         await message.answer(help_text, parse_mode="Markdown")
-        db.close()
         return
     
-    roles = [r.role for r in user.roles]
-    
     # Build role-specific help
     help_sections = []
     
@@ -321,4 +277,3 @@ async def help_handler(message: types.Message):
     
     help_text = "\n".join(help_sections)
     await message.answer(help_text, parse_mode="Markdown")
-    db.close()
@@ -1,12 +1,16 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from bot.states.parent import ParentStates
-from database.db import SessionLocal
-from services.user_service import UserService
-from services.session_service import SessionService
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.user_service import AsyncUserService
+from services.identity_cache import CachedUser
+from services.session_service import AsyncSessionService
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from database.models import User, StudentProfile, Session as TSession, Report
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 from bot.keyboards.common import get_main_menu
+from typing import List, Optional
 
 router = Router()
 
@@ -19,35 +23,27 @@ async def link_child_start(message: types.Message, state: FSMContext):
     await state.set_state(ParentStates.waiting_for_child_name)
 
 @router.message(ParentStates.waiting_for_child_name)
-async def process_child_name(message: types.Message, state: FSMContext):
+async def process_child_name(message: types.Message, state: FSMContext, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
     child_name = message.text.strip()
-    db = SessionLocal()
-    
+
     # Find child profile by name (supporting exact match for security)
-    profile = db.query(StudentProfile).filter(StudentProfile.full_name.ilike(child_name)).first()
+    result = await db.execute(select(StudentProfile).filter(StudentProfile.full_name.ilike(child_name)))
+    profile = result.scalars().first()
     
     if not profile:
         await message.answer("Student profile not found. 🧐\n\n1. Make sure your child has registered as a 'Student'.\n2. Ensure the name matches exactly.\n\nYou can also click 'Add New Student' to create a profile for them directly.")
-        db.close()
         return
         
-    # Get parent user
-    parent = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
     # Link the parent to this student profile
-    profile.parent_id = parent.id
-    db.commit()
+    profile.parent_id = user.id
+    await db.commit()
     
-    roles = [r.role for r in parent.roles]
     await message.answer(f"✅ Successfully linked to {profile.full_name}!", reply_markup=get_main_menu(roles))
-    db.close()
     await state.clear()
 
 @router.message(F.text == "My Children")
-async def my_children_handler(message: types.Message):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    children = UserService.get_managed_children(db, user.id)
+async def my_children_handler(message: types.Message, db: AsyncSession, user: Optional[CachedUser]):
+    children = await AsyncUserService.get_managed_children(db, user.id)
     
     if not children:
         await message.answer("You haven't linked any children yet. Use 'Add New Student' to begin.")
@@ -57,17 +53,13 @@ async def my_children_handler(message: types.Message):
             status = "Self-managed" if child.user_id else "Managed by you"
             resp += f"• {child.full_name} ({status})\n"
         await message.answer(resp, parse_mode="Markdown")
-    db.close()
 
 @router.message(F.text == "Child Reports")
-async def child_reports_handler(message: types.Message):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    children = UserService.get_managed_children(db, user.id)
+async def child_reports_handler(message: types.Message, db: AsyncSession, user: Optional[CachedUser]):
+    children = await AsyncUserService.get_managed_children(db, user.id)
     
     if not children:
         await message.answer("You haven't linked any children yet.")
-        db.close()
         return
 
     builder = ReplyKeyboardBuilder()
@@ -78,24 +70,28 @@ async def child_reports_handler(message: types.Message):
     builder.button(text="Back")
     
     await message.answer("Select a child to view their reports (or view all):", reply_markup=builder.as_markup(resize_keyboard=True))
-    db.close()
 
 @router.message(F.text == "Reports for All Children")
-async def show_all_children_reports(message: types.Message):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    children = UserService.get_managed_children(db, user.id)
+async def show_all_children_reports(message: types.Message, db: AsyncSession, user: Optional[CachedUser]):
+    children = await AsyncUserService.get_managed_children(db, user.id)
     
     if not children:
         await message.answer("No children linked.")
-        db.close()
         return
 
     resp = "📋 *Consolidated Reports for All Children:*\n\n"
     found_any = False
     
     for child in children:
-        sessions = db.query(TSession).filter(TSession.student_profile_id == child.id).join(Report).order_by(TSession.scheduled_at.desc()).limit(3).all()
+        result = await db.execute(
+            select(TSession)
+            .options(selectinload(TSession.report))
+            .filter(TSession.student_profile_id == child.id)
+            .join(Report)
+            .order_by(TSession.scheduled_at.desc())
+            .limit(3)
+        )
+        sessions = result.scalars().all()
         if sessions:
             found_any = True
             resp += f"👤 *{child.full_name}:*\n"
@@ -107,25 +103,22 @@ async def show_all_children_reports(message: types.Message):
         await message.answer("No recent reports found for any of your children.")
     else:
         await message.answer(resp, parse_mode="Markdown")
-    db.close()
 
 @router.message(F.text.startswith("Reports for "))
-async def show_child_reports(message: types.Message):
+async def show_child_reports(message: types.Message, db: AsyncSession, user: Optional[CachedUser]):
     child_name = message.text.replace("Reports for ", "")
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
-    child = db.query(StudentProfile).filter(
+
+    result = await db.execute(select(StudentProfile).filter(
         StudentProfile.parent_id == user.id,
         StudentProfile.full_name == child_name
-    ).first()
+    ))
+    child = result.scalars().first()
     
     if not child:
         await message.answer("Child not found.")
-        db.close()
         return
         
-    sessions = SessionService.get_profile_sessions(db, child.id)
+    sessions = await AsyncSessionService.get_profile_sessions(db, child.id)
     sessions_with_reports = [s for s in sessions if s.report]
     
     if not sessions_with_reports:
@@ -137,8 +130,6 @@ async def show_child_reports(message: types.Message):
             resp += f"⭐ Score: {sess.report.performance_score}/10\n"
             resp += f"📝 {sess.report.content}\n\n"
         await message.answer(resp, parse_mode="Markdown")
-    
-    db.close()
 
 @router.message(F.text == "Add New Student")
 async def add_new_student_start(message: types.Message, state: FSMContext):
@@ -166,7 +157,7 @@ async def process_added_student_school(message: types.Message, state: FSMContext
     await state.set_state(ParentStates.adding_student_age)
 
 @router.message(ParentStates.adding_student_age)
-async def process_added_student_age(message: types.Message, state: FSMContext):
+async def process_added_student_age(message: types.Message, state: FSMContext, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
     try:
         age = int(message.text)
     except ValueError:
@@ -174,21 +165,17 @@ async def process_added_student_age(message: types.Message, state: FSMContext):
         return
 
     data = await state.get_data()
-    db = SessionLocal()
-    parent = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
+
     # Create Student Profile linked to this Parent, but NO NEW USER RECORD
-    UserService.create_student_profile(
+    await AsyncUserService.create_student_profile(
         db,
         full_name=data['added_student_name'],
         grade=data['added_student_grade'],
         school=data['added_student_school'],
         age=age,
-        parent_id=parent.id
+        parent_id=user.id
     )
     
-    roles = [r.role for r in parent.roles]
     await message.answer(f"🎉 Successfully registered and linked {data['added_student_name']} to your account!", 
                          reply_markup=get_main_menu(roles))
-    db.close()
     await state.clear()
@@ -1,8 +1,9 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from bot.states.registration import RegistrationStates
-from database.db import SessionLocal
-from services.user_service import UserService
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.user_service import AsyncUserService
+from services.identity_cache import identity_cache
 from bot.keyboards.common import get_main_menu
 
 router = Router()
@@ -54,7 +55,7 @@ async def process_school(message: types.Message, state: FSMContext):
     await state.set_state(RegistrationStates.waiting_for_age)
 
 @router.message(RegistrationStates.waiting_for_age)
-async def process_age(message: types.Message, state: FSMContext):
+async def process_age(message: types.Message, state: FSMContext, db: AsyncSession):
     try:
         age_val = int(message.text)
     except ValueError:
@@ -62,7 +63,7 @@ async def process_age(message: types.Message, state: FSMContext):
         return
         
     await state.update_data(age=age_val)
-    await finish_registration(message, state)
+    await finish_registration(message, state, db)
 
 # --- Tutor Flow ---
 @router.message(RegistrationStates.waiting_for_subjects)
@@ -78,27 +79,26 @@ async def process_education(message: types.Message, state: FSMContext):
     await state.set_state(RegistrationStates.waiting_for_experience)
 
 @router.message(RegistrationStates.waiting_for_experience)
-async def process_experience(message: types.Message, state: FSMContext):
+async def process_experience(message: types.Message, state: FSMContext, db: AsyncSession):
     try:
         exp_val = int(message.text)
     except ValueError:
         await message.answer("Please enter a valid number for experience.")
         return
     await state.update_data(experience_years=exp_val)
-    await finish_registration(message, state)
+    await finish_registration(message, state, db)
 
 # --- Parent Flow ---
 @router.message(RegistrationStates.waiting_for_occupation)
-async def process_occupation(message: types.Message, state: FSMContext):
+async def process_occupation(message: types.Message, state: FSMContext, db: AsyncSession):
     await state.update_data(occupation=message.text)
-    await finish_registration(message, state)
+    await finish_registration(message, state, db)
 
-async def finish_registration(message: types.Message, state: FSMContext):
+async def finish_registration(message: types.Message, state: FSMContext, db: AsyncSession):
     data = await state.get_data()
-    db = SessionLocal()
-    
+
     # Create User
-    user = UserService.create_user(
+    user = await AsyncUserService.create_user(
         db, 
         telegram_id=message.from_user.id, 
         full_name=data['full_name'],
@@ -106,11 +106,11 @@ async def finish_registration(message: types.Message, state: FSMContext):
     )
     
     # Assign Role
-    UserService.assign_role(db, user.id, data['role'])
+    await AsyncUserService.assign_role(db, user.id, data['role'])
     
     # Create Profile
     if data['role'] == "student":
-        UserService.create_student_profile(
+        await AsyncUserService.create_student_profile(
             db, 
             user_id=user.id, 
             full_name=user.full_name,
@@ -119,15 +119,16 @@ async def finish_registration(message: types.Message, state: FSMContext):
             age=data['age']
         )
     elif data['role'] == "tutor":
-        UserService.create_tutor_profile(
+        await AsyncUserService.create_tutor_profile(
             db, user.id, data['subjects'], data['education'], data['experience_years']
         )
     elif data['role'] == "parent":
-        UserService.create_parent_profile(db, user.id, data['occupation'])
+        await AsyncUserService.create_parent_profile(db, user.id, data['occupation'])
 
-    db.refresh(user)
+    await db.refresh(user, ["roles"])
     roles = [r.role for r in user.roles]
-    db.close()
+    # New profile/role must be visible on the very next update
+    identity_cache.invalidate(message.from_user.id)
     await state.clear()
     await message.answer(
         "Registration complete! 🎉 You can now use the menu below.",
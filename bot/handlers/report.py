@@ -1,29 +1,25 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from bot.states.report import ReportStates
-from database.db import SessionLocal
-from services.user_service import UserService
-from services.session_service import SessionService
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.identity_cache import CachedUser
+from services.session_service import AsyncSessionService
 from bot.keyboards.common import get_main_menu
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from typing import List, Optional
 
 router = Router()
 
 @router.message(F.text == "Create Report")
-async def create_report_start(message: types.Message, state: FSMContext):
-    db = SessionLocal()
-    user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-    
-    if not user or not any(r.role == "tutor" for r in user.roles):
+async def create_report_start(message: types.Message, state: FSMContext, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
+    if not user or "tutor" not in roles:
         await message.answer("Only tutors can create reports.")
-        db.close()
         return
 
-    # Get recent sessions for this tutor
-    sessions = SessionService.get_user_sessions(db, user.id, "tutor")
+    # Participants of the tutor's latest classes
+    sessions = await AsyncSessionService.get_recent_participants(db, user.id)
     if not sessions:
         await message.answer("You have no sessions to report on.")
-        db.close()
         return
 
     builder = ReplyKeyboardBuilder()
@@ -36,7 +32,6 @@ async def create_report_start(message: types.Message, state: FSMContext):
     builder.button(text="Back")
     await message.answer("Which session would you like to report on?", reply_markup=builder.as_markup(resize_keyboard=True))
     await state.set_state(ReportStates.waiting_for_session_pick)
-    db.close()
 
 @router.message(ReportStates.waiting_for_session_pick)
 async def process_session_pick(message: types.Message, state: FSMContext):
@@ -55,7 +50,7 @@ async def process_content(message: types.Message, state: FSMContext):
     await state.set_state(ReportStates.waiting_for_score)
 
 @router.message(ReportStates.waiting_for_score)
-async def process_score(message: types.Message, state: FSMContext):
+async def process_score(message: types.Message, state: FSMContext, db: AsyncSession, user: Optional[CachedUser], roles: List[str]):
     try:
         score = int(message.text)
         if not 1 <= score <= 10:
@@ -63,24 +58,15 @@ async def process_score(message: types.Message, state: FSMContext):
             return
             
         data = await state.get_data()
-        db = SessionLocal()
-        user = UserService.get_user_by_telegram_id(db, message.from_user.id)
-        
-        SessionService.create_report(
+        await AsyncSessionService.create_report(
             db=db,
             session_id=data['session_id'],
             tutor_id=user.id,
             content=data['content'],
             performance_score=score
         )
-        
-        # Check and notify parent
-        from bot.utils.notifications import check_and_notify_parent
-        await check_and_notify_parent(message.bot, data['session_id'], db)
-        
-        roles = [r.role for r in user.roles]
-        db.close()
-        
+        # The parent summary is queued in the outbox with the report
+
         await message.answer("✅ Report created successfully!", reply_markup=get_main_menu(roles))
         await state.clear()
     except ValueError:
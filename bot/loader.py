@@ -2,11 +2,36 @@ from aiogram import Bot, Dispatcher
 from config import settings
 from bot.handlers import common, registration, session, report, parent, attendance
 from services.scheduler_service import setup_scheduler
+from bot.middlewares.db import DbSessionMiddleware
+from bot.update_queue import UpdateQueue
+from bot.dedup import create_dedup_store
+from bot.delivery import DeliveryMiddleware
 
 # Initialize Bot and Dispatcher
 bot = Bot(token=settings.BOT_TOKEN)
+
+# Every outgoing call is rate limited, prioritised and retried here
+delivery = DeliveryMiddleware(
+    global_rate=settings.OUTBOUND_GLOBAL_RATE,
+    chat_rate=settings.OUTBOUND_CHAT_RATE,
+    chat_burst=settings.OUTBOUND_CHAT_BURST,
+    max_retries=settings.OUTBOUND_MAX_RETRIES
+)
+bot.session.middleware(delivery)
 dp = Dispatcher()
 
+# One DB session and identity lookup per update, shared by every handler
+dp.update.outer_middleware(DbSessionMiddleware())
+
+# Updates (webhook or polling) are processed per-chat in order, across chats in parallel
+# Re-delivered update_ids are dropped before they reach the dispatcher
+update_queue = UpdateQueue(
+    dp, bot,
+    maxsize=settings.WEBHOOK_QUEUE_SIZE,
+    workers=settings.WEBHOOK_WORKERS,
+    dedup=create_dedup_store()
+)
+
 from database.db import engine, Base
 from database import models # Ensure models are loaded
 
@@ -0,0 +1,33 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User as TelegramUser
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.db import AsyncSessionLocal
+from services.user_service import AsyncUserService
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: opens one AsyncSession per update and resolves the
+    sender's identity once (through the identity cache). Handlers receive `db`,
+    `user` (a CachedUser snapshot) and `roles` as keyword arguments; the session
+    is always closed when the update is done.
+    """
+
+    def __init__(self, session_pool: async_sessionmaker = AsyncSessionLocal):
+        self.session_pool = session_pool
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.session_pool() as db:
+            from_user: TelegramUser = data.get("event_from_user")
+            user = await AsyncUserService.get_identity(db, from_user.id) if from_user else None
+
+            data["db"] = db
+            data["user"] = user
+            data["roles"] = list(user.roles) if user else []
+            return await handler(event, data)
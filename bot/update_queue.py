@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueueNotRunning(RuntimeError):
+    """put() was called before start() or once stop() began: no worker would process the update"""
+
+
+def get_chat_key(update: Update) -> Optional[int]:
+    """Chat an update belongs to (falls back to the sender for chat-less updates)"""
+    try:
+        event = update.event
+    except Exception:
+        return None
+
+    chat = getattr(event, "chat", None)
+    if chat is None and getattr(event, "message", None) is not None:
+        # Callback queries carry the chat on the message they were attached to
+        chat = event.message.chat
+    if chat is not None:
+        return chat.id
+
+    from_user = getattr(event, "from_user", None)
+    return from_user.id if from_user else None
+
+
+class UpdateQueue:
+    """
+    Bounded queue of incoming Telegram updates in front of dp.feed_update,
+    shared by the webhook (api/main.py) and polling (bot/handler.py).
+
+    A pool of worker tasks processes updates from different chats in parallel
+    (the worker count is the concurrency limit), while updates from the same
+    chat run strictly in arrival order so FSM transitions can't interleave.
+    When a worker picks an update for a chat that is already being handled,
+    it parks it on that chat's lane and moves on; the worker owning the chat
+    drains the lane before taking new work.
+
+    With a `dedup` store, update_ids Telegram re-delivers (e.g. after a slow
+    webhook response) are acknowledged but never reach dp.feed_update.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, maxsize: int = 1000, workers: int = 8, dedup=None):
+        self.dp = dp
+        self.bot = bot
+        self.dedup = dedup
+        self.maxsize = maxsize
+        self.worker_count = workers
+        self._queue: Optional[asyncio.Queue] = None
+        # Counts every accepted update until it is processed, including ones parked on lanes
+        self._capacity: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        # chat key -> updates waiting behind the one currently in flight for that chat
+        self._lanes: Dict[int, Deque[Update]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self.enqueued = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def accepting(self) -> bool:
+        return self.running and not self._stopping
+
+    async def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        self._capacity = asyncio.Semaphore(self.maxsize)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"update-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"Update queue started with {self.worker_count} workers (max {self.maxsize} pending)")
+
+    async def put(self, update: Update, timeout: Optional[float] = None) -> bool:
+        """
+        Enqueue an update. Waits up to `timeout` seconds for room when the queue
+        is full (None waits indefinitely); returns False if it stayed saturated.
+        Duplicates are dropped and reported as accepted. Raises
+        UpdateQueueNotRunning if the workers haven't been started or the
+        queue is stopping.
+        """
+        if not self.accepting:
+            raise UpdateQueueNotRunning("Update queue is not running")
+        try:
+            if timeout is None:
+                await self._capacity.acquire()
+            else:
+                await asyncio.wait_for(self._capacity.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        if self._stopping:
+            # stop() began while this update waited for room
+            self._capacity.release()
+            raise UpdateQueueNotRunning("Update queue is stopping")
+
+        # Checked only once there is room, so a rejected (429) update isn't
+        # remembered and its re-delivery still gets processed
+        if self.dedup is not None and not await self.dedup.check(update.update_id):
+            self._capacity.release()
+            return True
+
+        self._pending += 1
+        self.enqueued += 1
+        self._queue.put_nowait(update)
+        return True
+
+    async def run_polling(self, polling_timeout: int = 30):
+        """Long-poll getUpdates and feed the queue; blocks on a full queue (backpressure)"""
+        allowed_updates = self.dp.resolve_used_update_types()
+        offset = None
+        backoff = 1
+        while True:
+            try:
+                updates = await self.bot.get_updates(
+                    offset=offset, timeout=polling_timeout, allowed_updates=allowed_updates
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Polling failed, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+
+            backoff = 1
+            for update in updates:
+                offset = update.update_id + 1
+                await self.put(update)
+
+    async def stop(self, drain_timeout: float = 30):
+        """Stop accepting work, let workers drain what is queued, then cancel them"""
+        if not self.running:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue drain timed out with {self._pending} updates pending")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._stopping = False
+        logger.info("Update queue stopped")
+
+    def chat_depths(self, limit: int = 20) -> Dict[int, int]:
+        """Pending updates per busy chat (in-flight one included), deepest first"""
+        depths = {chat: len(lane) + 1 for chat, lane in self._lanes.items()}
+        return dict(sorted(depths.items(), key=lambda item: item[1], reverse=True)[:limit])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "stopping": self._stopping,
+            "pending": self._pending,
+            "maxsize": self.maxsize,
+            "active_chats": len(self._lanes),
+            "chat_depths": self.chat_depths(),
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            chat_key = get_chat_key(update)
+
+            if chat_key is None:
+                await self._process(update)
+                continue
+
+            lane = self._lanes.get(chat_key)
+            if lane is not None:
+                # Another worker is handling this chat; it will pick this up in order
+                lane.append(update)
+                continue
+
+            lane = self._lanes[chat_key] = deque()
+            try:
+                await self._process(update)
+                while lane:
+                    await self._process(lane.popleft())
+            finally:
+                del self._lanes[chat_key]
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+            self.processed += 1
+        except Exception:
+            self.failed += 1
+            logger.exception(f"Failed to process update {update.update_id}")
+        finally:
+            self._pending -= 1
+            self._capacity.release()
+            self._queue.task_done()
@@ -1,58 +1,223 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
 from aiogram import Bot
-from sqlalchemy.orm import Session
-from database.models import Session as TSession, Attendance, Report, User, StudentProfile
+from sqlalchemy import Row, and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from config import settings
+from database.db import AsyncSessionLocal, dialect_insert
+from database.models import Session as TSession, Attendance, Report, User, StudentProfile, ParentNotification, OutboxMessage
+from bot.delivery import Priority, send_message
 
-async def check_and_notify_parent(bot: Bot, session_id: int, db: Session):
+logger = logging.getLogger(__name__)
+
+STATUS_EMOJI = {
+    "present": "✅",
+    "absent": "❌",
+    "late": "⏰"
+}
+
+def _render_summary(row) -> str:
+    status_icon = STATUS_EMOJI.get(row.status, "❓")
+    return (
+        f"📩 *Session Update for {row.student_name}*\n\n"
+        f"📚 *Topic*: {row.topic}\n"
+        f"👨‍🏫 *Tutor*: {row.tutor_name or 'Tutor'}\n"
+        f"📅 *Date*: {row.scheduled_at.strftime('%Y-%m-%d %H:%M')}\n\n"
+        f"📊 *Attendance*: {status_icon} {row.status.capitalize()}\n"
+        f"📝 *Report*: {row.content}\n"
+        f"⭐ *Score*: {row.performance_score}/10"
+    )
+
+def _render_digest(rows: List[Row]) -> str:
+    if len(rows) == 1:
+        return _render_summary(rows[0])
+    sections = [_render_summary(row).replace("📩 ", "", 1) for row in rows]
+    return f"📩 *{len(rows)} Session Updates*\n\n" + "\n\n➖➖➖\n\n".join(sections)
+
+
+async def _ready_summaries(db: AsyncSession, session_ids: List[int]) -> Dict[int, Row]:
     """
-    Checks if a session has both attendance and reports.
-    If so, sends a summary to the parent.
+    session_id -> summary row for the given sessions that have attendance, a
+    report and a parent with a chat, and haven't been notified yet. One query;
+    a session's latest report is the one summarised.
     """
-    session = db.query(TSession).filter(TSession.id == session_id).first()
-    if not session:
-        return
-
-    # Check attendance
-    attendance = db.query(Attendance).filter(Attendance.session_id == session_id).first()
-    if not attendance:
-        return
-        
-    # Check report
-    report = db.query(Report).filter(Report.session_id == session_id).first()
-    if not report:
-        return
-        
-    # Check if student has a linked parent
-    student = session.student_profile
-    if not student or not student.parent_id:
-        return
-        
-    parent_user = db.query(User).filter(User.id == student.parent_id).first()
-    if not parent_user or not parent_user.telegram_id:
-        return
-        
-    # Construct message
-    status_emoji = {
-        "present": "✅",
-        "absent": "❌",
-        "late": "⏰"
-    }
-    status_icon = status_emoji.get(attendance.status, "❓")
-    
-    tutor_name = session.tutor.full_name if session.tutor else "Tutor"
-    
-    summary = (
-        f"📩 *Session Update for {student.full_name}*\n\n"
-        f"📚 *Topic*: {session.topic}\n"
-        f"👨‍🏫 *Tutor*: {tutor_name}\n"
-        f"📅 *Date*: {session.scheduled_at.strftime('%Y-%m-%d %H:%M')}\n\n"
-        f"📊 *Attendance*: {status_icon} {attendance.status.capitalize()}\n"
-        f"📝 *Report*: {report.content}\n"
-        f"⭐ *Score*: {report.performance_score}/10"
+    parent = aliased(User)
+    tutor = aliased(User)
+    latest = aliased(Report)
+    latest_report_id = (
+        select(func.max(latest.id))
+        .where(latest.session_id == TSession.id)
+        .correlate(TSession)
+        .scalar_subquery()
     )
-    
-    try:
-        await bot.send_message(chat_id=parent_user.telegram_id, text=summary, parse_mode="Markdown")
-        # Optional: log that we sent it so we don't send multiple times? 
-        # For now, simplistic approach is fine.
-    except Exception as e:
-        print(f"Failed to send parent notification: {e}")
+    result = await db.execute(
+        select(
+            TSession.id.label("session_id"),
+            TSession.topic,
+            TSession.scheduled_at,
+            StudentProfile.full_name.label("student_name"),
+            StudentProfile.parent_id,
+            parent.telegram_id,
+            tutor.full_name.label("tutor_name"),
+            Attendance.status,
+            Report.content,
+            Report.performance_score
+        )
+        .join(StudentProfile, StudentProfile.id == TSession.student_profile_id)
+        .join(parent, parent.id == StudentProfile.parent_id)
+        .join(Attendance, Attendance.session_id == TSession.id)
+        .join(Report, Report.id == latest_report_id)
+        .outerjoin(tutor, tutor.id == TSession.tutor_id)
+        .outerjoin(ParentNotification, and_(
+            ParentNotification.session_id == TSession.id,
+            ParentNotification.parent_id == StudentProfile.parent_id
+        ))
+        .where(
+            TSession.id.in_(session_ids),
+            parent.telegram_id.isnot(None),
+            ParentNotification.id.is_(None)
+        )
+        .order_by(TSession.id, Attendance.id)
+    )
+    # A session can carry several attendance rows; summarise the first like before
+    ready = {}
+    for row in result:
+        ready.setdefault(row.session_id, row)
+    return ready
+
+
+class OutboxDispatcher:
+    """
+    Drains outbox_messages in batches and sends the parent session summaries.
+
+    Events become due after the coalescing window (see OutboxService). Once a
+    parent's earliest event is due, that parent's later events are claimed
+    with it even if their own window hasn't elapsed, so updates entered one
+    after another (or for a whole group class) reach every parent as one
+    combined message. A send is recorded in parent_notifications only after
+    it succeeded (at-least-once: a crash in between re-sends on the next pass,
+    while the record keeps later passes from sending again). Failed events are
+    retried with exponential backoff and dead-lettered after max_attempts.
+    Runs as a scheduler job, so only the elected leader dispatches.
+    """
+
+    def __init__(self, batch_size: int = 200, max_attempts: int = 5, retry_base: float = 30,
+                 session_pool=AsyncSessionLocal):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.session_pool = session_pool
+        self.messages_sent = 0
+        self.sessions_sent = 0
+        self.failed = 0
+
+    async def dispatch(self, bot: Bot) -> int:
+        """Process due events until the outbox is drained; returns events processed"""
+        processed = 0
+        while True:
+            async with self.session_pool() as db:
+                count = await self._dispatch_batch(db, bot)
+            processed += count
+            if count < self.batch_size:
+                return processed
+
+    async def _dispatch_batch(self, db: AsyncSession, bot: Bot) -> int:
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(OutboxMessage)
+            .where(OutboxMessage.status == "pending", OutboxMessage.available_at <= now)
+            .order_by(OutboxMessage.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        events = list(result.scalars())
+        if not events:
+            return 0
+        events += await self._claim_parent_siblings(db, events)
+
+        ready = await _ready_summaries(db, list({event.session_id for event in events}))
+        by_parent: Dict[int, List[Row]] = {}
+        for row in ready.values():
+            by_parent.setdefault(row.parent_id, []).append(row)
+
+        failed_sessions: Dict[int, str] = {}
+        for parent_id, rows in by_parent.items():
+            try:
+                await send_message(bot, rows[0].telegram_id, _render_digest(rows),
+                                   priority=Priority.NOTIFICATION, parse_mode="Markdown")
+                self.messages_sent += 1
+                self.sessions_sent += len(rows)
+            except Exception as e:
+                # Flood control and transient errors were already retried by the delivery middleware
+                logger.error(f"Failed to send parent notification to parent {parent_id}: {e}")
+                self.failed += 1
+                failed_sessions.update({row.session_id: str(e) for row in rows})
+
+        delivered = [row for row in ready.values() if row.session_id not in failed_sessions]
+        if delivered:
+            await db.execute(
+                dialect_insert(db.bind.dialect.name, ParentNotification)
+                .values([
+                    {"session_id": row.session_id, "parent_id": row.parent_id, "sent_at": now}
+                    for row in delivered
+                ])
+                .on_conflict_do_nothing(index_elements=["session_id", "parent_id"])
+            )
+
+        for event in events:
+            error = failed_sessions.get(event.session_id)
+            if error is None:
+                # Sent, or nothing to send yet (e.g. attendance without a report)
+                event.status = "done"
+                event.processed_at = now
+                continue
+            event.attempts += 1
+            event.last_error = error
+            if event.attempts >= self.max_attempts:
+                event.status = "dead"
+                event.processed_at = now
+            else:
+                event.available_at = now + timedelta(seconds=self.retry_base * 2 ** (event.attempts - 1))
+        await db.commit()
+        return len(events)
+
+    async def _claim_parent_siblings(self, db: AsyncSession, events: List[OutboxMessage]) -> List[OutboxMessage]:
+        """
+        Pending first-attempt events not yet due whose session belongs to a child
+        of a parent with a due event. Events in retry backoff keep their schedule.
+        """
+        due_parents = (
+            select(StudentProfile.parent_id)
+            .join(TSession, TSession.student_profile_id == StudentProfile.id)
+            .where(TSession.id.in_({event.session_id for event in events}), StudentProfile.parent_id.isnot(None))
+        )
+        result = await db.execute(
+            select(OutboxMessage)
+            .join(TSession, TSession.id == OutboxMessage.session_id)
+            .join(StudentProfile, StudentProfile.id == TSession.student_profile_id)
+            .where(
+                OutboxMessage.status == "pending",
+                OutboxMessage.attempts == 0,
+                OutboxMessage.id.not_in([event.id for event in events]),
+                StudentProfile.parent_id.in_(due_parents)
+            )
+            .order_by(OutboxMessage.id)
+            .with_for_update(skip_locked=True, of=OutboxMessage)
+        )
+        return list(result.scalars())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "messages_sent": self.messages_sent,
+            "sessions_sent": self.sessions_sent,
+            "failed_sends": self.failed,
+        }
+
+
+outbox_dispatcher = OutboxDispatcher(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    retry_base=settings.OUTBOX_RETRY_BASE_SECONDS
+)
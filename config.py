@@ -6,6 +6,54 @@ load_dotenv()
 class Settings:
     BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tutormula.db")
+    # Optional override; derived from DATABASE_URL (aiosqlite/asyncpg) when unset
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
     ADMIN_SECRET = os.getenv("ADMIN_SECRET", "supersecret")
 
+    # Identity cache for telegram_id -> user/roles lookups done on every update
+    IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+    IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "300"))
+    # Seconds between exchanges of invalidations with other processes through the database
+    IDENTITY_CACHE_SYNC_SECONDS = float(os.getenv("IDENTITY_CACHE_SYNC_SECONDS", "5"))
+
+    # Update ingestion: bounded update queue drained by a worker pool.
+    # Workers bound how many chats are processed concurrently.
+    WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+    # Seconds a webhook call waits for queue room before answering 429
+    WEBHOOK_ENQUEUE_TIMEOUT = float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", "1.0"))
+
+    # Drop Telegram re-deliveries of an update_id seen within the window.
+    # "memory" is per process; "database" shares seen ids across workers.
+    DEDUP_BACKEND = os.getenv("DEDUP_BACKEND", "memory")
+    DEDUP_WINDOW_SECONDS = float(os.getenv("DEDUP_WINDOW_SECONDS", "3600"))
+    DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "100000"))
+
+    # Outbound Telegram calls: token buckets (messages/s) and retry policy
+    OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "25"))
+    OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+    OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+    OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+    # Daily parent reports: parents per chunk (one bulk log write each) and sends in flight
+    REPORT_CHUNK_SIZE = int(os.getenv("REPORT_CHUNK_SIZE", "500"))
+    REPORT_SEND_CONCURRENCY = int(os.getenv("REPORT_SEND_CONCURRENCY", "50"))
+
+    # Scheduler leader election: a dead leader's SQLite lease expires after this
+    SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+    # A job missed while no process was running still fires if it is at most this late
+    SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "21600"))
+
+    # Parent session summaries wait this long in the outbox so a parent's updates go out as one message
+    NOTIFY_COALESCE_SECONDS = float(os.getenv("NOTIFY_COALESCE_SECONDS", "120"))
+
+    # Outbox dispatcher: poll interval, batch size, retry backoff and dead-letter threshold
+    OUTBOX_POLL_SECONDS = int(os.getenv("OUTBOX_POLL_SECONDS", "10"))
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+    OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+    # Nightly rebuild (UTC, HH:MM) of session_daily_rollups from the base tables
+    ROLLUP_RECONCILE_TIME = os.getenv("ROLLUP_RECONCILE_TIME", "03:00")
+
 settings = Settings()
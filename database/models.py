@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey, Text, Boolean, BigInteger
+    Column, Integer, String, Date, DateTime, ForeignKey, Text, Boolean, BigInteger, Index, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,12 +7,17 @@ from database.db import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination of the admin lists: sort column, then id
+        Index("ix_users_full_name_id", "full_name", "id"),
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     telegram_id = Column(BigInteger, unique=True, index=True)
     full_name = Column(String, nullable=False)
     phone = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     roles = relationship("UserRole", back_populates="user")
     # New relationships for the advanced model
@@ -21,6 +26,9 @@ class User(Base):
 
 class UserRole(Base):
     __tablename__ = "user_roles"
+    __table_args__ = (
+        Index("ix_user_roles_user_id_role", "user_id", "role"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -31,6 +39,13 @@ class UserRole(Base):
 
 class StudentProfile(Base):
     __tablename__ = "student_profiles"
+    __table_args__ = (
+        Index("ix_student_profiles_user_id", "user_id"),
+        Index("ix_student_profiles_parent_id", "parent_id"),
+        Index("ix_student_profiles_full_name_id", "full_name", "id"),
+        Index("ix_student_profiles_grade_id", "grade", "id"),
+        Index("ix_student_profiles_school_id", "school", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # The student's own account
@@ -82,8 +97,55 @@ class ParentReportLog(Base):
     error_message = Column(Text, nullable=True)
 
 
+class ReportRun(Base):
+    """One daily report run; the cursor makes it resumable after a restart"""
+    __tablename__ = "report_runs"
+
+    id = Column(Integer, primary_key=True)
+    run_date = Column(Date, unique=True, nullable=False)
+    # Sessions reported since this moment are included (fixed for the whole run)
+    window_start = Column(DateTime, nullable=False)
+    status = Column(String, default="running")  # running, completed
+    # Parents are processed in parent_id order; everything up to here is done
+    cursor_parent_id = Column(Integer, default=0)
+    total_parents = Column(Integer, default=0)
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ReportRunItem(Base):
+    """Per-parent outcome of a daily report run"""
+    __tablename__ = "report_run_items"
+    __table_args__ = (
+        UniqueConstraint("run_date", "parent_id", name="uq_report_run_items_run_date_parent_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    run_date = Column(Date, nullable=False)
+    parent_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String)  # success, failed
+    error_message = Column(Text, nullable=True)
+    processed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SchedulerLease(Base):
+    """Leader lease for scheduled jobs on databases without advisory locks (SQLite)"""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        Index("ix_enrollments_tutor_user_id_active", "tutor_user_id", "active"),
+        Index("ix_enrollments_student_profile_id_active", "student_profile_id", "active"),
+    )
 
     id = Column(Integer, primary_key=True)
     student_profile_id = Column(Integer, ForeignKey("student_profiles.id")) # Changed from student_id
@@ -95,16 +157,45 @@ class Enrollment(Base):
     tutor = relationship("User", foreign_keys=[tutor_user_id])
 
 
+class SessionGroup(Base):
+    """
+    One class occurrence (tutor, time, topic). Each enrolled student takes part
+    through a Session row (the participant), which carries their attendance and report.
+    """
+    __tablename__ = "session_groups"
+    __table_args__ = (
+        Index("ix_session_groups_tutor_id_scheduled_at", "tutor_id", "scheduled_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    tutor_id = Column(Integer, ForeignKey("users.id"))
+    scheduled_at = Column(DateTime)
+    duration_minutes = Column(Integer)
+    topic = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    tutor = relationship("User", foreign_keys=[tutor_id])
+    participants = relationship("Session", back_populates="group")
+
+
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_tutor_id_scheduled_at", "tutor_id", "scheduled_at"),
+        Index("ix_sessions_student_profile_id_scheduled_at", "student_profile_id", "scheduled_at"),
+        Index("ix_sessions_group_id", "group_id"),
+    )
 
     id = Column(Integer, primary_key=True)
+    # The class this participant row belongs to; tutor/time/topic below mirror it
+    group_id = Column(Integer, ForeignKey("session_groups.id"), nullable=True)
     tutor_id = Column(Integer, ForeignKey("users.id"))
     student_profile_id = Column(Integer, ForeignKey("student_profiles.id")) # Link to profile, not user
     scheduled_at = Column(DateTime)
     duration_minutes = Column(Integer)
     topic = Column(String)
 
+    group = relationship("SessionGroup", back_populates="participants")
     student_profile = relationship("StudentProfile", back_populates="sessions")
     tutor = relationship("User", foreign_keys=[tutor_id])
     
@@ -114,6 +205,10 @@ class Session(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # One attendance row per participant; marking again updates it in place
+        Index("ux_attendance_session_id_student_profile_id", "session_id", "student_profile_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     session_id = Column(Integer, ForeignKey("sessions.id"))
@@ -127,17 +222,85 @@ class Attendance(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_session_id", "session_id"),
+        Index("ix_reports_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     session_id = Column(Integer, ForeignKey("sessions.id"))
     tutor_id = Column(Integer, ForeignKey("users.id"))
     content = Column(Text)
     performance_score = Column(Integer)  # 1–10
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     session = relationship("Session", back_populates="report")
 
 
+class SessionDailyRollup(Base):
+    """
+    Session, report and attendance totals per (day, tutor, student profile),
+    derived from the tables above by services/stats_rollup_service.py
+    """
+    __tablename__ = "session_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "tutor_id", "student_profile_id", name="uq_session_daily_rollups_day_tutor_student"),
+        Index("ix_session_daily_rollups_tutor_id_day", "tutor_id", "day"),
+        Index("ix_session_daily_rollups_student_profile_id_day", "student_profile_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    # No foreign keys: rows are rebuilt from the base tables and never joined for integrity
+    tutor_id = Column(Integer, nullable=False)
+    student_profile_id = Column(Integer, nullable=False)
+    sessions = Column(Integer, default=0, nullable=False)
+    minutes = Column(Integer, default=0, nullable=False)
+    reports = Column(Integer, default=0, nullable=False)
+    # Sum and count of non-null performance scores, so averages can be combined across rows
+    score_sum = Column(Integer, default=0, nullable=False)
+    scored = Column(Integer, default=0, nullable=False)
+    present = Column(Integer, default=0, nullable=False)
+    absent = Column(Integer, default=0, nullable=False)
+    late = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ParentNotification(Base):
+    """A session summary already sent to a parent; at most one per (session, parent)"""
+    __tablename__ = "parent_notifications"
+    __table_args__ = (
+        UniqueConstraint("session_id", "parent_id", name="uq_parent_notifications_session_id_parent_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    parent_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sent_at = Column(DateTime, default=datetime.utcnow)
+
+
+class OutboxMessage(Base):
+    """
+    Notification event written in the same transaction as the change that
+    triggers it, and delivered later by the outbox dispatcher.
+    """
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_messages_status_available_at", "status", "available_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    event = Column(String, nullable=False)  # session_updated
+    session_id = Column(Integer, ForeignKey("sessions.id"), nullable=True)
+    status = Column(String, default="pending")  # pending, done, dead
+    attempts = Column(Integer, default=0)
+    # Not picked up before this moment (coalescing window, retry backoff)
+    available_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
@@ -155,3 +318,27 @@ class AppSetting(Base):
     key = Column(String, primary_key=True)
     value = Column(String)
     description = Column(String)
+
+
+class ProcessedUpdate(Base):
+    """Telegram update_ids already accepted, shared by all workers to drop re-deliveries"""
+    __tablename__ = "processed_updates"
+    __table_args__ = (
+        Index("ix_processed_updates_received_at", "received_at"),
+    )
+
+    update_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IdentityInvalidation(Base):
+    """Identity cache invalidations, replayed by every process (see services/identity_cache.py)"""
+    __tablename__ = "identity_invalidations"
+    __table_args__ = (
+        Index("ix_identity_invalidations_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=True)
+    telegram_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
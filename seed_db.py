@@ -1,6 +1,7 @@
 from database.db import SessionLocal
 from database.models import User, UserRole, StudentProfile, TutorProfile, Session as TSession, Report, ParentProfile
 from datetime import datetime, timedelta
+from services.stats_rollup_service import StatsRollupService
 import random
 
 def seed_data():
@@ -100,6 +101,8 @@ def seed_data():
             db.add(report)
 
     db.commit()
+    # Sessions above are inserted directly, so build their rollups in one pass
+    StatsRollupService.reconcile(db)
     print("Advanced Seeding complete!")
     db.close()
 
@@ -1,7 +1,12 @@
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from database.models import User, UserRole, StudentProfile, TutorProfile, ParentProfile, Session as TSession, Report, Enrollment, Attendance, AuditLog
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+from services.identity_cache import identity_cache
+from services.session_service import SessionService
+from services.admin_session_service import AdminSessionService
+from services.stats_rollup_service import StatsRollupService
 
 class AdminCRUDService:
     """Advanced CRUD operations for admin dashboard"""
@@ -10,45 +15,45 @@ class AdminCRUDService:
     @staticmethod
     def get_student_detail(db: Session, student_profile_id: int) -> Optional[Dict[str, Any]]:
         """Get comprehensive student details including parent, sessions, and attendance"""
-        profile = db.query(StudentProfile).filter(StudentProfile.id == student_profile_id).first()
-        if not profile:
+        # Profile with its parent account and parent profile
+        row = (
+            db.query(StudentProfile, User, ParentProfile)
+            .outerjoin(User, User.id == StudentProfile.parent_id)
+            .outerjoin(ParentProfile, ParentProfile.user_id == User.id)
+            .filter(StudentProfile.id == student_profile_id)
+            .first()
+        )
+        if not row:
             return None
+        profile, parent, parent_profile = row
         
-        # Get parent info if exists
         parent_info = None
-        if profile.parent_id:
-            parent = db.query(User).filter(User.id == profile.parent_id).first()
-            if parent:
-                parent_profile = db.query(ParentProfile).filter(ParentProfile.user_id == parent.id).first()
-                parent_info = {
-                    "id": parent.id,
-                    "name": parent.full_name,
-                    "phone": parent.phone,
-                    "occupation": parent_profile.occupation if parent_profile else None
-                }
+        if parent:
+            parent_info = {
+                "id": parent.id,
+                "name": parent.full_name,
+                "phone": parent.phone,
+                "occupation": parent_profile.occupation if parent_profile else None
+            }
         
-        # Get enrollments
-        enrollments = db.query(Enrollment).filter(Enrollment.student_profile_id == profile.id).all()
-        tutors = []
-        for enr in enrollments:
-            tutor = db.query(User).filter(User.id == enr.tutor_user_id).first()
-            if tutor:
-                tutors.append({
-                    "id": tutor.id,
-                    "name": tutor.full_name,
-                    "enrolled_date": enr.start_date
-                })
+        # Enrollments with their tutors
+        enrollments = (
+            db.query(Enrollment, User)
+            .join(User, User.id == Enrollment.tutor_user_id)
+            .filter(Enrollment.student_profile_id == profile.id)
+            .all()
+        )
+        tutors = [
+            {"id": tutor.id, "name": tutor.full_name, "enrolled_date": enr.start_date}
+            for enr, tutor in enrollments
+        ]
         
-        # Get sessions with attendance
-        sessions = db.query(TSession).filter(TSession.student_profile_id == profile.id).order_by(TSession.scheduled_at.desc()).limit(20).all()
+        # Latest sessions with tutor and attendance in one query
+        sessions = AdminSessionService.detailed_sessions_query(
+            db, TSession.student_profile_id == profile.id, limit=20
+        ).all()
         session_list = []
-        for sess in sessions:
-            tutor = db.query(User).filter(User.id == sess.tutor_id).first()
-            attendance = db.query(Attendance).filter(
-                Attendance.session_id == sess.id,
-                Attendance.student_profile_id == profile.id
-            ).first()
-            
+        for sess, tutor, _, attendance, _ in sessions:
             session_list.append({
                 "id": sess.id,
                 "topic": sess.topic,
@@ -88,6 +93,7 @@ class AdminCRUDService:
             profile.age = data["age"]
         
         db.commit()
+        identity_cache.invalidate_user(profile.user_id)
         
         # Log the action
         AdminCRUDService._log_action(db, "UPDATE", "StudentProfile", student_profile_id, f"Updated student: {profile.full_name}")
@@ -101,14 +107,19 @@ class AdminCRUDService:
             return False
         
         student_name = profile.full_name
+        linked_user_ids = (profile.user_id, profile.parent_id)
         
         # Delete related records
         db.query(Enrollment).filter(Enrollment.student_profile_id == student_profile_id).delete()
         db.query(Attendance).filter(Attendance.student_profile_id == student_profile_id).delete()
         # Sessions remain for historical purposes but could be marked
+        session_ids = [row[0] for row in db.query(TSession.id).filter(TSession.student_profile_id == student_profile_id)]
+        StatsRollupService.refresh_sessions(db, session_ids)
         
         db.delete(profile)
         db.commit()
+        for user_id in linked_user_ids:
+            identity_cache.invalidate_user(user_id)
         
         AdminCRUDService._log_action(db, "DELETE", "StudentProfile", student_profile_id, f"Deleted student: {student_name}", admin_id)
         return True
@@ -117,34 +128,37 @@ class AdminCRUDService:
     @staticmethod
     def get_tutor_detail(db: Session, tutor_id: int) -> Optional[Dict[str, Any]]:
         """Get comprehensive tutor details"""
-        user = db.query(User).filter(User.id == tutor_id).first()
-        if not user:
-            return None
-        
-        profile = db.query(TutorProfile).filter(TutorProfile.user_id == tutor_id).first()
-        if not profile:
+        row = (
+            db.query(User, TutorProfile)
+            .join(TutorProfile, TutorProfile.user_id == User.id)
+            .filter(User.id == tutor_id)
+            .first()
+        )
+        if not row:
             return None
+        user, profile = row
         
-        # Get enrolled students
-        enrollments = db.query(Enrollment).filter(Enrollment.tutor_user_id == tutor_id).all()
-        students = []
-        for enr in enrollments:
-            student_profile = db.query(StudentProfile).filter(StudentProfile.id == enr.student_profile_id).first()
-            if student_profile:
-                students.append({
-                    "id": student_profile.id,
-                    "name": student_profile.full_name,
-                    "grade": student_profile.grade,
-                    "enrolled_date": enr.start_date
-                })
+        # Enrolled students
+        enrollments = (
+            db.query(Enrollment, StudentProfile)
+            .join(StudentProfile, StudentProfile.id == Enrollment.student_profile_id)
+            .filter(Enrollment.tutor_user_id == tutor_id)
+            .all()
+        )
+        students = [
+            {
+                "id": student_profile.id,
+                "name": student_profile.full_name,
+                "grade": student_profile.grade,
+                "enrolled_date": enr.start_date
+            }
+            for enr, student_profile in enrollments
+        ]
         
-        # Get sessions
-        sessions = db.query(TSession).filter(TSession.tutor_id == tutor_id).order_by(TSession.scheduled_at.desc()).limit(20).all()
+        # Latest sessions with student and report in one query
+        sessions = AdminSessionService.detailed_sessions_query(db, TSession.tutor_id == tutor_id, limit=20).all()
         session_list = []
-        for sess in sessions:
-            student = db.query(StudentProfile).filter(StudentProfile.id == sess.student_profile_id).first()
-            report = db.query(Report).filter(Report.session_id == sess.id).first()
-            
+        for sess, _, student, _, report in sessions:
             session_list.append({
                 "id": sess.id,
                 "topic": sess.topic,
@@ -187,6 +201,7 @@ class AdminCRUDService:
             profile.verified = data["verified"]
         
         db.commit()
+        identity_cache.invalidate_user(tutor_id)
         
         user = db.query(User).filter(User.id == tutor_id).first()
         AdminCRUDService._log_action(db, "UPDATE", "TutorProfile", tutor_id, f"Updated tutor: {user.full_name if user else tutor_id}", admin_id)
@@ -196,22 +211,44 @@ class AdminCRUDService:
     @staticmethod
     def get_parent_detail(db: Session, parent_id: int) -> Optional[Dict[str, Any]]:
         """Get comprehensive parent details"""
-        user = db.query(User).filter(User.id == parent_id).first()
-        if not user:
-            return None
-        
-        profile = db.query(ParentProfile).filter(ParentProfile.user_id == parent_id).first()
-        if not profile:
+        row = (
+            db.query(User, ParentProfile)
+            .join(ParentProfile, ParentProfile.user_id == User.id)
+            .filter(User.id == parent_id)
+            .first()
+        )
+        if not row:
             return None
+        user, profile = row
         
-        # Get all children
-        children = db.query(StudentProfile).filter(StudentProfile.parent_id == parent_id).all()
+        # All children with their session and report counts, aggregated per child
+        child_ids = select(StudentProfile.id).where(StudentProfile.parent_id == parent_id)
+        session_counts = (
+            select(TSession.student_profile_id, func.count(TSession.id).label("total"))
+            .where(TSession.student_profile_id.in_(child_ids))
+            .group_by(TSession.student_profile_id)
+            .subquery()
+        )
+        report_counts = (
+            select(TSession.student_profile_id, func.count(Report.id).label("total"))
+            .join(Report, Report.session_id == TSession.id)
+            .where(TSession.student_profile_id.in_(child_ids))
+            .group_by(TSession.student_profile_id)
+            .subquery()
+        )
+        children = (
+            db.query(
+                StudentProfile,
+                func.coalesce(session_counts.c.total, 0),
+                func.coalesce(report_counts.c.total, 0)
+            )
+            .outerjoin(session_counts, session_counts.c.student_profile_id == StudentProfile.id)
+            .outerjoin(report_counts, report_counts.c.student_profile_id == StudentProfile.id)
+            .filter(StudentProfile.parent_id == parent_id)
+            .all()
+        )
         children_list = []
-        for child in children:
-            # Get child's sessions and reports
-            sessions = db.query(TSession).filter(TSession.student_profile_id == child.id).count()
-            reports = db.query(Report).join(TSession).filter(TSession.student_profile_id == child.id).count()
-            
+        for child, sessions, reports in children:
             children_list.append({
                 "id": child.id,
                 "name": child.full_name,
@@ -236,17 +273,25 @@ class AdminCRUDService:
     @staticmethod
     def get_session_detail(db: Session, session_id: int) -> Optional[Dict[str, Any]]:
         """Get detailed session information"""
-        session = db.query(TSession).filter(TSession.id == session_id).first()
-        if not session:
+        row = AdminSessionService.detailed_sessions_query(db, TSession.id == session_id).first()
+        if not row:
             return None
+        session, tutor, student, attendance, report = row
         
-        tutor = db.query(User).filter(User.id == session.tutor_id).first()
-        student = db.query(StudentProfile).filter(StudentProfile.id == session.student_profile_id).first()
-        attendance = db.query(Attendance).filter(Attendance.session_id == session_id).first()
-        report = db.query(Report).filter(Report.session_id == session_id).first()
+        # The class this participant session belongs to, with everyone in it
+        participants = []
+        if session.group_id:
+            participants = (
+                db.query(TSession.id, StudentProfile.id, StudentProfile.full_name)
+                .join(StudentProfile, StudentProfile.id == TSession.student_profile_id)
+                .filter(TSession.group_id == session.group_id)
+                .order_by(TSession.id)
+                .all()
+            )
         
         return {
             "id": session.id,
+            "group_id": session.group_id,
             "topic": session.topic,
             "scheduled_at": session.scheduled_at,
             "duration_minutes": session.duration_minutes,
@@ -268,28 +313,19 @@ class AdminCRUDService:
                 "content": report.content if report else None,
                 "score": report.performance_score if report else None,
                 "created_at": report.created_at if report else None
-            } if report else None
+            } if report else None,
+            "participants": [
+                {"session_id": sid, "student_id": pid, "name": name}
+                for sid, pid, name in participants
+            ]
         }
     
     @staticmethod
     def update_attendance(db: Session, session_id: int, student_profile_id: int, status: str, admin_id: int) -> bool:
-        """Update or create attendance record"""
-        attendance = db.query(Attendance).filter(
-            Attendance.session_id == session_id,
-            Attendance.student_profile_id == student_profile_id
-        ).first()
-        
-        if attendance:
-            attendance.status = status
-        else:
-            attendance = Attendance(
-                session_id=session_id,
-                student_profile_id=student_profile_id,
-                status=status
-            )
-            db.add(attendance)
+        """Update or create attendance record; False if the session isn't this student's"""
+        if not SessionService.mark_attendance_bulk(db, [session_id], status, student_profile_id):
+            return False
         
-        db.commit()
         AdminCRUDService._log_action(db, "UPDATE", "Attendance", session_id, f"Set attendance to {status}", admin_id)
         return True
     
@@ -329,34 +365,36 @@ class AdminCRUDService:
     # ==================== STATISTICS ====================
     @staticmethod
     def get_dashboard_stats(db: Session) -> Dict[str, Any]:
-        """Get comprehensive dashboard statistics"""
-        total_students = db.query(StudentProfile).count()
-        total_tutors = db.query(TutorProfile).count()
-        total_parents = db.query(ParentProfile).count()
-        total_sessions = db.query(TSession).count()
-        total_reports = db.query(Report).count()
-        
-        # Active enrollments
-        active_enrollments = db.query(Enrollment).filter(Enrollment.active == True).count()
-        
-        # Verified vs unverified tutors
-        verified_tutors = db.query(TutorProfile).filter(TutorProfile.verified == True).count()
+        """
+        Get comprehensive dashboard statistics: the entity counts in one
+        SELECT, session and report totals from session_daily_rollups.
+
+        The totals follow the rollup counting rules: one report (the latest)
+        per session, recent_reports_7d by the day the session was scheduled
+        rather than when the report was written, and sessions without a
+        time, tutor or student left out.
+        """
+        counts = db.execute(select(
+            select(func.count(StudentProfile.id)).scalar_subquery().label("students"),
+            select(func.count(TutorProfile.user_id)).scalar_subquery().label("tutors"),
+            select(func.count(ParentProfile.user_id)).scalar_subquery().label("parents"),
+            select(func.count(Enrollment.id)).where(Enrollment.active == True).scalar_subquery().label("active_enrollments"),
+            select(func.count(TutorProfile.user_id)).where(TutorProfile.verified == True).scalar_subquery().label("verified_tutors")
+        )).one()
         
-        # Recent activity (last 7 days)
-        from datetime import timedelta
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_sessions = db.query(TSession).filter(TSession.scheduled_at >= week_ago).count()
-        recent_reports = db.query(Report).filter(Report.created_at >= week_ago).count()
+        # Recent activity (last 7 days, by session day)
+        week_ago = (datetime.utcnow() - timedelta(days=7)).date()
+        activity = StatsRollupService.get_recent_totals(db, week_ago)
         
         return {
-            "total_students": total_students,
-            "total_tutors": total_tutors,
-            "total_parents": total_parents,
-            "total_sessions": total_sessions,
-            "total_reports": total_reports,
-            "active_enrollments": active_enrollments,
-            "verified_tutors": verified_tutors,
-            "unverified_tutors": total_tutors - verified_tutors,
-            "recent_sessions_7d": recent_sessions,
-            "recent_reports_7d": recent_reports
+            "total_students": counts.students,
+            "total_tutors": counts.tutors,
+            "total_parents": counts.parents,
+            "total_sessions": activity["sessions"],
+            "total_reports": activity["reports"],
+            "active_enrollments": counts.active_enrollments,
+            "verified_tutors": counts.verified_tutors,
+            "unverified_tutors": counts.tutors - counts.verified_tutors,
+            "recent_sessions_7d": activity["recent_sessions"],
+            "recent_reports_7d": activity["recent_reports"]
         }
@@ -1,20 +1,49 @@
 from sqlalchemy.orm import Session, joinedload, aliased
-from sqlalchemy import func
-from database.models import User, UserRole, StudentProfile, TutorProfile, Session as TSession, Report, AppSetting, ParentProfile
+from sqlalchemy import and_, case, func, select
+from database.models import User, UserRole, StudentProfile, TutorProfile, Session as TSession, Report, AppSetting, ParentProfile, ReportRun, Attendance
+from services.pagination import keyset_page
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from types import SimpleNamespace
+from typing import Dict, Any, Optional
+
+# Sortable columns of the admin lists; each is backed by an index ending in the id
+STUDENT_SORTS = {"id": StudentProfile.id, "full_name": StudentProfile.full_name}
+USER_SORTS = {"id": User.id, "full_name": User.full_name, "created_at": User.created_at}
+REPORT_SORTS = {"created_at": Report.created_at, "id": Report.id}
+
+# Shortcut windows of the session stats, ending now
+PERIODS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1), "monthly": timedelta(days=30)}
+ATTENDANCE_STATUSES = ("present", "absent", "late")
+
+# Joins aggregated children names; a control character can't clash with a name
+CHILDREN_SEPARATOR = "\x1f"
+
+def _aggregate_strings(dialect_name: str, column, separator: str):
+    """string_agg on Postgres, group_concat elsewhere (SQLite)"""
+    if dialect_name == "postgresql":
+        return func.string_agg(column, separator)
+    return func.group_concat(column, separator)
 
 class AdminService:
     @staticmethod
-    def get_all_students(db: Session) -> List[Dict[str, Any]]:
-        # This now returns all student profiles, whether they have their own account or not
-        results = db.query(StudentProfile).all()
+    def get_all_students(db: Session, cursor: Optional[str] = None, limit: int = 50, sort: str = "id",
+                         descending: bool = False, grade: Optional[str] = None,
+                         school: Optional[str] = None) -> Dict[str, Any]:
+        """One page of student profiles, whether they have their own account or not"""
+        # Own account and parent account come back in the same SELECT
+        query = db.query(StudentProfile).options(
+            joinedload(StudentProfile.user), joinedload(StudentProfile.parent)
+        )
+        if grade is not None:
+            query = query.filter(StudentProfile.grade == grade)
+        if school is not None:
+            query = query.filter(StudentProfile.school == school)
+        rows, page = keyset_page(query, STUDENT_SORTS[sort], StudentProfile.id, cursor, limit, descending)
         
         students = []
-        for profile in results:
+        for profile, *_ in rows:
             # Try to get phone from their own account or parent's account
             phone = None
-            email = None # if we had email
             telegram_id = None
             
             if profile.user:
@@ -34,12 +63,29 @@ class AdminService:
                 "age": profile.age,
                 "managed": profile.parent_id is not None
             })
-        return students
+        return {"items": students, **page}
 
     @staticmethod
-    def get_all_tutors(db: Session) -> List[Dict[str, Any]]:
-        results = db.query(User, TutorProfile).join(TutorProfile, User.id == TutorProfile.user_id).all()
-        return [
+    def _created_between(query, created_from: Optional[datetime], created_to: Optional[datetime], column=User.created_at):
+        if created_from is not None:
+            query = query.filter(column >= created_from)
+        if created_to is not None:
+            query = query.filter(column < created_to)
+        return query
+
+    @staticmethod
+    def get_all_tutors(db: Session, cursor: Optional[str] = None, limit: int = 50, sort: str = "id",
+                       descending: bool = False, verified: Optional[bool] = None, subject: Optional[str] = None,
+                       created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> Dict[str, Any]:
+        """One page of tutors; `subject` matches anywhere in the subjects list"""
+        query = db.query(User, TutorProfile).join(TutorProfile, User.id == TutorProfile.user_id)
+        if verified is not None:
+            query = query.filter(TutorProfile.verified == verified)
+        if subject:
+            query = query.filter(TutorProfile.subjects.ilike(f"%{subject}%"))
+        query = AdminService._created_between(query, created_from, created_to)
+        rows, page = keyset_page(query, USER_SORTS[sort], User.id, cursor, limit, descending)
+        return {"items": [
             {
                 "id": user.id,
                 "full_name": user.full_name,
@@ -50,19 +96,27 @@ class AdminService:
                 "experience_years": profile.experience_years,
                 "verified": profile.verified,
                 "created_at": user.created_at
-            } for user, profile in results
-        ]
+            } for user, profile, *_ in rows
+        ], **page}
 
     @staticmethod
-    def get_all_parents(db: Session) -> List[Dict[str, Any]]:
-        results = db.query(User, ParentProfile).join(ParentProfile, User.id == ParentProfile.user_id).all()
+    def get_all_parents(db: Session, cursor: Optional[str] = None, limit: int = 50, sort: str = "id",
+                        descending: bool = False, created_from: Optional[datetime] = None,
+                        created_to: Optional[datetime] = None) -> Dict[str, Any]:
+        # Children names aggregated per parent; evaluated for the page's rows only
+        children = (
+            select(_aggregate_strings(db.bind.dialect.name, StudentProfile.full_name, CHILDREN_SEPARATOR))
+            .where(StudentProfile.parent_id == User.id)
+            .correlate(User)
+            .scalar_subquery()
+        )
+        query = db.query(User, ParentProfile).join(ParentProfile, User.id == ParentProfile.user_id)
+        query = AdminService._created_between(query, created_from, created_to)
+        rows, page = keyset_page(query.add_columns(children), USER_SORTS[sort], User.id, cursor, limit, descending)
         
         parents = []
-        for user, profile in results:
-            # Find linked children profiles
-            children = db.query(StudentProfile).filter(StudentProfile.parent_id == user.id).all()
-            children_names = [c.full_name for c in children]
-            
+        for user, profile, children_names, *_ in rows:
+            children_names = children_names.split(CHILDREN_SEPARATOR) if children_names else []
             parents.append({
                 "id": user.id,
                 "full_name": user.full_name,
@@ -73,27 +127,99 @@ class AdminService:
                 "children": children_names,
                 "created_at": user.created_at
             })
-        return parents
+        return {"items": parents, **page}
 
     @staticmethod
-    def get_session_stats(db: Session, period: str = "daily") -> Dict[str, Any]:
-        now = datetime.utcnow()
-        if period == "daily":
-            start_date = now - timedelta(days=1)
-        elif period == "weekly":
-            start_date = now - timedelta(weeks=1)
-        elif period == "monthly":
-            start_date = now - timedelta(days=30)
-        else:
-            start_date = now - timedelta(days=1)
+    def _bucket_start(dialect_name: str, bucket: str, column):
+        """Start of the hour/day/week (weeks start on Monday) a timestamp falls in"""
+        if dialect_name == "postgresql":
+            return func.date_trunc(bucket, column)
+        if bucket == "week":
+            return func.datetime(column, "weekday 0", "-6 days", "start of day")
+        return func.strftime("%Y-%m-%d %H:00:00" if bucket == "hour" else "%Y-%m-%d 00:00:00", column)
+
+    @staticmethod
+    def _latest_report_id():
+        latest = aliased(Report)
+        return select(func.max(latest.id)).where(latest.session_id == TSession.id).correlate(TSession).scalar_subquery()
+
+    @staticmethod
+    def _session_aggregates(start: datetime, end: datetime, *group_columns):
+        """
+        Sessions in [start, end) joined to their attendance and latest report,
+        reduced in a single pass with conditional aggregation
+        """
+        latest_report_id = AdminService._latest_report_id()
+        return (
+            select(
+                *group_columns,
+                func.count(TSession.id).label("sessions"),
+                func.coalesce(func.sum(TSession.duration_minutes), 0).label("duration"),
+                func.count(Report.id).label("reports"),
+                func.coalesce(func.sum(Report.performance_score), 0).label("score_sum"),
+                func.count(Report.performance_score).label("scored"),
+                *(
+                    func.count(case((Attendance.status == status, 1))).label(status)
+                    for status in ATTENDANCE_STATUSES
+                )
+            )
+            .select_from(TSession)
+            .outerjoin(Report, Report.id == latest_report_id)
+            .outerjoin(Attendance, and_(
+                Attendance.session_id == TSession.id,
+                Attendance.student_profile_id == TSession.student_profile_id
+            ))
+            .where(TSession.scheduled_at >= start, TSession.scheduled_at < end)
+        )
 
-        total_sessions = db.query(TSession).filter(TSession.scheduled_at >= start_date).count()
-        total_duration = db.query(func.sum(TSession.duration_minutes)).filter(TSession.scheduled_at >= start_date).scalar() or 0
-        total_reports = db.query(Report).filter(Report.created_at >= start_date).count()
-        avg_score = db.query(func.avg(Report.performance_score)).filter(Report.created_at >= start_date).scalar() or 0
+    @staticmethod
+    def _stats_dict(row) -> Dict[str, Any]:
+        return {
+            "total_sessions": row.sessions,
+            "total_duration_minutes": row.duration,
+            "total_reports": row.reports,
+            "average_performance_score": round(row.score_sum / row.scored, 2) if row.scored else 0.0,
+            "attendance": {status: getattr(row, status) for status in ATTENDANCE_STATUSES}
+        }
+
+    @staticmethod
+    def get_session_stats(db: Session, period: str = "daily", start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, bucket: Optional[str] = None,
+                          limit: int = 200) -> Dict[str, Any]:
+        """
+        Session totals over [start, end) (the last day/week/30 days when no start
+        is given), from one aggregate query. Reports and scores count the latest
+        report of each session in the window. With `bucket` (hour | day | week)
+        the same query is grouped into a time series and the totals are folded
+        from it. `sessions` lists the newest `limit` sessions of the window.
+        """
+        custom_range = start is not None
+        end = end or datetime.utcnow()
+        if not custom_range:
+            start = end - PERIODS.get(period, PERIODS["daily"])
+        if start >= end:
+            raise ValueError("'from' must be before 'to'")
+
+        series = None
+        if bucket is None:
+            totals = AdminService._stats_dict(db.execute(AdminService._session_aggregates(start, end)).one())
+        else:
+            bucket_start = AdminService._bucket_start(db.bind.dialect.name, bucket, TSession.scheduled_at).label("bucket")
+            rows = db.execute(
+                AdminService._session_aggregates(start, end, bucket_start).group_by(bucket_start).order_by(bucket_start)
+            ).all()
+            series = []
+            for row in rows:
+                point = AdminService._stats_dict(row)
+                # SQLite hands the bucket back as text
+                point["bucket_start"] = datetime.fromisoformat(row.bucket) if isinstance(row.bucket, str) else row.bucket
+                series.append(point)
+            totals = AdminService._stats_dict(SimpleNamespace(**{
+                key: sum(getattr(row, key) for row in rows)
+                for key in ("sessions", "duration", "reports", "score_sum", "scored", *ATTENDANCE_STATUSES)
+            }))
 
         tutor_alias = aliased(User)
-        
         sessions_query = db.query(
             TSession.id,
             TSession.topic,
@@ -106,8 +232,10 @@ class AdminService:
             Report.performance_score
         ).join(StudentProfile, TSession.student_profile_id == StudentProfile.id)\
          .join(tutor_alias, TSession.tutor_id == tutor_alias.id)\
-         .outerjoin(Report, TSession.id == Report.session_id)\
-         .filter(TSession.scheduled_at >= start_date)
+         .outerjoin(Report, Report.id == AdminService._latest_report_id())\
+         .filter(TSession.scheduled_at >= start, TSession.scheduled_at < end)\
+         .order_by(TSession.scheduled_at.desc(), TSession.id.desc())\
+         .limit(limit)
         
         sessions = [
             {
@@ -124,11 +252,12 @@ class AdminService:
         ]
         
         return {
-            "period": period,
-            "total_sessions": total_sessions,
-            "total_duration_minutes": total_duration,
-            "total_reports": total_reports,
-            "average_performance_score": float(avg_score),
+            "period": None if custom_range else period,
+            "start": start,
+            "end": end,
+            "bucket": bucket,
+            **totals,
+            "series": series,
             "sessions": sessions
         }
 
@@ -142,10 +271,12 @@ class AdminService:
         return False
 
     @staticmethod
-    def get_all_reports(db: Session) -> List[Dict[str, Any]]:
+    def get_all_reports(db: Session, cursor: Optional[str] = None, limit: int = 50, sort: str = "created_at",
+                        descending: bool = True, created_from: Optional[datetime] = None,
+                        created_to: Optional[datetime] = None) -> Dict[str, Any]:
         tutor_alias = aliased(User)
         
-        results = db.query(
+        query = db.query(
             Report.id,
             Report.content,
             Report.performance_score,
@@ -155,10 +286,11 @@ class AdminService:
             tutor_alias.full_name.label("tutor_name")
         ).join(TSession, Report.session_id == TSession.id)\
          .join(StudentProfile, TSession.student_profile_id == StudentProfile.id)\
-         .join(tutor_alias, TSession.tutor_id == tutor_alias.id)\
-         .order_by(Report.created_at.desc()).all()
+         .join(tutor_alias, TSession.tutor_id == tutor_alias.id)
+        query = AdminService._created_between(query, created_from, created_to, Report.created_at)
+        rows, page = keyset_page(query, REPORT_SORTS[sort], Report.id, cursor, limit, descending)
          
-        return [
+        return {"items": [
             {
                 "id": r.id,
                 "content": r.content,
@@ -167,8 +299,35 @@ class AdminService:
                 "topic": r.topic,
                 "student_name": r.student_name,
                 "tutor_name": r.tutor_name
-            } for r in results
-        ]
+            } for r in rows
+        ], **page}
+
+    @staticmethod
+    def get_report_run_progress(db: Session) -> Optional[Dict[str, Any]]:
+        """Progress and throughput of the most recent daily report run"""
+        run = db.query(ReportRun).order_by(ReportRun.run_date.desc()).first()
+        if not run:
+            return None
+
+        processed = run.sent + run.failed
+        elapsed = ((run.finished_at or datetime.utcnow()) - run.started_at).total_seconds()
+        per_minute = processed * 60 / elapsed if elapsed > 0 else 0.0
+        remaining = max(run.total_parents - processed, 0)
+        return {
+            "run_date": run.run_date.isoformat(),
+            "status": run.status,
+            "total_parents": run.total_parents,
+            "processed": processed,
+            "sent": run.sent,
+            "failed": run.failed,
+            "cursor_parent_id": run.cursor_parent_id,
+            "started_at": run.started_at,
+            "updated_at": run.updated_at,
+            "finished_at": run.finished_at,
+            "progress_percent": round(processed * 100 / run.total_parents, 1) if run.total_parents else 100.0,
+            "parents_per_minute": round(per_minute, 1),
+            "eta_seconds": round(remaining * 60 / per_minute) if run.status == "running" and per_minute else None
+        }
 
     # Settings methods remain the same
     @staticmethod
@@ -178,6 +337,14 @@ class AdminService:
 
     @staticmethod
     def update_setting(db: Session, key: str, value: str) -> bool:
+        from services.scheduler_service import parse_report_time, reschedule_daily_reports
+
+        if key == "daily_report_time":
+            try:
+                parse_report_time(value)
+            except ValueError:
+                return False
+
         setting = db.query(AppSetting).filter(AppSetting.key == key).first()
         if not setting:
             setting = AppSetting(key=key, value=value)
@@ -185,4 +352,8 @@ class AdminService:
         else:
             setting.value = value
         db.commit()
+
+        if key == "daily_report_time":
+            # Updates the shared job store, so the leader picks it up without a restart
+            reschedule_daily_reports(value)
         return True
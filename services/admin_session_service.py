@@ -1,125 +1,97 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, aliased
 from database.models import User, StudentProfile, Session as TSession, Attendance, Report
-from typing import List, Dict, Any, Optional
+from services.pagination import keyset_after, keyset_order
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 
 class AdminSessionService:
     """Service for admin to view detailed session information"""
-    
+
     @staticmethod
-    def get_user_sessions_detailed(db: Session, user_id: int, role: str) -> List[Dict[str, Any]]:
+    def detailed_sessions_query(db: Session, *criteria, limit: Optional[int] = None,
+                                before: Optional[Tuple[Optional[datetime], int]] = None):
+        """
+        Sessions with their tutor, student profile, attendance and latest report
+        outer-joined into one SELECT, newest first (unscheduled ones last).
+        `criteria` filter the sessions; `before` is the (scheduled_at, id) of
+        the last row of the previous page (keyset pagination).
+        """
+        latest = aliased(Report)
+        latest_report_id = (
+            select(func.max(latest.id))
+            .where(latest.session_id == TSession.id)
+            .correlate(TSession)
+            .scalar_subquery()
+        )
+        query = (
+            db.query(TSession, User, StudentProfile, Attendance, Report)
+            .outerjoin(User, User.id == TSession.tutor_id)
+            .outerjoin(StudentProfile, StudentProfile.id == TSession.student_profile_id)
+            .outerjoin(Attendance, and_(
+                Attendance.session_id == TSession.id,
+                Attendance.student_profile_id == TSession.student_profile_id
+            ))
+            .outerjoin(Report, Report.id == latest_report_id)
+            .filter(*criteria)
+        )
+        if before is not None:
+            scheduled_at, session_id = before
+            query = query.filter(
+                keyset_after(TSession.scheduled_at, TSession.id, scheduled_at, session_id, descending=True)
+            )
+        query = query.order_by(*keyset_order(TSession.scheduled_at, TSession.id, descending=True))
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    @staticmethod
+    def _session_dict(sess: TSession, tutor: Optional[User], student_profile: Optional[StudentProfile],
+                      attendance: Optional[Attendance], report: Optional[Report]) -> Dict[str, Any]:
+        return {
+            "id": sess.id,
+            "group_id": sess.group_id,
+            "topic": sess.topic,
+            "scheduled_at": sess.scheduled_at,
+            "duration_minutes": sess.duration_minutes,
+            "student_name": student_profile.full_name if student_profile else "Unknown",
+            "student_id": student_profile.id if student_profile else None,
+            "tutor_name": tutor.full_name if tutor else "Unknown",
+            "tutor_id": tutor.id if tutor else None,
+            "attendance": {
+                "status": attendance.status if attendance else None,
+                "marked": attendance is not None
+            },
+            "report": {
+                "exists": report is not None,
+                "score": report.performance_score if report else None,
+                "content": report.content if report else None
+            }
+        }
+
+    @staticmethod
+    def get_user_sessions_detailed(db: Session, user_id: int, role: str, limit: Optional[int] = None,
+                                   before: Optional[Tuple[Optional[datetime], int]] = None) -> List[Dict[str, Any]]:
         """
         Get detailed sessions for a user (student or tutor) with attendance and reports
         """
-        sessions = []
-        
         if role == "tutor":
-            # Get all sessions where this user is the tutor
-            tutor_sessions = db.query(TSession).filter(TSession.tutor_id == user_id).order_by(TSession.scheduled_at.desc()).all()
-            
-            for sess in tutor_sessions:
-                student_profile = db.query(StudentProfile).filter(StudentProfile.id == sess.student_profile_id).first()
-                attendance = db.query(Attendance).filter(
-                    Attendance.session_id == sess.id,
-                    Attendance.student_profile_id == sess.student_profile_id
-                ).first()
-                report = db.query(Report).filter(Report.session_id == sess.id).first()
-                
-                sessions.append({
-                    "id": sess.id,
-                    "topic": sess.topic,
-                    "scheduled_at": sess.scheduled_at,
-                    "duration_minutes": sess.duration_minutes,
-                    "student_name": student_profile.full_name if student_profile else "Unknown",
-                    "student_id": student_profile.id if student_profile else None,
-                    "attendance": {
-                        "status": attendance.status if attendance else None,
-                        "marked": attendance is not None
-                    },
-                    "report": {
-                        "exists": report is not None,
-                        "score": report.performance_score if report else None,
-                        "content": report.content if report else None
-                    }
-                })
-        
+            criterion = TSession.tutor_id == user_id
         elif role == "student":
-            # Get student profile first
-            student_profile = db.query(StudentProfile).filter(StudentProfile.user_id == user_id).first()
-            
-            if student_profile:
-                # Get all sessions for this student profile
-                student_sessions = db.query(TSession).filter(
-                    TSession.student_profile_id == student_profile.id
-                ).order_by(TSession.scheduled_at.desc()).all()
-                
-                for sess in student_sessions:
-                    tutor = db.query(User).filter(User.id == sess.tutor_id).first()
-                    attendance = db.query(Attendance).filter(
-                        Attendance.session_id == sess.id,
-                        Attendance.student_profile_id == student_profile.id
-                    ).first()
-                    report = db.query(Report).filter(Report.session_id == sess.id).first()
-                    
-                    sessions.append({
-                        "id": sess.id,
-                        "topic": sess.topic,
-                        "scheduled_at": sess.scheduled_at,
-                        "duration_minutes": sess.duration_minutes,
-                        "tutor_name": tutor.full_name if tutor else "Unknown",
-                        "tutor_id": tutor.id if tutor else None,
-                        "attendance": {
-                            "status": attendance.status if attendance else None,
-                            "marked": attendance is not None
-                        },
-                        "report": {
-                            "exists": report is not None,
-                            "score": report.performance_score if report else None,
-                            "content": report.content if report else None
-                        }
-                    })
-        
-        return sessions
-    
+            criterion = StudentProfile.user_id == user_id
+        else:
+            return []
+
+        rows = AdminSessionService.detailed_sessions_query(db, criterion, limit=limit, before=before)
+        return [AdminSessionService._session_dict(*row) for row in rows]
+
     @staticmethod
-    def get_profile_sessions_detailed(db: Session, profile_id: int) -> List[Dict[str, Any]]:
+    def get_profile_sessions_detailed(db: Session, profile_id: int, limit: Optional[int] = None,
+                                      before: Optional[Tuple[Optional[datetime], int]] = None) -> List[Dict[str, Any]]:
         """
         Get detailed sessions for a specific student profile (for managed children)
         """
-        sessions = []
-        student_profile = db.query(StudentProfile).filter(StudentProfile.id == profile_id).first()
-        
-        if not student_profile:
-            return []
-        
-        student_sessions = db.query(TSession).filter(
-            TSession.student_profile_id == profile_id
-        ).order_by(TSession.scheduled_at.desc()).all()
-        
-        for sess in student_sessions:
-            tutor = db.query(User).filter(User.id == sess.tutor_id).first()
-            attendance = db.query(Attendance).filter(
-                Attendance.session_id == sess.id,
-                Attendance.student_profile_id == profile_id
-            ).first()
-            report = db.query(Report).filter(Report.session_id == sess.id).first()
-            
-            sessions.append({
-                "id": sess.id,
-                "topic": sess.topic,
-                "scheduled_at": sess.scheduled_at,
-                "duration_minutes": sess.duration_minutes,
-                "student_name": student_profile.full_name,
-                "tutor_name": tutor.full_name if tutor else "Unknown",
-                "tutor_id": tutor.id if tutor else None,
-                "attendance": {
-                    "status": attendance.status if attendance else None,
-                    "marked": attendance is not None
-                },
-                "report": {
-                    "exists": report is not None,
-                    "score": report.performance_score if report else None,
-                    "content": report.content if report else None
-                }
-            })
-        
-        return sessions
+        rows = AdminSessionService.detailed_sessions_query(
+            db, TSession.student_profile_id == profile_id, limit=limit, before=before
+        )
+        return [AdminSessionService._session_dict(*row) for row in rows]
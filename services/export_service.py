@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import aliased
+
+from database.db import SessionLocal
+from database.models import User, StudentProfile, Session as TSession, Attendance, Report
+
+# Rows fetched per round-trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+
+def _sessions_export():
+    tutor = aliased(User)
+    latest = aliased(Report)
+    latest_report_id = (
+        select(func.max(latest.id)).where(latest.session_id == TSession.id).correlate(TSession).scalar_subquery()
+    )
+    stmt = (
+        select(
+            TSession.id,
+            TSession.group_id,
+            TSession.scheduled_at,
+            TSession.duration_minutes,
+            TSession.topic,
+            TSession.tutor_id,
+            tutor.full_name.label("tutor_name"),
+            TSession.student_profile_id,
+            StudentProfile.full_name.label("student_name"),
+            Attendance.status.label("attendance"),
+            Report.performance_score.label("report_score")
+        )
+        .outerjoin(tutor, tutor.id == TSession.tutor_id)
+        .outerjoin(StudentProfile, StudentProfile.id == TSession.student_profile_id)
+        .outerjoin(Attendance, and_(
+            Attendance.session_id == TSession.id,
+            Attendance.student_profile_id == TSession.student_profile_id
+        ))
+        .outerjoin(Report, Report.id == latest_report_id)
+        .order_by(TSession.id)
+    )
+    return stmt, TSession.scheduled_at
+
+
+def _reports_export():
+    tutor = aliased(User)
+    stmt = (
+        select(
+            Report.id,
+            Report.session_id,
+            Report.created_at,
+            Report.performance_score,
+            Report.content,
+            TSession.topic,
+            TSession.scheduled_at,
+            Report.tutor_id,
+            tutor.full_name.label("tutor_name"),
+            TSession.student_profile_id,
+            StudentProfile.full_name.label("student_name")
+        )
+        .join(TSession, TSession.id == Report.session_id)
+        .outerjoin(tutor, tutor.id == Report.tutor_id)
+        .outerjoin(StudentProfile, StudentProfile.id == TSession.student_profile_id)
+        .order_by(Report.id)
+    )
+    return stmt, Report.created_at
+
+
+def _attendance_export():
+    tutor = aliased(User)
+    stmt = (
+        select(
+            Attendance.id,
+            Attendance.session_id,
+            Attendance.status,
+            TSession.scheduled_at,
+            TSession.topic,
+            TSession.tutor_id,
+            tutor.full_name.label("tutor_name"),
+            Attendance.student_profile_id,
+            StudentProfile.full_name.label("student_name")
+        )
+        .join(TSession, TSession.id == Attendance.session_id)
+        .outerjoin(tutor, tutor.id == TSession.tutor_id)
+        .outerjoin(StudentProfile, StudentProfile.id == Attendance.student_profile_id)
+        .order_by(Attendance.id)
+    )
+    return stmt, TSession.scheduled_at
+
+
+# entity -> builder of (statement, column the date range applies to)
+EXPORTS = {
+    "sessions": _sessions_export,
+    "reports": _reports_export,
+    "attendance": _attendance_export,
+}
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class ExportService:
+    @staticmethod
+    def columns(entity: str) -> List[str]:
+        stmt, _ = EXPORTS[entity]()
+        return list(stmt.selected_columns.keys())
+
+    @staticmethod
+    def iter_rows(entity: str, date_from: Optional[datetime] = None,
+                  date_to: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream an entity's rows as dicts from a server-side cursor, fetching
+        EXPORT_BATCH_SIZE rows at a time. Opens its own DB session so it
+        outlives the request handler that returned the StreamingResponse.
+        """
+        stmt, date_column = EXPORTS[entity]()
+        if date_from is not None:
+            stmt = stmt.where(date_column >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(date_column < date_to)
+
+        with SessionLocal() as db:
+            result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for row in result.mappings():
+                yield dict(row)
+
+    @staticmethod
+    def stream_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+        """One JSON object per line, flushed in batches"""
+        batch = []
+        for row in rows:
+            batch.append(json.dumps(row, default=_json_default))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+    @staticmethod
+    def stream_csv(columns: List[str], rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+        """CSV with a header row, flushed in batches"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(
+                value.isoformat() if isinstance(value, datetime) else value for value in row.values()
+            )
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
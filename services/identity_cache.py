@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from config import settings
+from database.db import AsyncSessionLocal
+from database.models import User, IdentityInvalidation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Detached snapshot of a User and its roles, safe to share across sessions"""
+    id: int
+    telegram_id: int
+    full_name: str
+    phone: Optional[str]
+    roles: Tuple[str, ...]
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            full_name=user.full_name,
+            phone=user.phone,
+            roles=tuple(r.role for r in user.roles),
+        )
+
+
+class IdentityCache:
+    """
+    Bounded LRU + TTL cache of CachedUser keyed by telegram_id.
+
+    Writers that change a user's name, phone or roles must call invalidate()
+    (or invalidate_user() when only the internal user id is known).
+    Admin routes run in FastAPI's threadpool, so access is guarded by a lock.
+
+    A get() miss records the invalidation generation it saw; put() only
+    caches the loaded user if neither its telegram_id nor its user id was
+    invalidated since, so a read racing a write can't cache the old row.
+
+    Each process has its own cache. While start_sync() is running, local
+    invalidations are published to the identity_invalidations table and
+    other processes' are replayed every `sync_interval` seconds, so an
+    admin-panel change reaches the bot within a few seconds. Without the
+    sync task (or if the database is unreachable) the TTL is the only bound
+    on staleness.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300, sync_interval: float = 5,
+                 session_pool=AsyncSessionLocal):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.session_pool = session_pool
+        self._entries: "OrderedDict[int, Tuple[float, CachedUser]]" = OrderedDict()
+        self._telegram_ids: Dict[int, int] = {}  # user.id -> telegram_id
+        self._lock = threading.Lock()
+        self._generation = 0
+        # telegram_id -> generation at its first miss still waiting for put()
+        self._loading: "OrderedDict[int, int]" = OrderedDict()
+        # ("telegram" | "user", id) -> generation of its latest invalidation, kept while loads are in flight
+        self._invalidated: Dict[Tuple[str, int], int] = {}
+        # (user_id, telegram_id) invalidated here and not yet published; only queued while syncing
+        self._outgoing: List[Tuple[Optional[int], Optional[int]]] = []
+        self._synced_at: Optional[datetime] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.replayed = 0
+        self.sync_errors = 0
+
+    def get(self, telegram_id: int) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry is None:
+                self._miss(telegram_id)
+                return None
+
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                self._remove(telegram_id)
+                self._miss(telegram_id)
+                return None
+
+            self._entries.move_to_end(telegram_id)
+            self.hits += 1
+            return user
+
+    def put(self, user: User) -> CachedUser:
+        """Cache a user loaded after a get() miss, unless it was invalidated meanwhile"""
+        snapshot = CachedUser.from_user(user)
+        with self._lock:
+            since = self._loading.pop(snapshot.telegram_id, None)
+            stale = since is None or self._invalidated_since(snapshot, since)
+            if not self._loading:
+                self._invalidated.clear()
+            if stale:
+                return snapshot
+            self._entries[snapshot.telegram_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(snapshot.telegram_id)
+            self._telegram_ids[snapshot.id] = snapshot.telegram_id
+            while len(self._entries) > self.maxsize:
+                oldest, _ = next(iter(self._entries.items()))
+                self._remove(oldest)
+        return snapshot
+
+    def invalidate(self, telegram_id: Optional[int], publish: bool = True):
+        if telegram_id is None:
+            return
+        with self._lock:
+            self._remove(telegram_id)
+            self._bump(("telegram", telegram_id))
+            if publish and self._sync_task is not None:
+                self._outgoing.append((None, telegram_id))
+
+    def invalidate_user(self, user_id: Optional[int], publish: bool = True):
+        """Invalidate by internal users.id (admin paths don't know the telegram_id)"""
+        if user_id is None:
+            return
+        with self._lock:
+            telegram_id = self._telegram_ids.get(user_id)
+            if telegram_id is not None:
+                self._remove(telegram_id)
+            self._bump(("user", user_id))
+            if publish and self._sync_task is not None:
+                self._outgoing.append((user_id, None))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._telegram_ids.clear()
+            # Loads already in flight may have read rows from before the clear
+            self._loading.clear()
+            self._invalidated.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "syncing": self._sync_task is not None,
+                "replayed_invalidations": self.replayed,
+                "sync_errors": self.sync_errors,
+            }
+
+    async def sync(self):
+        """
+        Publish pending local invalidations and replay everyone's recorded
+        since the previous sync. The window overlaps the previous one by a
+        sync interval so rows committed late (or with a slightly skewed
+        clock) aren't missed; replaying one twice only costs a cache miss.
+        """
+        with self._lock:
+            outgoing, self._outgoing = self._outgoing, []
+        now = datetime.utcnow()
+        since = (self._synced_at or now) - timedelta(seconds=self.sync_interval)
+        try:
+            async with self.session_pool() as db:
+                if outgoing:
+                    await db.execute(insert(IdentityInvalidation), [
+                        {"user_id": user_id, "telegram_id": telegram_id, "created_at": now}
+                        for user_id, telegram_id in outgoing
+                    ])
+                result = await db.execute(
+                    select(IdentityInvalidation.user_id, IdentityInvalidation.telegram_id)
+                    .where(IdentityInvalidation.created_at >= since)
+                )
+                rows = result.all()
+                # Entries cached before an invalidation have expired once the TTL has passed
+                await db.execute(delete(IdentityInvalidation).where(
+                    IdentityInvalidation.created_at < now - timedelta(seconds=self.ttl + self.sync_interval)
+                ))
+                await db.commit()
+        except Exception as e:
+            self.sync_errors += 1
+            with self._lock:
+                self._outgoing[:0] = outgoing
+            logger.error(f"Identity cache sync failed: {e}")
+            return
+
+        self._synced_at = now
+        for user_id, telegram_id in rows:
+            self.invalidate(telegram_id, publish=False)
+            self.invalidate_user(user_id, publish=False)
+        self.replayed += len(rows)
+
+    def start_sync(self):
+        """Exchange invalidations with other processes every sync_interval seconds"""
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop(), name="identity-cache-sync")
+
+    async def stop_sync(self):
+        if self._sync_task is None:
+            return
+        self._sync_task.cancel()
+        await asyncio.gather(self._sync_task, return_exceptions=True)
+        self._sync_task = None
+        # Last chance to hand this process's invalidations to the others
+        await self.sync()
+
+    async def _sync_loop(self):
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.sync_interval)
+
+    def _miss(self, telegram_id: int):
+        self.misses += 1
+        self._loading.setdefault(telegram_id, self._generation)
+        # Lookups that found no user never call put()
+        while len(self._loading) > self.maxsize:
+            self._loading.popitem(last=False)
+
+    def _bump(self, key: Tuple[str, int]):
+        self._generation += 1
+        if not self._loading:
+            return
+        self._invalidated[key] = self._generation
+        # Give up on the oldest loads (they just won't be cached) rather than grow without bound
+        while len(self._invalidated) > self.maxsize and self._loading:
+            self._loading.popitem(last=False)
+            floor = next(iter(self._loading.values()), self._generation)
+            self._invalidated = {k: g for k, g in self._invalidated.items() if g > floor}
+
+    def _invalidated_since(self, snapshot: CachedUser, generation: int) -> bool:
+        return max(
+            self._invalidated.get(("telegram", snapshot.telegram_id), 0),
+            self._invalidated.get(("user", snapshot.id), 0)
+        ) > generation
+
+    def _remove(self, telegram_id: int):
+        entry = self._entries.pop(telegram_id, None)
+        if entry is not None:
+            self._telegram_ids.pop(entry[1].id, None)
+
+
+identity_cache = IdentityCache(
+    maxsize=settings.IDENTITY_CACHE_SIZE, ttl=settings.IDENTITY_CACHE_TTL,
+    sync_interval=settings.IDENTITY_CACHE_SYNC_SECONDS
+)
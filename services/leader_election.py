@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import delete, or_, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database.db import async_engine, AsyncSessionLocal, dialect_insert
+from database.models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElector:
+    """
+    Elects one process (across uvicorn workers, the bot and the API) to run
+    scheduled jobs.
+
+    On Postgres the leader holds a session-level advisory lock on a dedicated
+    connection; the lock goes away with the connection if the process dies.
+    Elsewhere (SQLite) the leader holds a lease row in scheduler_leases that it
+    renews every `lease_seconds / 3` and that others may take over once it
+    has expired. Every process keeps polling, so a standby takes over when the
+    leader goes away.
+    """
+
+    def __init__(self, name: str, on_elected: Callable[[], None], on_demoted: Callable[[], None],
+                 on_renewed: Optional[Callable[[], None]] = None, lease_seconds: float = 30,
+                 engine=async_engine, session_pool=AsyncSessionLocal):
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        # Called on every poll that confirms this process is still the leader
+        self.on_renewed = on_renewed
+        self.lease_seconds = lease_seconds
+        self.engine = engine
+        self.session_pool = session_pool
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Advisory lock keys are bigints; derive a stable one from the name
+        self.lock_key = zlib.crc32(name.encode())
+        self.is_leader = False
+        self._lock_conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def uses_advisory_lock(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=f"leader-election-{self.name}")
+
+    async def stop(self):
+        """Stop campaigning and hand leadership over right away"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            self._set_leader(False)
+            await self._release()
+
+    async def _run(self):
+        interval = self.lease_seconds / 3
+        while True:
+            try:
+                held = await (self._check_lock() if self.uses_advisory_lock else self._claim_lease())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Leader election for '{self.name}' failed: {e}")
+                held = False
+                if self.uses_advisory_lock:
+                    await self._close_lock_conn()
+            if held != self.is_leader:
+                self._set_leader(held)
+            elif held and self.on_renewed:
+                self.on_renewed()
+            await asyncio.sleep(interval)
+
+    def _set_leader(self, leader: bool):
+        self.is_leader = leader
+        if leader:
+            logger.info(f"{self.holder} elected leader for '{self.name}'")
+            self.on_elected()
+        else:
+            logger.warning(f"{self.holder} lost leadership for '{self.name}'")
+            self.on_demoted()
+
+    async def _check_lock(self) -> bool:
+        if self._lock_conn is not None:
+            # Still ours as long as the connection holding it is alive
+            await self._lock_conn.execute(text("SELECT 1"))
+            return True
+
+        conn = await self.engine.connect()
+        acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key})
+        # Session-level lock: end the implicit transaction but keep the connection
+        await conn.commit()
+        if acquired:
+            self._lock_conn = conn
+        else:
+            await conn.close()
+        return bool(acquired)
+
+    async def _claim_lease(self) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        async with self.session_pool() as db:
+            # Renew our own lease or take over an expired one
+            result = await db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now)
+                )
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            if result.rowcount == 0:
+                result = await db.execute(
+                    dialect_insert(db.bind.dialect.name, SchedulerLease)
+                    .values(name=self.name, holder=self.holder, expires_at=expires_at)
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def _release(self):
+        try:
+            if self.uses_advisory_lock:
+                if self._lock_conn is not None:
+                    await self._lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+                    await self._lock_conn.commit()
+                await self._close_lock_conn()
+            else:
+                async with self.session_pool() as db:
+                    await db.execute(
+                        delete(SchedulerLease)
+                        .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+                    )
+                    await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to release leadership for '{self.name}': {e}")
+
+    async def _close_lock_conn(self):
+        if self._lock_conn is not None:
+            try:
+                await self._lock_conn.close()
+            except Exception:
+                pass
+            self._lock_conn = None
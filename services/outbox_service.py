@@ -0,0 +1,71 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database.models import OutboxMessage
+from config import settings
+from datetime import datetime, timedelta
+from typing import List, Dict, Any
+
+SESSION_UPDATED = "session_updated"
+
+class OutboxService:
+    @staticmethod
+    def add_session_update(db, session_id: int) -> OutboxMessage:
+        """
+        Stage a session_updated event on the caller's session (sync or async);
+        it is committed together with the attendance/report change.
+        Delivery waits for the coalescing window so related updates go out together.
+        """
+        message = OutboxMessage(
+            event=SESSION_UPDATED,
+            session_id=session_id,
+            status="pending",
+            attempts=0,
+            available_at=datetime.utcnow() + timedelta(seconds=settings.NOTIFY_COALESCE_SECONDS)
+        )
+        db.add(message)
+        return message
+
+    @staticmethod
+    def add_session_updates(db, session_ids: List[int]) -> List[OutboxMessage]:
+        """add_session_update for several sessions changed in one statement"""
+        return [OutboxService.add_session_update(db, session_id) for session_id in session_ids]
+
+    @staticmethod
+    def get_stats(db: Session) -> Dict[str, Any]:
+        counts = dict(
+            db.query(OutboxMessage.status, func.count(OutboxMessage.id)).group_by(OutboxMessage.status).all()
+        )
+        oldest_pending = db.query(func.min(OutboxMessage.created_at)).filter(OutboxMessage.status == "pending").scalar()
+        return {
+            "pending": counts.get("pending", 0),
+            "done": counts.get("done", 0),
+            "dead": counts.get("dead", 0),
+            "oldest_pending_at": oldest_pending
+        }
+
+    @staticmethod
+    def get_dead_letters(db: Session, limit: int = 100) -> List[Dict[str, Any]]:
+        messages = db.query(OutboxMessage).filter(OutboxMessage.status == "dead")\
+            .order_by(OutboxMessage.id.desc()).limit(limit).all()
+        return [
+            {
+                "id": m.id,
+                "event": m.event,
+                "session_id": m.session_id,
+                "attempts": m.attempts,
+                "last_error": m.last_error,
+                "created_at": m.created_at,
+                "processed_at": m.processed_at
+            } for m in messages
+        ]
+
+    @staticmethod
+    def retry_dead_letter(db: Session, message_id: int) -> bool:
+        message = db.query(OutboxMessage).filter(OutboxMessage.id == message_id, OutboxMessage.status == "dead").first()
+        if not message:
+            return False
+        message.status = "pending"
+        message.attempts = 0
+        message.available_at = datetime.utcnow()
+        db.commit()
+        return True
@@ -0,0 +1,94 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, tuple_
+
+# Counting stops here; larger result sets report a lower bound
+COUNT_HINT_CAP = 10000
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """Opaque cursor for the row a page ended on"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_column) -> Tuple[Any, int]:
+    """(sort value, id) from encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_value is not None and sort_column.type.python_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def count_hint(query, id_column, cap: int = COUNT_HINT_CAP) -> Dict[str, Any]:
+    """Row count of a filtered query, counting at most `cap` rows"""
+    # Only the ids: computed columns (aggregates, subqueries) aren't worth evaluating to count
+    capped = query.with_entities(id_column).order_by(None).limit(cap + 1).subquery()
+    total = query.session.execute(select(func.count()).select_from(capped)).scalar()
+    return {"total": min(total, cap), "total_exact": total <= cap}
+
+
+def _nullable(sort_column) -> bool:
+    return getattr(getattr(sort_column, "expression", sort_column), "nullable", True)
+
+
+def keyset_after(sort_column, id_column, sort_value: Any, row_id: int, descending: bool = False):
+    """
+    Criterion for the rows that come after (sort_value, row_id) in
+    keyset_order. A NOT NULL sort column gets a single row comparison, which
+    the planner turns into a range scan of a (sort_column, id) index. NULL
+    compares as unknown, so a nullable one needs explicit IS NULL branches:
+    its NULL rows form a tail ordered by id.
+    """
+    if not _nullable(sort_column):
+        row, last = tuple_(sort_column, id_column), tuple_(sort_value, row_id)
+        return row < last if descending else row > last
+    after_id = id_column < row_id if descending else id_column > row_id
+    if sort_value is None:
+        # Already in the NULL tail
+        return and_(sort_column.is_(None), after_id)
+    after_value = sort_column < sort_value if descending else sort_column > sort_value
+    after = [after_value, and_(sort_column == sort_value, after_id)]
+    if _nullable(sort_column):
+        after.append(sort_column.is_(None))
+    return or_(*after)
+
+
+def keyset_order(sort_column, id_column, descending: bool = False) -> List[Any]:
+    """ORDER BY clauses matching keyset_after: (sort_column, id_column), NULLs last"""
+    ordered = sort_column.desc() if descending else sort_column.asc()
+    if _nullable(sort_column):
+        ordered = ordered.nulls_last()
+    return [ordered, id_column.desc() if descending else id_column.asc()]
+
+
+def keyset_page(query, sort_column, id_column, cursor: Optional[str], limit: int,
+                descending: bool = False, with_total: bool = True) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    One page of `query` ordered by (sort_column, id_column), starting after
+    `cursor`. Returns the rows and the page info: next_cursor (None on the
+    last page) plus a total-count hint, computed on the first page only.
+    Each row gets the sort and id values appended as `sort_key` and `row_id`.
+    Rows whose sort value is NULL come last in both directions.
+    """
+    page_info: Dict[str, Any] = {"next_cursor": None, "total": None, "total_exact": False}
+    if with_total and cursor is None:
+        page_info.update(count_hint(query, id_column))
+
+    if cursor is not None:
+        sort_value, row_id = decode_cursor(cursor, sort_column)
+        query = query.filter(keyset_after(sort_column, id_column, sort_value, row_id, descending))
+    query = query.order_by(*keyset_order(sort_column, id_column, descending))
+
+    rows = query.add_columns(sort_column.label("sort_key"), id_column.label("row_id")).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        page_info["next_cursor"] = encode_cursor(rows[-1].sort_key, rows[-1].row_id)
+    return rows, page_info
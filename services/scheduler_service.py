@@ -1,71 +1,278 @@
 import asyncio
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from aiogram import Bot
-from database.db import SessionLocal
-from database.models import User, StudentProfile, Session as TSession, Report, AppSetting, ParentReportLog, ParentProfile
-from datetime import datetime, timedelta
+from sqlalchemy import Row, distinct, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.delivery import Priority, send_message
+from bot.utils.notifications import outbox_dispatcher
+from services.leader_election import LeaderElector
+from services.stats_rollup_service import AsyncStatsRollupService
+from config import settings
+from database.db import engine, SessionLocal, AsyncSessionLocal, dialect_insert
+from database.models import (
+    User, UserRole, StudentProfile, Session as TSession, Report, AppSetting, ParentReportLog, ParentProfile,
+    ReportRun, ReportRunItem
+)
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _render_digest(children: Dict[str, List[Row]]) -> str:
+    report_msg = "☀️ *Daily Session Report Summary:*\n\n"
+    for child_name, sessions in children.items():
+        report_msg += f"👶 *{child_name}:*\n"
+        for sess in sessions:
+            report_msg += f"🔹 {sess.topic}\n"
+            report_msg += f"⭐ Score: {sess.performance_score}/10\n"
+            report_msg += f"📝 {sess.content}\n\n"
+    return report_msg
+
+def _with_reported_sessions(stmt, since: datetime):
+    """Join a StudentProfile-based select to sessions reported since `since` for parents with a chat"""
+    is_parent = select(UserRole.id).where(UserRole.user_id == User.id, UserRole.role == "parent").exists()
+    return (
+        stmt.join(TSession, TSession.student_profile_id == StudentProfile.id)
+        .join(Report, Report.session_id == TSession.id)
+        .join(User, User.id == StudentProfile.parent_id)
+        .where(TSession.scheduled_at >= since, User.telegram_id.isnot(None), is_parent)
+    )
+
+async def collect_daily_digests(db: AsyncSession, since: datetime, parent_ids: List[int]) -> Dict[int, Tuple[int, str]]:
+    """
+    Render the digests of the given parents from sessions reported since `since`.
+    One grouped query over their student profiles; returns
+    parent_id -> (telegram_id, message), ordered by parent_id.
+    """
+    result = await db.execute(
+        _with_reported_sessions(
+            select(
+                StudentProfile.parent_id,
+                User.telegram_id,
+                StudentProfile.id.label("student_profile_id"),
+                StudentProfile.full_name,
+                TSession.topic,
+                Report.performance_score,
+                Report.content
+            ),
+            since
+        )
+        .where(StudentProfile.parent_id.in_(parent_ids))
+        .order_by(StudentProfile.parent_id, StudentProfile.id, TSession.scheduled_at)
+    )
+
+    grouped: Dict[int, Tuple[int, Dict[str, List[Row]]]] = {}
+    for row in result:
+        _, children = grouped.setdefault(row.parent_id, (row.telegram_id, {}))
+        children.setdefault(row.full_name, []).append(row)
+
+    return {
+        parent_id: (telegram_id, _render_digest(children))
+        for parent_id, (telegram_id, children) in grouped.items()
+    }
+
+async def _next_parent_chunk(db: AsyncSession, since: datetime, after_parent_id: int, limit: int) -> List[int]:
+    result = await db.execute(
+        _with_reported_sessions(select(StudentProfile.parent_id), since)
+        .where(StudentProfile.parent_id > after_parent_id)
+        .group_by(StudentProfile.parent_id)
+        .order_by(StudentProfile.parent_id)
+        .limit(limit)
+    )
+    return list(result.scalars())
+
+async def _start_or_resume_run(db: AsyncSession, run_date: date) -> ReportRun:
+    """The run for `run_date`, created (with its parent count) if it doesn't exist yet"""
+    result = await db.execute(select(ReportRun).filter(ReportRun.run_date == run_date))
+    run = result.scalars().first()
+    if run:
+        return run
+
+    window_start = datetime.utcnow() - timedelta(days=1)
+    total = await db.scalar(
+        _with_reported_sessions(select(func.count(distinct(StudentProfile.parent_id))), window_start)
+    )
+    # Another process may be creating the same run; the unique run_date decides
+    await db.execute(
+        dialect_insert(db.bind.dialect.name, ReportRun).values(
+            run_date=run_date, window_start=window_start, status="running",
+            cursor_parent_id=0, total_parents=total, sent=0, failed=0,
+            started_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=["run_date"])
+    )
+    await db.commit()
+    result = await db.execute(select(ReportRun).filter(ReportRun.run_date == run_date))
+    return result.scalars().one()
+
+async def _deliver_digest(bot: Bot, limiter: asyncio.Semaphore, parent_id: int, telegram_id: int, text: str):
+    async with limiter:
+        try:
+            await send_message(bot, telegram_id, text, priority=Priority.BULK, parse_mode="Markdown")
+            return parent_id, None
+        except Exception as e:
+            logger.error(f"Failed to send report to parent {parent_id}: {e}")
+            return parent_id, str(e)
+
+async def _record_chunk(db: AsyncSession, run: ReportRun, outcomes: List[Tuple[int, Optional[str]]],
+                        cursor_parent_id: int):
+    """
+    Bulk-write one chunk's outcomes (run items, ParentReportLog rows,
+    last_report_sent_at) and advance the run cursor in a single commit.
+    """
+    now = datetime.utcnow()
+    if outcomes:
+        await db.execute(
+            dialect_insert(db.bind.dialect.name, ReportRunItem).on_conflict_do_nothing(
+                index_elements=["run_date", "parent_id"]
+            ),
+            [
+                {
+                    "run_date": run.run_date,
+                    "parent_id": parent_id,
+                    "status": "failed" if error else "success",
+                    "error_message": error,
+                    "processed_at": now
+                } for parent_id, error in outcomes
+            ]
+        )
+        await db.execute(insert(ParentReportLog), [
+            {
+                "parent_id": parent_id,
+                "sent_at": now,
+                "status": "failed" if error else "success",
+                "error_message": error
+            } for parent_id, error in outcomes
+        ])
+        delivered = [parent_id for parent_id, error in outcomes if error is None]
+        if delivered:
+            await db.execute(
+                update(ParentProfile)
+                .where(ParentProfile.user_id.in_(delivered))
+                .values(last_report_sent_at=now)
+            )
+
+    run.cursor_parent_id = cursor_parent_id
+    run.sent += sum(1 for _, error in outcomes if error is None)
+    run.failed += sum(1 for _, error in outcomes if error)
+    run.updated_at = now
+    await db.commit()
+
 async def send_daily_reports(bot: Bot):
-    db = SessionLocal()
+    """
+    Send today's parent digests as a checkpointed run.
+
+    Parents are processed in parent_id order, REPORT_CHUNK_SIZE at a time; each
+    chunk's outcomes and the cursor are committed together. Calling it again
+    after a restart resumes after the last committed chunk, and a completed run
+    is never sent twice. Only a chunk that was in flight during a crash can be
+    partially re-sent.
+    """
+    run_date = datetime.utcnow().date()
+    async with AsyncSessionLocal() as db:
+        run = await _start_or_resume_run(db, run_date)
+        if run.status == "completed":
+            logger.info(f"Daily reports for {run_date} already completed, skipping")
+            return
+        logger.info(
+            f"Daily reports for {run_date}: {run.total_parents} parents, "
+            f"starting after parent {run.cursor_parent_id}"
+        )
+
+        # Delivery rate is bounded by the outbound token buckets; the semaphore
+        # only caps how many sends are in flight at once
+        limiter = asyncio.Semaphore(settings.REPORT_SEND_CONCURRENCY)
+        while True:
+            chunk = await _next_parent_chunk(db, run.window_start, run.cursor_parent_id, settings.REPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            digests = await collect_daily_digests(db, run.window_start, chunk)
+            outcomes = await asyncio.gather(*[
+                _deliver_digest(bot, limiter, parent_id, telegram_id, text)
+                for parent_id, (telegram_id, text) in digests.items()
+            ])
+            await _record_chunk(db, run, outcomes, chunk[-1])
+
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
+        await db.commit()
+        logger.info(f"Daily reports finished: {run.sent} sent, {run.failed} failed")
+
+# Set by setup_scheduler; only the elected leader's scheduler is running jobs
+scheduler: Optional[AsyncIOScheduler] = None
+leader_elector: Optional[LeaderElector] = None
+_resume_task: Optional[asyncio.Task] = None
+# Jobs live in the database and are looked up by reference, so they can't take
+# the bot as an argument
+_bot: Optional[Bot] = None
+
+DAILY_REPORTS_JOB_ID = "daily_reports"
+OUTBOX_JOB_ID = "outbox_dispatch"
+ROLLUP_RECONCILE_JOB_ID = "rollup_reconcile"
+
+async def daily_reports_job():
+    await send_daily_reports(_bot)
+
+async def outbox_dispatch_job():
+    await outbox_dispatcher.dispatch(_bot)
+
+async def rollup_reconcile_job():
+    """Rebuild the daily stats rollups, repairing drift from writes that bypassed SessionService"""
+    async with AsyncSessionLocal() as db:
+        rows = await AsyncStatsRollupService.reconcile(db)
+    logger.info(f"Session rollups reconciled: {rows} rows")
+
+def parse_report_time(value: str) -> Tuple[int, int]:
+    """'HH:MM' -> (hour, minute); raises ValueError for anything else"""
+    hour, minute = map(int, value.split(":"))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid report time '{value}'")
+    return hour, minute
+
+async def _resume_unfinished_run():
+    """
+    Pick up today's run where it stopped if the previous leader died mid-run.
+    The daily_reports job itself is pulled forward, so max_instances keeps the
+    resume from overlapping a scheduled run; its cron trigger sets the next
+    run time again afterwards.
+    """
     try:
-        # Get all parents
-        parents = db.query(User).join(User.roles).filter(User.roles.any(role="parent")).all()
-        
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        
-        for parent in parents:
-            # Find children
-            children = db.query(User).join(StudentProfile, User.id == StudentProfile.user_id).filter(StudentProfile.parent_id == parent.id).all()
-            
-            if not children:
-                continue
-                
-            report_msg = "☀️ *Daily Session Report Summary:*\n\n"
-            found_activity = False
-            
-            for child in children:
-                # Find sessions from yesterday with reports
-                sessions = db.query(TSession).filter(
-                    TSession.student_id == child.id,
-                    TSession.scheduled_at >= yesterday
-                ).join(Report).all()
-                
-                if sessions:
-                    found_activity = True
-                    report_msg += f"👶 *{child.full_name}:*\n"
-                    for sess in sessions:
-                        report_msg += f"🔹 {sess.topic}\n"
-                        report_msg += f"⭐ Score: {sess.report.performance_score}/10\n"
-                        report_msg += f"📝 {sess.report.content}\n\n"
-            
-            if found_activity:
-                try:
-                    await bot.send_message(parent.telegram_id, report_msg, parse_mode="Markdown")
-                    logger.info(f"Sent daily report to parent {parent.id}")
-                    
-                    # Log success
-                    log = ParentReportLog(parent_id=parent.id, status="success")
-                    db.add(log)
-                    
-                    # Update profile
-                    profile = db.query(ParentProfile).filter(ParentProfile.user_id == parent.id).first()
-                    if profile:
-                        profile.last_report_sent_at = datetime.utcnow()
-                    
-                    db.commit()
-                except Exception as e:
-                    logger.error(f"Failed to send report to parent {parent.id}: {e}")
-                    log = ParentReportLog(parent_id=parent.id, status="failed", error_message=str(e))
-                    db.add(log)
-                    db.commit()
-    finally:
-        db.close()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(ReportRun.run_date).filter(
+                ReportRun.run_date == datetime.utcnow().date(), ReportRun.status == "running"
+            ))
+            run_date = result.scalar()
+        if run_date and scheduler is not None:
+            scheduler.modify_job(DAILY_REPORTS_JOB_ID, next_run_time=datetime.now(timezone.utc))
+            logger.info(f"Resuming unfinished daily report run for {run_date}")
+    except Exception as e:
+        logger.error(f"Could not check for an unfinished daily report run: {e}")
 
 def setup_scheduler(bot: Bot):
-    scheduler = AsyncIOScheduler()
+    """
+    Start the scheduler paused in every process; it only runs jobs while this
+    process is the elected leader, so N workers don't send N copies.
+
+    Jobs are kept in the database (apscheduler_jobs), so a run that was due
+    while no process was up still fires once on startup if it is within
+    SCHEDULER_MISFIRE_GRACE_SECONDS.
+    """
+    global scheduler, leader_elector, _bot
+    if scheduler is not None:
+        return scheduler
+
+    _bot = bot
+    scheduler = AsyncIOScheduler(
+        jobstores={"default": SQLAlchemyJobStore(engine=engine)},
+        job_defaults={
+            # Several missed runs collapse into one; late runs within the grace still go out
+            "coalesce": True,
+            "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECONDS,
+            "max_instances": 1
+        }
+    )
     db = SessionLocal()
     
     # Get configuration time from DB, default to 08:00
@@ -73,21 +280,83 @@ def setup_scheduler(bot: Bot):
     report_time = time_setting.value if time_setting else "08:00"
     db.close()
     
-    hour, minute = map(int, report_time.split(":"))
-    
-    scheduler.add_job(send_daily_reports, 'cron', hour=hour, minute=minute, args=[bot], id="daily_reports")
-    scheduler.start()
+    scheduler.start(paused=True)
+    # Keep the stored job (and a missed next_run_time) unless the time changed while we were down
+    job = scheduler.get_job(DAILY_REPORTS_JOB_ID)
+    if job is None or str(job.trigger) != str(_daily_trigger(report_time)):
+        scheduler.add_job(
+            daily_reports_job, _daily_trigger(report_time), id=DAILY_REPORTS_JOB_ID, replace_existing=True
+        )
+    scheduler.add_job(
+        outbox_dispatch_job, 'interval', seconds=settings.OUTBOX_POLL_SECONDS,
+        id=OUTBOX_JOB_ID, replace_existing=True
+    )
+    scheduler.add_job(
+        rollup_reconcile_job, _daily_trigger(settings.ROLLUP_RECONCILE_TIME),
+        id=ROLLUP_RECONCILE_JOB_ID, replace_existing=True
+    )
+    # Left behind by versions that resumed runs under a separate job id
+    if scheduler.get_job("daily_reports_resume"):
+        scheduler.remove_job("daily_reports_resume")
     logger.info(f"Scheduler started. Daily reports scheduled for {report_time}")
+
+    def on_elected():
+        global _resume_task
+        scheduler.resume()
+        _resume_task = asyncio.get_running_loop().create_task(_resume_unfinished_run())
+
+    leader_elector = LeaderElector(
+        "scheduler", on_elected=on_elected, on_demoted=scheduler.pause,
+        # Re-read the shared job store, which other processes may have rescheduled
+        on_renewed=scheduler.wakeup,
+        lease_seconds=settings.SCHEDULER_LEASE_SECONDS
+    )
+    leader_elector.start()
     return scheduler
 
-async def update_scheduler_time(scheduler: AsyncIOScheduler, bot: Bot, new_time: str):
-    # format: HH:MM
-    try:
-        hour, minute = map(int, new_time.split(":"))
-        scheduler.remove_job("daily_reports")
-        scheduler.add_job(send_daily_reports, 'cron', hour=hour, minute=minute, args=[bot], id="daily_reports")
-        logger.info(f"Daily reports rescheduled for {new_time}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to update scheduler time: {e}")
+def _daily_trigger(report_time: str) -> CronTrigger:
+    hour, minute = parse_report_time(report_time)
+    return CronTrigger(hour=hour, minute=minute)
+
+def _reschedule_stored_job(job_id: str, trigger: CronTrigger) -> bool:
+    """
+    Rewrite a job's trigger and next run time straight in the shared job
+    store, for processes that run no scheduler. The leader picks the change
+    up on its next lease renewal (on_renewed wakes its scheduler).
+    """
+    store = SQLAlchemyJobStore(engine=engine)
+    store.start(None, "default")
+    job = store.lookup_job(job_id)
+    if job is None:
+        return False
+    state = job.__getstate__()
+    state["trigger"] = trigger
+    state["next_run_time"] = trigger.get_next_fire_time(None, datetime.now(trigger.timezone))
+    job.__setstate__(state)
+    store.update_job(job)
+    return True
+
+def reschedule_daily_reports(new_time: str) -> bool:
+    """
+    Move the daily report job to `new_time` (HH:MM) in the shared job store.
+    Safe to call from request threads, with or without a local scheduler.
+    Returns False if no scheduler has stored the job yet; setup_scheduler
+    then reads the new time from the setting.
+    """
+    trigger = _daily_trigger(new_time)
+    if scheduler is not None:
+        scheduler.reschedule_job(DAILY_REPORTS_JOB_ID, trigger=trigger)
+    elif not _reschedule_stored_job(DAILY_REPORTS_JOB_ID, trigger):
         return False
+    logger.info(f"Daily reports rescheduled for {new_time}")
+    return True
+
+async def shutdown_scheduler():
+    """Stop running jobs here and let another process take over immediately"""
+    global scheduler, leader_elector
+    if leader_elector is not None:
+        await leader_elector.stop()
+        leader_elector = None
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        scheduler = None
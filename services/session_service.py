@@ -1,7 +1,12 @@
-from sqlalchemy.orm import Session
-from database.models import Session as TSession, Enrollment, Attendance, Report, StudentProfile, User
+from sqlalchemy import String, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from database.db import dialect_insert
+from database.models import Session as TSession, SessionGroup, Enrollment, Attendance, Report, StudentProfile, User
+from services.outbox_service import OutboxService
+from services.stats_rollup_service import StatsRollupService, AsyncStatsRollupService
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 class SessionService:
     @staticmethod
@@ -22,7 +27,10 @@ class SessionService:
 
     @staticmethod
     def create_session(db: Session, tutor_id: int, student_profile_id: int, scheduled_at: datetime, duration_minutes: int, topic: str) -> TSession:
+        # A one-to-one class is a group with a single participant
+        group = SessionGroup(tutor_id=tutor_id, scheduled_at=scheduled_at, duration_minutes=duration_minutes, topic=topic)
         session = TSession(
+            group=group,
             tutor_id=tutor_id,
             student_profile_id=student_profile_id,
             scheduled_at=scheduled_at,
@@ -30,10 +38,71 @@ class SessionService:
             topic=topic
         )
         db.add(session)
+        db.flush()
+        StatsRollupService.refresh_sessions(db, [session.id])
         db.commit()
         db.refresh(session)
         return session
 
+    @staticmethod
+    def _group_insert(tutor_id: int, scheduled_at: datetime, duration_minutes: int, topic: str):
+        return insert(SessionGroup).values(
+            tutor_id=tutor_id, scheduled_at=scheduled_at, duration_minutes=duration_minutes,
+            topic=topic, created_at=datetime.utcnow()
+        ).returning(SessionGroup.id)
+
+    @staticmethod
+    def _bulk_insert(group_id: int, tutor_id: int, student_profile_ids: List[int], scheduled_at: datetime,
+                     duration_minutes: int, topic: str):
+        """Single multi-row INSERT of the participants, returning (student_profile_id, id) pairs"""
+        return insert(TSession).values([
+            {
+                "group_id": group_id,
+                "tutor_id": tutor_id,
+                "student_profile_id": profile_id,
+                "scheduled_at": scheduled_at,
+                "duration_minutes": duration_minutes,
+                "topic": topic
+            } for profile_id in student_profile_ids
+        ]).returning(TSession.student_profile_id, TSession.id)
+
+    @staticmethod
+    def _check_enrolled(student_profile_ids: List[int], enrolled_ids) -> None:
+        enrolled_ids = set(enrolled_ids)
+        missing = [profile_id for profile_id in student_profile_ids if profile_id not in enrolled_ids]
+        if missing:
+            raise ValueError(f"Students not actively enrolled with this tutor: {missing}")
+
+    @staticmethod
+    def create_sessions_bulk(db: Session, tutor_id: int, student_profile_ids: List[int], scheduled_at: datetime,
+                             duration_minutes: int, topic: str) -> List[int]:
+        """
+        Create a group class and one participant session per student: one
+        enrollment check, one INSERT for the group, one multi-row INSERT ...
+        RETURNING for the participants and one commit. Returns the new session
+        ids in the order of student_profile_ids; raises ValueError if any
+        student isn't actively enrolled with the tutor.
+        """
+        student_profile_ids = list(dict.fromkeys(student_profile_ids))
+        if not student_profile_ids:
+            return []
+
+        enrolled = db.query(Enrollment.student_profile_id).filter(
+            Enrollment.tutor_user_id == tutor_id,
+            Enrollment.active == True,
+            Enrollment.student_profile_id.in_(student_profile_ids)
+        ).all()
+        SessionService._check_enrolled(student_profile_ids, [row[0] for row in enrolled])
+
+        group_id = db.execute(SessionService._group_insert(tutor_id, scheduled_at, duration_minutes, topic)).scalar_one()
+        result = db.execute(
+            SessionService._bulk_insert(group_id, tutor_id, student_profile_ids, scheduled_at, duration_minutes, topic)
+        )
+        ids_by_profile = dict(result.all())
+        StatsRollupService.refresh_sessions(db, list(ids_by_profile.values()))
+        db.commit()
+        return [ids_by_profile[profile_id] for profile_id in student_profile_ids]
+
     @staticmethod
     def get_user_sessions(db: Session, user_id: int, role: str) -> List[TSession]:
         """
@@ -54,12 +123,50 @@ class SessionService:
         return db.query(TSession).filter(TSession.student_profile_id == profile_id).order_by(TSession.scheduled_at.desc()).all()
 
     @staticmethod
-    def mark_attendance(db: Session, session_id: int, student_profile_id: int, status: str) -> Attendance:
-        attendance = Attendance(session_id=session_id, student_profile_id=student_profile_id, status=status)
-        db.add(attendance)
+    def _attendance_upsert(dialect_name: str, session_ids: List[int], status: str,
+                           student_profile_id: Optional[int] = None):
+        """
+        INSERT ... SELECT one attendance row per participant session, updating
+        the status where the participant is already marked. Returns the
+        marked session ids; the student comes from the session row itself.
+        """
+        participants = select(
+            TSession.id, TSession.student_profile_id, literal(status, String)
+        ).where(TSession.id.in_(session_ids))
+        if student_profile_id is not None:
+            participants = participants.where(TSession.student_profile_id == student_profile_id)
+
+        stmt = dialect_insert(dialect_name, Attendance).from_select(
+            ["session_id", "student_profile_id", "status"], participants
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=["session_id", "student_profile_id"],
+            set_={"status": stmt.excluded.status}
+        ).returning(Attendance.session_id)
+
+    @staticmethod
+    def mark_attendance_bulk(db: Session, session_ids: List[int], status: str,
+                             student_profile_id: Optional[int] = None) -> List[int]:
+        """Mark every given participant session in one statement and one commit; returns the marked ids"""
+        if not session_ids:
+            return []
+        result = db.execute(
+            SessionService._attendance_upsert(db.bind.dialect.name, session_ids, status, student_profile_id)
+        )
+        marked = result.scalars().all()
+        OutboxService.add_session_updates(db, marked)
+        StatsRollupService.refresh_sessions(db, marked)
         db.commit()
-        db.refresh(attendance)
-        return attendance
+        return marked
+
+    @staticmethod
+    def mark_attendance(db: Session, session_id: int, student_profile_id: int, status: str) -> Optional[Attendance]:
+        if not SessionService.mark_attendance_bulk(db, [session_id], status, student_profile_id):
+            return None
+        return db.query(Attendance).filter(
+            Attendance.session_id == session_id,
+            Attendance.student_profile_id == student_profile_id
+        ).first()
 
     @staticmethod
     def create_report(db: Session, session_id: int, tutor_id: int, content: str, performance_score: int) -> Report:
@@ -70,6 +177,211 @@ class SessionService:
             performance_score=performance_score
         )
         db.add(report)
+        OutboxService.add_session_update(db, session_id)
+        db.flush()
+        StatsRollupService.refresh_sessions(db, [session_id])
         db.commit()
         db.refresh(report)
         return report
+
+
+class AsyncSessionService:
+    """AsyncSession counterparts of the SessionService methods used by the bot handlers.
+
+    Relationships the handlers read (student_profile, tutor, report) are eager-loaded,
+    since lazy loads are not available on an AsyncSession.
+    """
+
+    @staticmethod
+    async def enroll_student(db: AsyncSession, student_profile_id: int, tutor_user_id: int) -> Enrollment:
+        enrollment = Enrollment(student_profile_id=student_profile_id, tutor_user_id=tutor_user_id)
+        db.add(enrollment)
+        await db.commit()
+        await db.refresh(enrollment)
+        return enrollment
+
+    @staticmethod
+    async def get_enrollments_for_student_profile(db: AsyncSession, student_profile_id: int) -> List[Enrollment]:
+        result = await db.execute(
+            select(Enrollment).filter(Enrollment.student_profile_id == student_profile_id, Enrollment.active == True)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_enrollments_for_tutor(db: AsyncSession, tutor_user_id: int) -> List[Enrollment]:
+        result = await db.execute(
+            select(Enrollment)
+            .options(selectinload(Enrollment.student_profile))
+            .filter(Enrollment.tutor_user_id == tutor_user_id, Enrollment.active == True)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def create_session(db: AsyncSession, tutor_id: int, student_profile_id: int, scheduled_at: datetime, duration_minutes: int, topic: str) -> TSession:
+        group = SessionGroup(tutor_id=tutor_id, scheduled_at=scheduled_at, duration_minutes=duration_minutes, topic=topic)
+        session = TSession(
+            group=group,
+            tutor_id=tutor_id,
+            student_profile_id=student_profile_id,
+            scheduled_at=scheduled_at,
+            duration_minutes=duration_minutes,
+            topic=topic
+        )
+        db.add(session)
+        await db.flush()
+        await AsyncStatsRollupService.refresh_sessions(db, [session.id])
+        await db.commit()
+        await db.refresh(session)
+        return session
+
+    @staticmethod
+    async def create_sessions_bulk(db: AsyncSession, tutor_id: int, student_profile_ids: List[int],
+                                   scheduled_at: datetime, duration_minutes: int, topic: str) -> List[int]:
+        """Async counterpart of SessionService.create_sessions_bulk"""
+        student_profile_ids = list(dict.fromkeys(student_profile_ids))
+        if not student_profile_ids:
+            return []
+
+        enrolled = await db.execute(
+            select(Enrollment.student_profile_id).filter(
+                Enrollment.tutor_user_id == tutor_id,
+                Enrollment.active == True,
+                Enrollment.student_profile_id.in_(student_profile_ids)
+            )
+        )
+        SessionService._check_enrolled(student_profile_ids, enrolled.scalars().all())
+
+        group_id = (await db.execute(
+            SessionService._group_insert(tutor_id, scheduled_at, duration_minutes, topic)
+        )).scalar_one()
+        result = await db.execute(
+            SessionService._bulk_insert(group_id, tutor_id, student_profile_ids, scheduled_at, duration_minutes, topic)
+        )
+        ids_by_profile = dict(result.all())
+        await AsyncStatsRollupService.refresh_sessions(db, list(ids_by_profile.values()))
+        await db.commit()
+        return [ids_by_profile[profile_id] for profile_id in student_profile_ids]
+
+    @staticmethod
+    async def get_tutor_groups(db: AsyncSession, tutor_id: int, limit: int = 10) -> List[Tuple[SessionGroup, int]]:
+        """The tutor's latest classes with their participant counts, newest first"""
+        # Count participants of the `limit` latest classes only, not of every session
+        latest = (
+            select(SessionGroup.id)
+            .filter(SessionGroup.tutor_id == tutor_id)
+            .order_by(SessionGroup.scheduled_at.desc())
+            .limit(limit)
+        )
+        participants = (
+            select(TSession.group_id, func.count(TSession.id).label("size"))
+            .filter(TSession.group_id.in_(latest))
+            .group_by(TSession.group_id)
+            .subquery()
+        )
+        result = await db.execute(
+            select(SessionGroup, participants.c.size)
+            .join(participants, participants.c.group_id == SessionGroup.id)
+            .order_by(SessionGroup.scheduled_at.desc())
+        )
+        return result.all()
+
+    @staticmethod
+    async def get_group_participants(db: AsyncSession, group_id: int) -> List[TSession]:
+        """Participant sessions of a class with their student profiles"""
+        result = await db.execute(
+            select(TSession)
+            .options(selectinload(TSession.student_profile))
+            .filter(TSession.group_id == group_id)
+            .order_by(TSession.id)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_recent_participants(db: AsyncSession, tutor_id: int, group_limit: int = 10) -> List[TSession]:
+        """Participant sessions of the tutor's latest classes, newest class first"""
+        latest_groups = (
+            select(SessionGroup.id)
+            .filter(SessionGroup.tutor_id == tutor_id)
+            .order_by(SessionGroup.scheduled_at.desc())
+            .limit(group_limit)
+        )
+        result = await db.execute(
+            select(TSession)
+            .options(selectinload(TSession.student_profile))
+            .filter(TSession.group_id.in_(latest_groups))
+            .order_by(TSession.scheduled_at.desc(), TSession.id)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_user_sessions(db: AsyncSession, user_id: int, role: str) -> List[TSession]:
+        """Async version of SessionService.get_user_sessions"""
+        query = select(TSession).options(
+            selectinload(TSession.student_profile), selectinload(TSession.tutor)
+        )
+        if role == "tutor":
+            query = query.filter(TSession.tutor_id == user_id)
+        else:
+            profile_ids = select(StudentProfile.id).filter(StudentProfile.user_id == user_id)
+            query = query.filter(TSession.student_profile_id.in_(profile_ids))
+        result = await db.execute(query.order_by(TSession.scheduled_at.desc()))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_profile_sessions(db: AsyncSession, profile_id: int) -> List[TSession]:
+        result = await db.execute(
+            select(TSession)
+            .options(selectinload(TSession.tutor), selectinload(TSession.report))
+            .filter(TSession.student_profile_id == profile_id)
+            .order_by(TSession.scheduled_at.desc())
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_session(db: AsyncSession, session_id: int) -> Optional[TSession]:
+        result = await db.execute(
+            select(TSession).options(selectinload(TSession.student_profile)).filter(TSession.id == session_id)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def mark_attendance_bulk(db: AsyncSession, session_ids: List[int], status: str,
+                                   student_profile_id: Optional[int] = None) -> List[int]:
+        if not session_ids:
+            return []
+        result = await db.execute(
+            SessionService._attendance_upsert(db.bind.dialect.name, session_ids, status, student_profile_id)
+        )
+        marked = result.scalars().all()
+        OutboxService.add_session_updates(db, marked)
+        await AsyncStatsRollupService.refresh_sessions(db, marked)
+        await db.commit()
+        return marked
+
+    @staticmethod
+    async def mark_attendance(db: AsyncSession, session_id: int, student_profile_id: int, status: str) -> Optional[Attendance]:
+        if not await AsyncSessionService.mark_attendance_bulk(db, [session_id], status, student_profile_id):
+            return None
+        result = await db.execute(
+            select(Attendance).filter(
+                Attendance.session_id == session_id,
+                Attendance.student_profile_id == student_profile_id
+            )
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def create_report(db: AsyncSession, session_id: int, tutor_id: int, content: str, performance_score: int) -> Report:
+        report = Report(
+            session_id=session_id,
+            tutor_id=tutor_id,
+            content=content,
+            performance_score=performance_score
+        )
+        db.add(report)
+        OutboxService.add_session_update(db, session_id)
+        await db.flush()
+        await AsyncStatsRollupService.refresh_sessions(db, [session_id])
+        await db.commit()
+        await db.refresh(report)
+        return report
@@ -0,0 +1,286 @@
+import hashlib
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Date, DateTime, and_, case, cast, delete, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.db import dialect_insert
+from database.models import Session as TSession, Attendance, Report, SessionDailyRollup
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_STATUSES = ("present", "absent", "late")
+ROLLUP_COUNTS = ("sessions", "minutes", "reports", "score_sum", "scored", *ATTENDANCE_STATUSES)
+ROLLUP_KEY = ("day", "tutor_id", "student_profile_id")
+BucketKey = Tuple[Optional[date], Optional[int], Optional[int]]
+GROUP_BY = {
+    "day": SessionDailyRollup.day,
+    "tutor": SessionDailyRollup.tutor_id,
+    "student": SessionDailyRollup.student_profile_id,
+}
+
+
+def _day(dialect_name: str, column):
+    """Calendar day (UTC) of a timestamp"""
+    if dialect_name == "postgresql":
+        return cast(column, Date)
+    return func.date(column)
+
+
+def _as_date(value) -> date:
+    # SQLite returns date() as text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _rollup_select(dialect_name: str, *criteria):
+    """
+    Rollup rows recomputed from the base tables for the sessions matching
+    `criteria`: one row per (day, tutor, student profile). Like
+    AdminService.get_session_stats, reports and scores count the latest
+    report of each session only.
+    """
+    scoped_sessions = select(TSession.id).where(*criteria)
+    latest_reports = (
+        select(Report.session_id, func.max(Report.id).label("report_id"))
+        .where(Report.session_id.in_(scoped_sessions))
+        .group_by(Report.session_id)
+        .subquery()
+    )
+    day = _day(dialect_name, TSession.scheduled_at)
+    return (
+        select(
+            day.label("day"),
+            TSession.tutor_id,
+            TSession.student_profile_id,
+            func.count(TSession.id).label("sessions"),
+            func.coalesce(func.sum(TSession.duration_minutes), 0).label("minutes"),
+            func.count(Report.id).label("reports"),
+            func.coalesce(func.sum(Report.performance_score), 0).label("score_sum"),
+            func.count(Report.performance_score).label("scored"),
+            *(func.count(case((Attendance.status == status, 1))).label(status) for status in ATTENDANCE_STATUSES),
+            literal(datetime.utcnow(), DateTime).label("updated_at")
+        )
+        .outerjoin(latest_reports, latest_reports.c.session_id == TSession.id)
+        .outerjoin(Report, Report.id == latest_reports.c.report_id)
+        .outerjoin(Attendance, and_(
+            Attendance.session_id == TSession.id,
+            Attendance.student_profile_id == TSession.student_profile_id
+        ))
+        .where(
+            TSession.scheduled_at.is_not(None),
+            TSession.tutor_id.is_not(None),
+            TSession.student_profile_id.is_not(None),
+            *criteria
+        )
+        .group_by(day, TSession.tutor_id, TSession.student_profile_id)
+    )
+
+
+def _rollup_upsert(dialect_name: str, *criteria):
+    stmt = dialect_insert(dialect_name, SessionDailyRollup).from_select(
+        [*ROLLUP_KEY, *ROLLUP_COUNTS, "updated_at"], _rollup_select(dialect_name, *criteria)
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={column: stmt.excluded[column] for column in (*ROLLUP_COUNTS, "updated_at")}
+    )
+
+
+def _keys_select(dialect_name: str, session_ids: List[int]):
+    return select(
+        _day(dialect_name, TSession.scheduled_at), TSession.tutor_id, TSession.student_profile_id
+    ).where(TSession.id.in_(session_ids)).distinct()
+
+
+def _bucket_keys(rows, previous_keys: Optional[Iterable[BucketKey]]) -> Set[BucketKey]:
+    keys = {(_as_date(day), tutor_id, student_profile_id) for day, tutor_id, student_profile_id in rows}
+    keys.update(previous_keys or ())
+    # Sessions without a day, tutor or student belong to no bucket
+    return {key for key in keys if None not in key}
+
+
+def _bucket_locks(keys):
+    """
+    Postgres: take a transaction-scoped advisory lock per bucket, in key order
+    so writers sharing buckets can't deadlock. A refresh waiting on the lock
+    recomputes after the holder commits, so it sees the holder's rows too
+    (READ COMMITTED takes a new snapshot per statement).
+    """
+    lock_ids = sorted({
+        int.from_bytes(
+            hashlib.blake2b(f"session_daily_rollups:{day}:{tutor_id}:{student_profile_id}".encode(), digest_size=8).digest(),
+            "big", signed=True
+        )
+        for day, tutor_id, student_profile_id in keys
+    })
+    if not lock_ids:
+        return None
+    return select(*(func.pg_advisory_xact_lock(lock_id) for lock_id in lock_ids))
+
+
+def _keys_criterion(keys):
+    """Sessions falling in any of the given (day, tutor, student profile) buckets"""
+    conditions = []
+    for day, tutor_id, student_profile_id in keys:
+        start = datetime.combine(day, time.min)
+        conditions.append(and_(
+            TSession.tutor_id == tutor_id,
+            TSession.student_profile_id == student_profile_id,
+            TSession.scheduled_at >= start,
+            TSession.scheduled_at < start + timedelta(days=1)
+        ))
+    return or_(*conditions)
+
+
+def _bucket_delete(keys):
+    """Drop the given buckets; the upsert writes back the ones that still have sessions"""
+    return delete(SessionDailyRollup).where(or_(*(
+        and_(
+            SessionDailyRollup.day == day,
+            SessionDailyRollup.tutor_id == tutor_id,
+            SessionDailyRollup.student_profile_id == student_profile_id
+        ) for day, tutor_id, student_profile_id in keys
+    )))
+
+
+def _rollup_dict(row) -> Dict[str, Any]:
+    return {
+        "sessions": row.sessions or 0,
+        "minutes": row.minutes or 0,
+        "reports": row.reports or 0,
+        "average_performance_score": round(row.score_sum / row.scored, 2) if row.scored else 0.0,
+        "attendance": {status: getattr(row, status) or 0 for status in ATTENDANCE_STATUSES}
+    }
+
+
+def _totals_select(*criteria, group_column=None):
+    columns = [func.sum(getattr(SessionDailyRollup, column)).label(column) for column in ROLLUP_COUNTS]
+    stmt = select(*columns).where(*criteria)
+    if group_column is not None:
+        stmt = select(group_column.label("key"), *columns).where(*criteria).group_by(group_column).order_by(group_column)
+    return stmt
+
+
+class StatsRollupService:
+    """
+    session_daily_rollups keeps sessions, minutes, reports, scores and
+    attendance counts per (day, tutor, student profile). Writers refresh the
+    buckets their sessions fall in inside their own transaction, serialized
+    per bucket (advisory locks on Postgres; SQLite has a single writer). A
+    nightly job rebuilds the whole table to repair anything written around
+    SessionService, e.g. by hand or by seed scripts.
+
+    Counting rules: a session counts on the UTC day it is scheduled for,
+    with its latest report only; sessions without a time, tutor or student
+    fall in no bucket.
+    """
+
+    @staticmethod
+    def bucket_keys(db: Session, session_ids: List[int]) -> Set[BucketKey]:
+        """
+        Buckets the given sessions fall in now. Writers that move sessions to
+        another day, tutor or student, or delete them, take these before the
+        change and pass them to refresh_sessions as `previous_keys`.
+        """
+        if not session_ids:
+            return set()
+        return _bucket_keys(db.execute(_keys_select(db.bind.dialect.name, session_ids)).all(), None)
+
+    @staticmethod
+    def refresh_sessions(db: Session, session_ids: List[int],
+                         previous_keys: Optional[Iterable[BucketKey]] = None) -> None:
+        """
+        Recompute the buckets the given sessions fall in, plus `previous_keys`;
+        buckets left without sessions are deleted. The caller commits.
+        """
+        dialect_name = db.bind.dialect.name
+        rows = db.execute(_keys_select(dialect_name, session_ids)).all() if session_ids else []
+        keys = _bucket_keys(rows, previous_keys)
+        if not keys:
+            return
+        if dialect_name == "postgresql":
+            db.execute(_bucket_locks(keys))
+        db.execute(_bucket_delete(keys))
+        db.execute(_rollup_upsert(dialect_name, _keys_criterion(keys)))
+
+    @staticmethod
+    def reconcile(db: Session) -> int:
+        """Rebuild every bucket from the base tables in one transaction"""
+        db.execute(delete(SessionDailyRollup))
+        db.execute(_rollup_upsert(db.bind.dialect.name))
+        db.commit()
+        return db.query(func.count(SessionDailyRollup.id)).scalar()
+
+    @staticmethod
+    def get_totals(db: Session, start: Optional[date] = None, end: Optional[date] = None,
+                   tutor_id: Optional[int] = None, student_profile_id: Optional[int] = None,
+                   group_by: Optional[str] = None) -> Dict[str, Any]:
+        """Totals over days [start, end), optionally per day, tutor or student profile"""
+        criteria = []
+        if start is not None:
+            criteria.append(SessionDailyRollup.day >= start)
+        if end is not None:
+            criteria.append(SessionDailyRollup.day < end)
+        if tutor_id is not None:
+            criteria.append(SessionDailyRollup.tutor_id == tutor_id)
+        if student_profile_id is not None:
+            criteria.append(SessionDailyRollup.student_profile_id == student_profile_id)
+
+        if group_by is None:
+            return _rollup_dict(db.execute(_totals_select(*criteria)).one())
+        rows = db.execute(_totals_select(*criteria, group_column=GROUP_BY[group_by])).all()
+        return {"group_by": group_by, "rows": [{"key": row.key, **_rollup_dict(row)} for row in rows]}
+
+    @staticmethod
+    def get_recent_totals(db: Session, since: date) -> Dict[str, int]:
+        """All-time and since-`since` session and report counts in one pass"""
+        row = db.execute(select(
+            func.sum(SessionDailyRollup.sessions).label("sessions"),
+            func.sum(SessionDailyRollup.reports).label("reports"),
+            func.sum(case((SessionDailyRollup.day >= since, SessionDailyRollup.sessions), else_=0)).label("recent_sessions"),
+            func.sum(case((SessionDailyRollup.day >= since, SessionDailyRollup.reports), else_=0)).label("recent_reports")
+        )).one()
+        return {key: value or 0 for key, value in row._mapping.items()}
+
+
+class AsyncStatsRollupService:
+    """AsyncSession counterparts of the StatsRollupService write paths"""
+
+    @staticmethod
+    async def bucket_keys(db: AsyncSession, session_ids: List[int]) -> Set[BucketKey]:
+        if not session_ids:
+            return set()
+        return _bucket_keys((await db.execute(_keys_select(db.bind.dialect.name, session_ids))).all(), None)
+
+    @staticmethod
+    async def refresh_sessions(db: AsyncSession, session_ids: List[int],
+                               previous_keys: Optional[Iterable[BucketKey]] = None) -> None:
+        dialect_name = db.bind.dialect.name
+        rows = (await db.execute(_keys_select(dialect_name, session_ids))).all() if session_ids else []
+        keys = _bucket_keys(rows, previous_keys)
+        if not keys:
+            return
+        if dialect_name == "postgresql":
+            await db.execute(_bucket_locks(keys))
+        await db.execute(_bucket_delete(keys))
+        await db.execute(_rollup_upsert(dialect_name, _keys_criterion(keys)))
+
+    @staticmethod
+    async def reconcile(db: AsyncSession) -> int:
+        await db.execute(delete(SessionDailyRollup))
+        await db.execute(_rollup_upsert(db.bind.dialect.name))
+        await db.commit()
+        return (await db.execute(select(func.count(SessionDailyRollup.id)))).scalar()
+
+    @staticmethod
+    async def reconcile_if_empty(db: AsyncSession) -> Optional[int]:
+        """
+        Build the table on startup when it is empty: create_all leaves it so on
+        a new database, and the nightly rebuild may be hours away
+        """
+        if (await db.execute(select(SessionDailyRollup.id).limit(1))).first() is not None:
+            return None
+        return await AsyncStatsRollupService.reconcile(db)
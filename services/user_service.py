@@ -1,6 +1,9 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from database.models import User, UserRole, StudentProfile, TutorProfile, ParentProfile
-from typing import Optional, List
+from services.identity_cache import identity_cache, CachedUser
+from typing import Optional, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,12 +22,14 @@ class UserService:
             if full_name: existing.full_name = full_name
             if phone: existing.phone = phone
             db.commit()
+            identity_cache.invalidate(telegram_id)
             return existing
             
         user = User(telegram_id=telegram_id, full_name=full_name, phone=phone)
         db.add(user)
         db.commit()
         db.refresh(user)
+        identity_cache.invalidate(telegram_id)
         return user
 
     @staticmethod
@@ -37,6 +42,7 @@ class UserService:
         db.add(user_role)
         db.commit()
         db.refresh(user_role)
+        identity_cache.invalidate_user(user_id)
         return user_role
 
     @staticmethod
@@ -124,3 +130,155 @@ class UserService:
         if subject:
             query = query.join(TutorProfile).filter(TutorProfile.subjects.contains(subject))
         return query.all()
+
+
+class AsyncUserService:
+    """AsyncSession counterparts of the UserService methods used by the bot handlers"""
+
+    @staticmethod
+    async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> Optional[User]:
+        if telegram_id is None:
+            return None
+        result = await db.execute(
+            select(User).options(joinedload(User.roles)).filter(User.telegram_id == telegram_id)
+        )
+        return result.unique().scalars().first()
+
+    @staticmethod
+    async def get_identity(db: AsyncSession, telegram_id: int) -> Optional[CachedUser]:
+        """Cached get_user_by_telegram_id returning a detached id/name/phone/roles snapshot"""
+        if telegram_id is None:
+            return None
+        cached = identity_cache.get(telegram_id)
+        if cached:
+            return cached
+
+        user = await AsyncUserService.get_user_by_telegram_id(db, telegram_id)
+        if not user:
+            return None
+        return identity_cache.put(user)
+
+    @staticmethod
+    async def create_user(db: AsyncSession, telegram_id: int, full_name: str, phone: str = None) -> User:
+        existing = await AsyncUserService.get_user_by_telegram_id(db, telegram_id)
+        if existing:
+            if full_name: existing.full_name = full_name
+            if phone: existing.phone = phone
+            await db.commit()
+            identity_cache.invalidate(telegram_id)
+            return existing
+
+        user = User(telegram_id=telegram_id, full_name=full_name, phone=phone)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        identity_cache.invalidate(telegram_id)
+        return user
+
+    @staticmethod
+    async def assign_role(db: AsyncSession, user_id: int, role: str) -> UserRole:
+        result = await db.execute(select(UserRole).filter(UserRole.user_id == user_id, UserRole.role == role))
+        existing = result.scalars().first()
+        if existing:
+            return existing
+
+        user_role = UserRole(user_id=user_id, role=role)
+        db.add(user_role)
+        await db.commit()
+        await db.refresh(user_role)
+        identity_cache.invalidate_user(user_id)
+        return user_role
+
+    @staticmethod
+    async def create_student_profile(db: AsyncSession, full_name: str, grade: str, school: str, age: int,
+                                     user_id: Optional[int] = None, parent_id: Optional[int] = None) -> StudentProfile:
+        """Async version of UserService.create_student_profile"""
+        if user_id:
+            existing = await AsyncUserService.get_student_profile(db, user_id)
+            if existing:
+                existing.full_name = full_name
+                existing.grade = grade
+                existing.school = school
+                existing.age = age
+                if parent_id: existing.parent_id = parent_id
+                await db.commit()
+                return existing
+
+        profile = StudentProfile(
+            user_id=user_id,
+            parent_id=parent_id,
+            full_name=full_name,
+            grade=grade,
+            school=school,
+            age=age
+        )
+        db.add(profile)
+        await db.commit()
+        await db.refresh(profile)
+        return profile
+
+    @staticmethod
+    async def create_tutor_profile(db: AsyncSession, user_id: int, subjects: str, education: str, experience_years: int) -> TutorProfile:
+        existing = await AsyncUserService.get_tutor_profile(db, user_id)
+        if existing:
+            existing.subjects = subjects
+            existing.education = education
+            existing.experience_years = experience_years
+            await db.commit()
+            return existing
+
+        profile = TutorProfile(user_id=user_id, subjects=subjects, education=education, experience_years=experience_years)
+        db.add(profile)
+        await db.commit()
+        await db.refresh(profile)
+        return profile
+
+    @staticmethod
+    async def create_parent_profile(db: AsyncSession, user_id: int, occupation: str) -> ParentProfile:
+        existing = await AsyncUserService.get_parent_profile(db, user_id)
+        if existing:
+            existing.occupation = occupation
+            await db.commit()
+            return existing
+
+        profile = ParentProfile(user_id=user_id, occupation=occupation)
+        db.add(profile)
+        await db.commit()
+        await db.refresh(profile)
+        return profile
+
+    @staticmethod
+    async def get_student_profile(db: AsyncSession, user_id: int) -> Optional[StudentProfile]:
+        result = await db.execute(select(StudentProfile).filter(StudentProfile.user_id == user_id))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_student_profile_by_id(db: AsyncSession, profile_id: int) -> Optional[StudentProfile]:
+        return await db.get(StudentProfile, profile_id)
+
+    @staticmethod
+    async def get_managed_children(db: AsyncSession, parent_user_id: int) -> List[StudentProfile]:
+        result = await db.execute(select(StudentProfile).filter(StudentProfile.parent_id == parent_user_id))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_tutor_profile(db: AsyncSession, user_id: int) -> Optional[TutorProfile]:
+        return await db.get(TutorProfile, user_id)
+
+    @staticmethod
+    async def get_parent_profile(db: AsyncSession, user_id: int) -> Optional[ParentProfile]:
+        return await db.get(ParentProfile, user_id)
+
+    @staticmethod
+    async def search_tutors(db: AsyncSession, subject: Optional[str] = None) -> List[Tuple[User, Optional[TutorProfile]]]:
+        """Tutors paired with their profile, fetched in a single round-trip"""
+        query = (
+            select(User, TutorProfile)
+            .join(UserRole)
+            .outerjoin(TutorProfile, TutorProfile.user_id == User.id)
+            .filter(UserRole.role == "tutor")
+        )
+        if subject:
+            query = query.filter(TutorProfile.subjects.contains(subject))
+        result = await db.execute(query)
+        return [(user, profile) for user, profile in result.all()]
@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+# Settings and engines are built at import time, so point them at a scratch database first
+_db_path = os.path.join(tempfile.mkdtemp(prefix="tutormula-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_path}"
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:test-token")
+
+import pytest
+from sqlalchemy import event
+
+from database.db import Base, engine, SessionLocal
+
+
+@pytest.fixture
+def db():
+    """Sync session on freshly created tables"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+class QueryCounter:
+    """Counts statements sent to the database while measure() runs"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def measure(self, fn, *args, **kwargs):
+        """(fn's result, number of statements it executed)"""
+        self.count = 0
+        result = fn(*args, **kwargs)
+        return result, self.count
+
+
+@pytest.fixture
+def query_counter():
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
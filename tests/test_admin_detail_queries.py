@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from database.models import (
+    User, StudentProfile, TutorProfile, ParentProfile, Enrollment, SessionGroup, Session as TSession, Attendance, Report
+)
+from services.admin_crud_service import AdminCRUDService
+
+TUTOR_ID, PARENT_ID, STUDENT_ID = 1, 2, 1
+
+
+def _seed(db, children: int, sessions_per_child: int):
+    """One tutor and one parent whose `children` each have enrollments, sessions, attendance and reports"""
+    db.execute(insert(User), [
+        {"id": TUTOR_ID, "telegram_id": 1, "full_name": "Tutor"},
+        {"id": PARENT_ID, "telegram_id": 2, "full_name": "Parent"},
+    ])
+    db.execute(insert(TutorProfile), [{"user_id": TUTOR_ID, "subjects": "Math", "verified": True}])
+    db.execute(insert(ParentProfile), [{"user_id": PARENT_ID, "occupation": "Engineer"}])
+    db.execute(insert(StudentProfile), [
+        {"id": child, "full_name": f"Child {child}", "parent_id": PARENT_ID} for child in range(1, children + 1)
+    ])
+    db.execute(insert(Enrollment), [
+        {"student_profile_id": child, "tutor_user_id": TUTOR_ID, "active": True} for child in range(1, children + 1)
+    ])
+    # Lesson n is one group class every child takes part in
+    db.execute(insert(SessionGroup), [
+        {"id": n + 1, "tutor_id": TUTOR_ID, "scheduled_at": datetime(2026, 1, 1) + timedelta(hours=n),
+         "duration_minutes": 60, "topic": f"Topic {n}"}
+        for n in range(sessions_per_child)
+    ])
+    sessions = [
+        {"id": child * 1000 + n, "group_id": n + 1, "tutor_id": TUTOR_ID, "student_profile_id": child,
+         "scheduled_at": datetime(2026, 1, 1) + timedelta(hours=n), "duration_minutes": 60, "topic": f"Topic {n}"}
+        for child in range(1, children + 1) for n in range(sessions_per_child)
+    ]
+    db.execute(insert(TSession), sessions)
+    db.execute(insert(Attendance), [
+        {"session_id": s["id"], "student_profile_id": s["student_profile_id"], "status": "present"} for s in sessions
+    ])
+    db.execute(insert(Report), [
+        {"session_id": s["id"], "tutor_id": TUTOR_ID, "content": "Good", "performance_score": 8} for s in sessions
+    ])
+    db.commit()
+
+
+DETAIL_VIEWS = [
+    # (view, id, statements it should take regardless of how many related rows exist)
+    (AdminCRUDService.get_student_detail, STUDENT_ID, 3),
+    (AdminCRUDService.get_tutor_detail, TUTOR_ID, 3),
+    (AdminCRUDService.get_parent_detail, PARENT_ID, 2),
+    (AdminCRUDService.get_session_detail, 1000, 2),
+]
+
+
+@pytest.mark.parametrize("view, entity_id, expected", DETAIL_VIEWS, ids=lambda v: getattr(v, "__name__", None))
+@pytest.mark.parametrize("children, sessions_per_child", [(1, 1), (30, 40)])
+def test_detail_views_run_a_fixed_number_of_queries(db, query_counter, view, entity_id, expected,
+                                                     children, sessions_per_child):
+    _seed(db, children, sessions_per_child)
+
+    result, queries = query_counter.measure(view, db, entity_id)
+
+    assert result is not None
+    assert queries == expected
+
+
+def test_detail_views_return_related_rows(db):
+    _seed(db, children=3, sessions_per_child=25)
+
+    student = AdminCRUDService.get_student_detail(db, STUDENT_ID)
+    assert student["parent"]["occupation"] == "Engineer"
+    assert [tutor["id"] for tutor in student["enrolled_tutors"]] == [TUTOR_ID]
+    assert student["total_sessions"] == 20  # latest 20 only
+    assert all(sess["attendance"] == "present" for sess in student["sessions"])
+
+    tutor = AdminCRUDService.get_tutor_detail(db, TUTOR_ID)
+    assert tutor["total_students"] == 3
+    assert all(sess["report_score"] == 8 for sess in tutor["sessions"])
+
+    parent = AdminCRUDService.get_parent_detail(db, PARENT_ID)
+    assert [(c["total_sessions"], c["total_reports"]) for c in parent["children"]] == [(25, 25)] * 3
+
+    session = AdminCRUDService.get_session_detail(db, 1000)
+    assert [p["student_id"] for p in session["participants"]] == [1, 2, 3]
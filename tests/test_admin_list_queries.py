@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import insert
+
+from database.models import User, StudentProfile, ParentProfile
+from services.admin_service import AdminService
+
+
+def _seed(db, parents: int, children_per_parent: int, own_account_students: int):
+    """Parents with managed children, plus students who have their own account"""
+    db.execute(insert(User), [
+        {"id": i, "telegram_id": 1000 + i, "full_name": f"Parent {i}", "phone": f"+1{i}"} for i in range(1, parents + 1)
+    ] + [
+        {"id": parents + i, "telegram_id": 1_000_000 + i, "full_name": f"Student {i}", "phone": f"+2{i}"}
+        for i in range(1, own_account_students + 1)
+    ])
+    db.execute(insert(ParentProfile), [{"user_id": i, "occupation": "Engineer"} for i in range(1, parents + 1)])
+    db.execute(insert(StudentProfile), [
+        {"full_name": f"Child {parent}-{n}", "parent_id": parent, "grade": "Grade 8"}
+        for parent in range(1, parents + 1) for n in range(children_per_parent)
+    ] + [
+        {"full_name": f"Student {i}", "user_id": parents + i, "grade": "Grade 9"}
+        for i in range(1, own_account_students + 1)
+    ])
+    db.commit()
+
+
+LISTS = [AdminService.get_all_students, AdminService.get_all_parents]
+
+
+@pytest.mark.parametrize("list_page", LISTS, ids=lambda fn: fn.__name__)
+@pytest.mark.parametrize("parents, children_per_parent, own_account_students", [
+    (2, 1, 2),
+    # 50k students: 12.5k parents with two children each, plus 25k own-account students
+    (12_500, 2, 25_000),
+])
+def test_list_pages_run_a_fixed_number_of_queries(db, query_counter, list_page, parents, children_per_parent,
+                                                  own_account_students):
+    _seed(db, parents, children_per_parent, own_account_students)
+
+    # First page: the capped total count plus the page itself
+    first, queries = query_counter.measure(list_page, db, limit=200)
+    assert queries == 2
+    if first["next_cursor"] is None:
+        return
+
+    # Later pages skip the count
+    second, queries = query_counter.measure(list_page, db, cursor=first["next_cursor"], limit=200)
+    assert queries == 1
+    assert len(second["items"]) == 200
+
+
+def test_list_rows_carry_the_joined_data(db):
+    _seed(db, parents=3, children_per_parent=2, own_account_students=2)
+
+    students = AdminService.get_all_students(db, limit=100)
+    assert students["total"] == 8
+    by_name = {s["full_name"]: s for s in students["items"]}
+    # Managed children show their parent's account, the others their own
+    assert (by_name["Child 2-0"]["telegram_id"], by_name["Child 2-0"]["managed"]) == (1002, True)
+    assert (by_name["Student 1"]["phone"], by_name["Student 1"]["managed"]) == ("+21", False)
+
+    parents = AdminService.get_all_parents(db, limit=100)
+    assert [sorted(p["children"]) for p in parents["items"]] == [
+        [f"Child {parent}-0", f"Child {parent}-1"] for parent in (1, 2, 3)
+    ]
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from services.identity_cache import IdentityCache
+
+
+def _user(user_id=1, telegram_id=100, full_name="Old name"):
+    return SimpleNamespace(id=user_id, telegram_id=telegram_id, full_name=full_name, phone=None,
+                           roles=[SimpleNamespace(role="tutor")])
+
+
+def test_load_after_a_miss_is_cached():
+    cache = IdentityCache()
+    assert cache.get(100) is None
+    cache.put(_user())
+    assert cache.get(100).full_name == "Old name"
+
+
+def test_invalidation_during_a_load_drops_the_loaded_row():
+    cache = IdentityCache()
+    assert cache.get(100) is None  # the loader reads the old row...
+    cache.invalidate(100)  # ...while a writer commits and invalidates
+    cache.put(_user())
+    assert cache.get(100) is None
+
+    # Admin writes only know users.id
+    cache.put(_user())
+    cache.invalidate_user(1)
+    cache.put(_user())
+    assert cache.get(100) is None
+
+    # The next load caches again
+    cache.put(_user(full_name="New name"))
+    assert cache.get(100).full_name == "New name"
+
+
+def test_invalidating_another_user_keeps_the_load():
+    cache = IdentityCache()
+    assert cache.get(100) is None
+    cache.invalidate(200)
+    cache.invalidate_user(2)
+    cache.put(_user())
+    assert cache.get(100) is not None
+
+
+def test_invalidations_are_only_queued_while_syncing():
+    cache = IdentityCache()
+    for telegram_id in range(1000):
+        cache.invalidate(telegram_id)
+        cache.invalidate_user(telegram_id)
+    assert cache._outgoing == []
+    assert cache._invalidated == {}
+
+
+def test_bookkeeping_stays_bounded_when_lookups_find_no_user():
+    cache = IdentityCache(maxsize=10)
+    for telegram_id in range(100):
+        assert cache.get(telegram_id) is None  # unknown users never reach put()
+        cache.invalidate(1000 + telegram_id)
+    assert len(cache._loading) <= 10
+    assert len(cache._invalidated) <= 10
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from database.models import User, StudentProfile, Session as TSession, Attendance, Report, OutboxMessage
+from services.outbox_service import OutboxService
+from bot.utils.notifications import OutboxDispatcher
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def _reported_session(db, tutor, child, hour):
+    session = TSession(tutor_id=tutor.id, student_profile_id=child.id, scheduled_at=datetime(2026, 10, 1, hour),
+                       duration_minutes=60, topic=f"Topic {hour}")
+    db.add(session)
+    db.flush()
+    db.add(Attendance(session_id=session.id, student_profile_id=child.id, status="present"))
+    db.add(Report(session_id=session.id, tutor_id=tutor.id, content="Good", performance_score=8))
+    return session
+
+
+def _family(db, telegram_id):
+    parent = User(telegram_id=telegram_id, full_name=f"Parent {telegram_id}")
+    db.add(parent)
+    db.flush()
+    child = StudentProfile(full_name=f"Child {telegram_id}", parent_id=parent.id)
+    db.add(child)
+    db.flush()
+    return parent, child
+
+
+def _event(db, session, available_at, attempts=0):
+    message = OutboxService.add_session_update(db, session.id)
+    message.available_at = available_at
+    message.attempts = attempts
+    return message
+
+
+def test_events_seconds_apart_for_one_parent_go_out_as_one_message(db):
+    tutor = User(telegram_id=1, full_name="Tutor")
+    db.add(tutor)
+    parent, child = _family(db, 100)
+    now = datetime.utcnow()
+    # The tutor filed the second report 5s after the first: only the first is due yet
+    _event(db, _reported_session(db, tutor, child, 9), now - timedelta(seconds=1))
+    _event(db, _reported_session(db, tutor, child, 10), now + timedelta(seconds=4))
+    db.commit()
+
+    bot = FakeBot()
+    processed = asyncio.run(OutboxDispatcher().dispatch(bot))
+
+    assert processed == 2
+    assert len(bot.sent) == 1
+    chat_id, text = bot.sent[0]
+    assert chat_id == 100
+    assert "2 Session Updates" in text
+    assert db.query(OutboxMessage).filter(OutboxMessage.status == "pending").count() == 0
+
+
+def test_other_parents_and_retries_keep_their_schedule(db):
+    tutor = User(telegram_id=1, full_name="Tutor")
+    db.add(tutor)
+    _, child = _family(db, 100)
+    _, other_child = _family(db, 200)
+    now = datetime.utcnow()
+    _event(db, _reported_session(db, tutor, child, 9), now - timedelta(seconds=1))
+    backing_off = _event(db, _reported_session(db, tutor, child, 10), now + timedelta(seconds=30), attempts=1)
+    not_due = _event(db, _reported_session(db, tutor, other_child, 11), now + timedelta(seconds=4))
+    db.commit()
+
+    bot = FakeBot()
+    assert asyncio.run(OutboxDispatcher().dispatch(bot)) == 1
+
+    assert [chat_id for chat_id, _ in bot.sent] == [100]
+    db.expire_all()
+    assert db.get(OutboxMessage, backing_off.id).status == "pending"
+    assert db.get(OutboxMessage, not_due.id).status == "pending"
+
+
+def test_summary_uses_the_latest_report_of_a_session(db):
+    tutor = User(telegram_id=1, full_name="Tutor")
+    db.add(tutor)
+    parent, child = _family(db, 100)
+    session = _reported_session(db, tutor, child, 9)
+    db.flush()
+    # The tutor corrected the report before the notification went out
+    db.add(Report(session_id=session.id, tutor_id=tutor.id, content="Corrected", performance_score=9))
+    _event(db, session, datetime.utcnow() - timedelta(seconds=1))
+    db.commit()
+
+    bot = FakeBot()
+    asyncio.run(OutboxDispatcher().dispatch(bot))
+
+    [(chat_id, text)] = bot.sent
+    assert "Corrected" in text and "Good" not in text
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, update
+
+from database.models import User, Session as TSession
+from services.admin_session_service import AdminSessionService
+from services.pagination import decode_cursor, keyset_after, keyset_order, keyset_page
+
+
+def _all_pages(db, sort_column, descending, limit=3, model=User):
+    query = db.query(model)
+    cursor, seen = None, []
+    while True:
+        rows, page = keyset_page(query, sort_column, model.id, cursor, limit, descending)
+        seen += [row.id for row, *_ in rows]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_null_sort_values_are_paged_last_without_dropping_rows(db, descending):
+    db.execute(insert(TSession), [
+        {"id": i, "scheduled_at": datetime(2026, 1, 1) + timedelta(days=i % 4)} for i in range(1, 21)
+    ])
+    # Every third session is unscheduled
+    db.execute(update(TSession).where(TSession.id % 3 == 0).values(scheduled_at=None))
+    db.commit()
+    sessions = db.query(TSession).all()
+    dated = sorted((s for s in sessions if s.scheduled_at is not None), key=lambda s: (s.scheduled_at, s.id),
+                   reverse=descending)
+    undated = sorted((s for s in sessions if s.scheduled_at is None), key=lambda s: s.id, reverse=descending)
+
+    assert _all_pages(db, TSession.scheduled_at, descending, model=TSession) == [s.id for s in dated + undated]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_non_null_sort_pages_in_order(db, descending):
+    db.execute(insert(User), [
+        {"id": i, "telegram_id": i, "full_name": f"User {i % 5}", "created_at": datetime(2026, 1, 1 + i % 3)}
+        for i in range(1, 18)
+    ])
+    db.commit()
+
+    by_name = sorted(range(1, 18), key=lambda i: (f"User {i % 5}", i), reverse=descending)
+    assert _all_pages(db, User.full_name, descending, limit=4) == by_name
+    by_created = sorted(range(1, 18), key=lambda i: (1 + i % 3, i), reverse=descending)
+    assert _all_pages(db, User.created_at, descending, limit=4) == by_created
+
+
+def test_non_null_sort_resumes_with_one_row_comparison():
+    criterion = keyset_after(User.created_at, User.id, datetime(2026, 1, 1), 5, descending=True)
+    assert str(criterion) == "(users.created_at, users.id) < (:param_1, :param_2)"
+    assert [str(clause) for clause in keyset_order(User.created_at, User.id, descending=True)] == [
+        "users.created_at DESC", "users.id DESC"
+    ]
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", User.created_at)
+
+
+def test_session_pages_reach_unscheduled_sessions(db):
+    db.add(User(id=1, telegram_id=1, full_name="Tutor"))
+    db.execute(insert(TSession), [
+        {"id": i, "tutor_id": 1, "scheduled_at": datetime(2026, 1, 1) + timedelta(days=i % 4)} for i in range(1, 13)
+    ])
+    db.execute(update(TSession).where(TSession.id % 4 == 0).values(scheduled_at=None))
+    db.commit()
+
+    before, seen = None, []
+    while True:
+        page = AdminSessionService.get_user_sessions_detailed(db, 1, "tutor", limit=5, before=before)
+        if not page:
+            break
+        seen += [s["id"] for s in page]
+        before = (page[-1]["scheduled_at"], page[-1]["id"])
+
+    sessions = db.query(TSession).all()
+    scheduled = sorted((s for s in sessions if s.scheduled_at), key=lambda s: (s.scheduled_at, s.id), reverse=True)
+    unscheduled = sorted((s for s in sessions if s.scheduled_at is None), key=lambda s: s.id, reverse=True)
+    assert seen == [s.id for s in scheduled + unscheduled]
@@ -0,0 +1,54 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from database.db import engine
+from database.models import ReportRun
+from services import scheduler_service
+from services.scheduler_service import DAILY_REPORTS_JOB_ID, _daily_trigger, daily_reports_job
+
+
+def _new_scheduler() -> AsyncIOScheduler:
+    sched = AsyncIOScheduler(jobstores={"default": SQLAlchemyJobStore(engine=engine)})
+    sched.start(paused=True)
+    sched.add_job(daily_reports_job, _daily_trigger("08:00"), id=DAILY_REPORTS_JOB_ID, replace_existing=True)
+    return sched
+
+
+def _stored_job():
+    store = SQLAlchemyJobStore(engine=engine)
+    store.start(None, "default")
+    return store.lookup_job(DAILY_REPORTS_JOB_ID)
+
+
+def test_reschedule_without_a_local_scheduler_updates_the_stored_job(db):
+    async def store_job():
+        _new_scheduler().shutdown(wait=False)
+
+    asyncio.run(store_job())
+    assert scheduler_service.scheduler is None
+
+    assert scheduler_service.reschedule_daily_reports("17:45")
+    job = _stored_job()
+    assert str(job.trigger) == str(_daily_trigger("17:45"))
+    assert (job.next_run_time.hour, job.next_run_time.minute) == (17, 45)
+
+
+def test_resume_pulls_the_daily_reports_job_forward(db, monkeypatch):
+    db.add(ReportRun(run_date=datetime.utcnow().date(), window_start=datetime.utcnow() - timedelta(days=1)))
+    db.commit()
+
+    async def elect():
+        sched = _new_scheduler()
+        monkeypatch.setattr(scheduler_service, "scheduler", sched)
+        try:
+            await scheduler_service._resume_unfinished_run()
+            return [(job.id, job.next_run_time) for job in sched.get_jobs()]
+        finally:
+            sched.shutdown(wait=False)
+
+    [(job_id, next_run_time)] = asyncio.run(elect())
+    assert job_id == DAILY_REPORTS_JOB_ID
+    assert next_run_time <= datetime.now(timezone.utc)
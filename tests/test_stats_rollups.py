@@ -0,0 +1,154 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql
+
+from database.db import AsyncSessionLocal
+from database.models import User, StudentProfile, Enrollment, Session as TSession, Report, SessionDailyRollup
+from services.admin_service import AdminService
+from services.admin_crud_service import AdminCRUDService
+from services.session_service import SessionService
+from services.stats_rollup_service import StatsRollupService, AsyncStatsRollupService, _bucket_locks
+
+START, END = datetime(2026, 10, 1), datetime(2026, 10, 8)
+
+
+def _write_activity(db):
+    """A week of classes written through SessionService, so the rollups are maintained incrementally"""
+    db.execute(insert(User), [{"id": i, "telegram_id": i, "full_name": f"Tutor {i}"} for i in (1, 2)])
+    db.execute(insert(StudentProfile), [{"id": i, "full_name": f"Student {i}"} for i in (1, 2, 3)])
+    db.execute(insert(Enrollment), [
+        {"student_profile_id": student, "tutor_user_id": tutor, "active": True} for tutor in (1, 2) for student in (1, 2, 3)
+    ])
+    db.commit()
+
+    for day in range(7):
+        tutor_id = 1 + day % 2
+        ids = SessionService.create_sessions_bulk(
+            db, tutor_id, [1, 2, 3], START + timedelta(days=day, hours=9), 45 + day, f"Class {day}"
+        )
+        one_to_one = SessionService.create_session(db, tutor_id, 1 + day % 3, START + timedelta(days=day, hours=17),
+                                                   30, f"Lesson {day}")
+        SessionService.mark_attendance_bulk(db, ids[:2], "present")
+        SessionService.mark_attendance(db, ids[2], 3, ["absent", "late"][day % 2])
+        SessionService.create_report(db, ids[0], tutor_id, "First draft", 4)
+        # Re-reporting a session replaces the report: only the latest counts
+        SessionService.create_report(db, ids[0], tutor_id, "Final", 9)
+        SessionService.create_report(db, one_to_one.id, tutor_id, "Unscored", None)
+        SessionService.mark_attendance(db, one_to_one.id, one_to_one.student_profile_id, "present")
+
+
+def _live(db, start=START, end=END):
+    stats = AdminService.get_session_stats(db, start=start, end=end, limit=0)
+    return {
+        "sessions": stats["total_sessions"],
+        "minutes": stats["total_duration_minutes"],
+        "reports": stats["total_reports"],
+        "average_performance_score": stats["average_performance_score"],
+        "attendance": stats["attendance"],
+    }
+
+
+def test_rollup_totals_match_the_live_aggregate(db):
+    _write_activity(db)
+
+    assert StatsRollupService.get_totals(db, START.date(), END.date()) == _live(db)
+    # Any sub-range of whole days
+    assert StatsRollupService.get_totals(db, date(2026, 10, 3), date(2026, 10, 5)) == _live(
+        db, datetime(2026, 10, 3), datetime(2026, 10, 5)
+    )
+
+
+def test_rollup_days_match_the_live_daily_series(db):
+    _write_activity(db)
+
+    series = AdminService.get_session_stats(db, start=START, end=END, bucket="day", limit=0)["series"]
+    rows = StatsRollupService.get_totals(db, START.date(), END.date(), group_by="day")["rows"]
+
+    assert [(row["sessions"], row["reports"], row["average_performance_score"]) for row in rows] == [
+        (point["total_sessions"], point["total_reports"], point["average_performance_score"]) for point in series
+    ]
+
+
+def test_reconcile_repairs_writes_that_bypassed_the_services(db):
+    _write_activity(db)
+    incremental = StatsRollupService.get_totals(db, START.date(), END.date(), group_by="tutor")
+
+    # Written around SessionService: the rollups don't see it until the reconcile
+    session_id = db.query(TSession.id).order_by(TSession.id).first()[0]
+    db.add(Report(session_id=session_id, tutor_id=1, content="Late edit", performance_score=1))
+    db.execute(update(TSession).where(TSession.id == session_id + 1).values(duration_minutes=120))
+    db.commit()
+    assert StatsRollupService.get_totals(db, START.date(), END.date()) != _live(db)
+
+    StatsRollupService.reconcile(db)
+    assert StatsRollupService.get_totals(db, START.date(), END.date()) == _live(db)
+    assert StatsRollupService.get_totals(db, START.date(), END.date(), group_by="tutor") != incremental
+
+
+def test_moving_a_session_refreshes_its_old_bucket_too(db):
+    _write_activity(db)
+    # The only session of tutor 1 and student 1 on Oct 1 at 17:00
+    moved = db.query(TSession).filter(TSession.topic == "Lesson 0").one()
+    old_keys = StatsRollupService.bucket_keys(db, [moved.id])
+
+    moved.scheduled_at = datetime(2026, 10, 9, 17)
+    moved.tutor_id = 2
+    db.flush()
+    StatsRollupService.refresh_sessions(db, [moved.id], previous_keys=old_keys)
+    db.commit()
+
+    assert StatsRollupService.get_totals(db, START.date(), date(2026, 10, 10)) == _live(db, START, datetime(2026, 10, 10))
+    assert StatsRollupService.get_totals(db, date(2026, 10, 9), date(2026, 10, 10), tutor_id=2)["sessions"] == 1
+
+    # The bucket it left still has the 9:00 class; deleting that empties it
+    [(day, tutor_id, student_profile_id)] = old_keys
+    remaining = [row[0] for row in db.query(TSession.id).filter(
+        TSession.tutor_id == tutor_id, TSession.student_profile_id == student_profile_id,
+        TSession.scheduled_at >= START, TSession.scheduled_at < START + timedelta(days=1)
+    )]
+    db.query(Report).filter(Report.session_id.in_(remaining)).delete()
+    db.query(TSession).filter(TSession.id.in_(remaining)).delete()
+    StatsRollupService.refresh_sessions(db, [], previous_keys=old_keys)
+    db.commit()
+    assert db.query(SessionDailyRollup).filter(
+        SessionDailyRollup.day == day, SessionDailyRollup.tutor_id == tutor_id,
+        SessionDailyRollup.student_profile_id == student_profile_id
+    ).count() == 0
+
+
+def test_empty_rollups_are_rebuilt_on_startup(db):
+    _write_activity(db)
+    db.query(SessionDailyRollup).delete()
+    db.commit()
+
+    async def startup():
+        async with AsyncSessionLocal() as session:
+            built = await AsyncStatsRollupService.reconcile_if_empty(session)
+        async with AsyncSessionLocal() as session:
+            # Left alone once it has rows
+            return built, await AsyncStatsRollupService.reconcile_if_empty(session)
+
+    built, again = asyncio.run(startup())
+    assert built > 0 and again is None
+    assert StatsRollupService.get_totals(db, START.date(), END.date()) == _live(db)
+
+
+def test_dashboard_reads_totals_from_the_rollups(db, query_counter):
+    _write_activity(db)
+
+    stats, queries = query_counter.measure(AdminCRUDService.get_dashboard_stats, db)
+
+    assert queries == 2
+    live = _live(db, datetime(2000, 1, 1), datetime(2100, 1, 1))
+    assert (stats["total_sessions"], stats["total_reports"]) == (live["sessions"], live["reports"])
+
+
+def test_bucket_locks_are_taken_in_key_order():
+    keys = [(date(2026, 10, 2), 1, 3), (date(2026, 10, 1), 2, 1), (date(2026, 10, 2), 1, 3)]
+    sql = str(_bucket_locks(keys).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    lock_ids = [int(part.split(")")[0]) for part in sql.split("pg_advisory_xact_lock(")[1:]]
+    assert len(lock_ids) == 2
+    assert lock_ids == sorted(lock_ids)
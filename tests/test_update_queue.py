@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot.update_queue import UpdateQueue, UpdateQueueNotRunning
+
+
+class _SlowDispatcher:
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.fed = []
+
+    async def feed_update(self, bot, update):
+        await self.release.wait()
+        self.fed.append(update.update_id)
+
+
+def _update(update_id):
+    return SimpleNamespace(update_id=update_id, event=None)
+
+
+def test_put_is_refused_while_the_queue_drains():
+    async def scenario():
+        dp = _SlowDispatcher()
+        queue = UpdateQueue(dp, bot=None, workers=1)
+        await queue.start()
+        assert await queue.put(_update(1))
+
+        stopping = asyncio.create_task(queue.stop(drain_timeout=5))
+        await asyncio.sleep(0)
+        with pytest.raises(UpdateQueueNotRunning):
+            await queue.put(_update(2))
+
+        dp.release.set()
+        await stopping
+        return dp.fed
+
+    assert asyncio.run(scenario()) == [1]
+
+
+def test_put_is_refused_before_start_and_after_stop():
+    async def scenario():
+        queue = UpdateQueue(_SlowDispatcher(), bot=None)
+        with pytest.raises(UpdateQueueNotRunning):
+            await queue.put(_update(1))
+        await queue.start()
+        await queue.stop()
+        with pytest.raises(UpdateQueueNotRunning):
+            await queue.put(_update(2))
+
+    asyncio.run(scenario())